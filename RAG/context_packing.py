@@ -0,0 +1,187 @@
+"""
+Context assembly for the regulations prompt.
+
+The translated chunks overlap by ~100 characters and neighbouring chunks often say
+the same thing, so joining the top-k verbatim spends prompt tokens (and Ollama
+prompt-processing time) on repeats. pack_context():
+
+  1. picks a diverse subset of the candidates with maximal marginal relevance
+     (vectorized over the candidates' stored embeddings) and drops near-duplicates,
+  2. merges selected chunks that are adjacent on the same page into one block,
+     cutting the text they share,
+  3. packs the blocks, most relevant first, under a token budget.
+
+Token counts are estimated (about 4 characters per token for English text); the
+budget is a cost bound, not an exact model limit.
+"""
+import math
+import re
+import threading
+
+import numpy as np
+
+from RAG.rerank import doc_id
+
+TOKEN_BUDGET = 2000
+MMR_LAMBDA = 0.7  # 1.0 = pure relevance, 0.0 = pure diversity
+DUPLICATE_SIMILARITY = 0.97
+MIN_OVERLAP_WORDS = 3
+MAX_OVERLAP_WORDS = 60
+MAX_LEADING_WORDS = 3  # a chunk may start with the tail of a word cut at the boundary
+MIN_TRUNCATED_TOKENS = 100
+SEPARATOR = "\n\n---\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4)
+
+
+def _chunk_key(d):
+    meta = d.metadata or {}
+    return meta.get("page"), meta.get("chunk_id")
+
+
+def _words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def merge_overlap(left: str, right: str) -> str:
+    """
+    Join two consecutive chunks, dropping the start of right that repeats the end of
+    left. Matching is on words, since translation rarely reproduces the overlap exactly
+    character for character, and may skip a few leading fragments of right.
+    """
+    lw, rw = _words(left), _words(right)
+    for n in range(min(MAX_OVERLAP_WORDS, len(lw), len(rw)), MIN_OVERLAP_WORDS - 1, -1):
+        tail = lw[-n:]
+        for skip in range(min(MAX_LEADING_WORDS, len(rw) - n) + 1):
+            if rw[skip:skip + n] == tail:
+                # Cut right just after the last repeated word
+                end = list(re.finditer(r"\w+", right))[skip + n - 1].end()
+                return left.rstrip() + right[end:]
+    return left.rstrip() + "\n" + right.lstrip()
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Longest prefix within the estimate, cut at a sentence or line end when possible."""
+    cut = text[:tokens * 4]
+    end = max(cut.rfind(". "), cut.rfind(".\n"), cut.rfind("\n"))
+    return cut[:end + 1] if end > len(cut) // 2 else cut
+
+
+def mmr_select(query_vec, doc_vecs, k: int, lambda_mult: float = MMR_LAMBDA,
+               duplicate_similarity: float = DUPLICATE_SIMILARITY):
+    """Indices of up to k rows of doc_vecs in MMR order; near-duplicates of a pick are skipped."""
+    E = np.asarray(doc_vecs, dtype=np.float32)
+    q = np.asarray(query_vec, dtype=np.float32)
+    E = E / np.maximum(np.linalg.norm(E, axis=1, keepdims=True), 1e-12)
+    q = q / max(float(np.linalg.norm(q)), 1e-12)
+    relevance = E @ q
+    similarity = E @ E.T
+
+    n = len(E)
+    chosen = []
+    available = np.ones(n, dtype=bool)
+    max_sim = np.full(n, -1.0, dtype=np.float32)  # similarity to the closest pick so far
+    while len(chosen) < k and available.any():
+        scores = lambda_mult * relevance - (1 - lambda_mult) * np.maximum(max_sim, 0.0)
+        scores[~available] = -np.inf
+        i = int(np.argmax(scores))
+        chosen.append(i)
+        available[i] = False
+        max_sim = np.maximum(max_sim, similarity[i])
+        available &= max_sim < duplicate_similarity
+    return chosen
+
+
+class PackingStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def record(self, before: int, after: int):
+        with self._lock:
+            self.queries += 1
+            self.tokens_before += before
+            self.tokens_after += after
+
+    def stats(self) -> dict:
+        with self._lock:
+            saved = self.tokens_before - self.tokens_after
+            return {
+                "queries": self.queries,
+                "tokens_saved": saved,
+                "tokens_saved_per_query": round(saved / self.queries, 1) if self.queries else 0.0,
+                "saved_ratio": round(saved / self.tokens_before, 3) if self.tokens_before else 0.0,
+            }
+
+
+PACKING_STATS = PackingStats()
+
+
+def _embeddings_for(db, docs):
+    """Stored embeddings of docs, read back from Chroma (no Ollama call)."""
+    ids = [doc_id(d) for d in docs]
+    got = db._collection.get(ids=ids, include=["embeddings"])
+    by_id = dict(zip(got["ids"], got["embeddings"]))
+    return [by_id.get(i) for i in ids]
+
+
+def pack_context(docs, query_vec, db=None, k: int | None = None, token_budget: int = TOKEN_BUDGET,
+                 lambda_mult: float = MMR_LAMBDA) -> dict:
+    """
+    Assemble the prompt context from ranked candidates.
+    Returns {"context", "sources", "tokens_before", "tokens_after"}.
+    """
+    k = k or len(docs)
+    # What the prompt used to carry: the top k joined verbatim
+    tokens_before = estimate_tokens(SEPARATOR.join(d.page_content for d in docs[:k]))
+    # Never spend more than that, even if MMR picked longer chunks
+    token_budget = min(token_budget, tokens_before)
+
+    selected = list(range(min(k, len(docs))))
+    if db is not None and len(docs) > 1:
+        vecs = _embeddings_for(db, docs)
+        if all(v is not None for v in vecs):
+            selected = mmr_select(query_vec, vecs, k, lambda_mult)
+
+    # Group picks that are consecutive chunks of one page; a group ranks by its best member
+    blocks = []  # [rank, page, [chunk_ids], text, [source ids]]
+    for rank, i in enumerate(selected):
+        d = docs[i]
+        page, chunk_id = _chunk_key(d)
+        for block in blocks:
+            if page is not None and block[1] == page and chunk_id is not None and \
+                    (chunk_id == block[2][-1] + 1 or chunk_id == block[2][0] - 1):
+                if chunk_id > block[2][-1]:
+                    block[2].append(chunk_id)
+                    block[3] = merge_overlap(block[3], d.page_content)
+                    block[4].append(doc_id(d))
+                else:
+                    block[2].insert(0, chunk_id)
+                    block[3] = merge_overlap(d.page_content, block[3])
+                    block[4].insert(0, doc_id(d))
+                break
+        else:
+            blocks.append([rank, page, [chunk_id], d.page_content, [doc_id(d)]])
+
+    parts, sources, used = [], [], 0
+    for _, _, _, text, ids in sorted(blocks, key=lambda b: b[0]):
+        overhead = estimate_tokens(SEPARATOR) if parts else 0
+        cost = estimate_tokens(text) + overhead
+        if used + cost > token_budget:
+            room = token_budget - used - overhead
+            if room < MIN_TRUNCATED_TOKENS:
+                continue  # a smaller, less relevant block may still fit
+            text = truncate_to_tokens(text, room)
+            cost = estimate_tokens(text) + overhead
+        parts.append(text)
+        sources.extend(ids)
+        used += cost
+
+    context = SEPARATOR.join(parts)
+    tokens_after = estimate_tokens(context)
+    PACKING_STATS.record(tokens_before, tokens_after)
+    return {"context": context, "sources": sources, "tokens_before": tokens_before, "tokens_after": tokens_after}
@@ -7,6 +7,8 @@ import re
 
 from langchain_chroma import Chroma
 from get_embedding_function import get_embedding_function
+from index_version import stamp_collection
+from index_sync import sync_collection, has_changes, BATCH_SIZE, CONCURRENCY
 
 EXAMS_SCHEDULE = "data/final_exams_schedule.json"
 
@@ -27,7 +29,7 @@ def row_to_text(course: str, row: dict) -> str:
         f"Room: {row.get('Room','')}"
     )
 
-def main(chroma_path: str, reset: bool = False):
+def main(chroma_path: str, reset: bool = False, batch_size: int = BATCH_SIZE, concurrency: int = CONCURRENCY):
     if reset and os.path.isdir(chroma_path):
         shutil.rmtree(chroma_path, ignore_errors=True)
 
@@ -55,12 +57,18 @@ def main(chroma_path: str, reset: bool = False):
         embedding_function=embeddings,
     )
 
-    db.add_texts(texts=texts, metadatas=metadatas, ids=ids)
-    print(f"Indexed {len(texts)} courses into {chroma_path}/exams")
+    # Only new or edited courses are embedded; courses gone from the schedule are deleted
+    counts = sync_collection(db, ids, texts, metadatas, embeddings=embeddings,
+                             batch_size=batch_size, concurrency=concurrency)
+    if has_changes(counts):
+        stamp_collection(chroma_path, "exams")
+    print(f"Synced {len(texts)} courses into {chroma_path}/exams: {counts}")
 
 if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("--chroma", default="chroma")
     p.add_argument("--reset", action="store_true")
+    p.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Courses per embedding request.")
+    p.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Embedding requests in flight.")
     args = p.parse_args()
-    main(args.chroma, args.reset)
+    main(args.chroma, args.reset, args.batch_size, args.concurrency)
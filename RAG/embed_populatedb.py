@@ -1,52 +1,49 @@
 # index_translated.py
 import argparse, json
-from langchain.schema import Document
 from get_embedding_function import get_embedding_function
 from langchain_chroma import Chroma
+from index_version import stamp_collection
+from index_sync import sync_records, has_changes, Checkpoint, checkpoint_path, BATCH_SIZE, CONCURRENCY
 
-def load_translated_chunks(path):
-    docs = []
+def iter_translated_chunks(path):
+    """Stream (id, text, metadata) records from the translated JSONL, one line at a time."""
     with open(path, encoding="utf-8") as f:
         for line in f:
+            if not line.strip():
+                continue
             rec = json.loads(line)
             id_ = f"{rec['page']}_{rec['chunk_id']}"
-            docs.append(Document(
-                page_content=rec["text"],
-                metadata={"page":rec["page"], "chunk_id":rec["chunk_id"], "id":id_}
-            ))
-    return docs
+            yield id_, rec["text"], {"page":rec["page"], "chunk_id":rec["chunk_id"]}
 
-def main(translated_jsonl, chroma_path, reset=False):
+def main(translated_jsonl, chroma_path, reset=False, batch_size=BATCH_SIZE, concurrency=CONCURRENCY):
     if reset:
         import shutil, os
+        # Removes any checkpoint of an interrupted run too: --reset always starts from scratch
         if os.path.isdir(chroma_path):
             shutil.rmtree(chroma_path)
 
-    docs = load_translated_chunks(translated_jsonl)
-    texts = [d.page_content for d in docs]
     embeddings = get_embedding_function()
-    # embs = embeddings.embed_documents(texts)
-
     db = Chroma(
         collection_name="regulations",
         persist_directory=chroma_path,
         embedding_function=embeddings)
-    ids       = [d.metadata["id"] for d in docs]
-    metadatas = [{"page":d.metadata["page"], "chunk_id":d.metadata["chunk_id"]} for d in docs]
 
-    # db._collection.upsert(
-    #     documents=texts,
-    #     embeddings=embs,
-    #     metadatas=metadatas,
-    #     ids=ids
-    # )
-    db.add_texts(texts=texts, metadatas=metadatas, ids=ids)
-    print(f"Indexed {len(docs)} chunks into {chroma_path}")
+    # Only new or edited chunks are embedded; chunks gone from the JSONL are deleted
+    counts = sync_records(
+        db, iter_translated_chunks(translated_jsonl), embeddings,
+        batch_size=batch_size, concurrency=concurrency,
+        checkpoint=Checkpoint(checkpoint_path(chroma_path, "regulations"), translated_jsonl),
+    )
+    if has_changes(counts):
+        stamp_collection(chroma_path, "regulations")  # invalidates answers cached against the old index
+    print(f"Synced {translated_jsonl} into {chroma_path}: {counts}")
 
 if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("--jsonl", default ="data/translated_stream.jsonl", help="translated_stream.jsonl")
     p.add_argument("--chroma", default="chroma")
     p.add_argument("--reset", action="store_true")
+    p.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Chunks per embedding request.")
+    p.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Embedding requests in flight.")
     args = p.parse_args()
-    main(args.jsonl, args.chroma, args.reset)
+    main(args.jsonl, args.chroma, args.reset, args.batch_size, args.concurrency)
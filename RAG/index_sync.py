@@ -0,0 +1,174 @@
+"""
+Incremental, batched sync of a Chroma collection with its source records.
+
+Every record is stored with a content hash of its text and metadata. A sync
+embeds and upserts only records that are new or whose hash changed, deletes ids
+that are no longer in the source, and leaves everything else untouched, so an
+unchanged source costs one metadata read and no Ollama calls.
+
+Records are streamed: changed ones are grouped into batches of batch_size, up to
+concurrency batches are embedded against Ollama at once, and each batch is written
+to Chroma (in source order) as soon as its embeddings arrive. Progress is
+checkpointed after every write, so an interrupted run over the same source picks
+up where it stopped: the records it got through are skipped without comparing
+hashes, and batches it wrote carry their hashes and are never embedded twice.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_KEY = "content_hash"
+PAGE_SIZE = 1000
+BATCH_SIZE = 64
+CONCURRENCY = 4
+
+
+def content_hash(text: str, metadata: dict) -> str:
+    payload = json.dumps({"text": text, "metadata": metadata}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def stored_hashes(db) -> dict:
+    """id -> content hash (None for records indexed before hashes were stored)."""
+    hashes = {}
+    offset = 0
+    while True:
+        page = db.get(include=["metadatas"], limit=PAGE_SIZE, offset=offset)
+        for id_, meta in zip(page["ids"], page["metadatas"]):
+            hashes[id_] = (meta or {}).get(HASH_KEY)
+        if len(page["ids"]) < PAGE_SIZE:
+            return hashes
+        offset += PAGE_SIZE
+
+
+class Checkpoint:
+    """
+    How far a run over one source got: the number of source records fully handled.
+    Tied to the source's size and mtime, so an edited source starts over.
+    """
+
+    def __init__(self, path: str | None, source: str | None):
+        self.path = path
+        self.fingerprint = None
+        if source and os.path.exists(source):
+            st = os.stat(source)
+            self.fingerprint = {"source": os.path.abspath(source), "size": st.st_size, "mtime": st.st_mtime}
+        self.done = 0
+
+    def load(self) -> int:
+        """Records done by an interrupted run over the same source (0 if none)."""
+        if not self.path or not self.fingerprint:
+            return 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if saved.get("fingerprint") != self.fingerprint:
+            return 0
+        self.done = saved.get("done", 0)
+        return self.done
+
+    def save(self, done: int):
+        self.done = done
+        if not self.path or not self.fingerprint:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "done": done}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def checkpoint_path(chroma_path: str, collection_name: str) -> str:
+    return os.path.join(chroma_path, f"{collection_name}.ingest.json")
+
+
+def sync_records(db, records, embeddings=None, batch_size: int = BATCH_SIZE,
+                 concurrency: int = CONCURRENCY, checkpoint: Checkpoint | None = None) -> dict:
+    """
+    Make the collection hold exactly the streamed (id, text, metadata) records.
+    Returns counts of what changed plus throughput.
+    """
+    embeddings = embeddings or db.embeddings
+    checkpoint = checkpoint or Checkpoint(None, None)
+    resume_from = checkpoint.load()
+    if resume_from:
+        # The batches it wrote already carry their hashes, so they are skipped below
+        print(f"Resuming an interrupted run ({resume_from} records already written)")
+    started = time.perf_counter()
+    current = stored_hashes(db)
+    seen = set()
+    counts = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0, "embedded": 0, "resumed": resume_from}
+    in_flight = deque()
+
+    def write_oldest():
+        batch, end, fut = in_flight.popleft()
+        # Written directly so the embeddings computed in the pool are reused as-is
+        db._collection.upsert(
+            ids=[id_ for id_, _, _ in batch],
+            documents=[text for _, text, _ in batch],
+            metadatas=[meta for _, _, meta in batch],
+            embeddings=fut.result(),
+        )
+        counts["embedded"] += len(batch)
+        checkpoint.save(end)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed") as pool:
+        batch = []
+
+        def submit(end):
+            while len(in_flight) >= concurrency:
+                write_oldest()
+            texts = [text for _, text, _ in batch]
+            in_flight.append((list(batch), end, pool.submit(embeddings.embed_documents, texts)))
+            batch.clear()
+
+        n = 0
+        for n, (id_, text, meta) in enumerate(records, start=1):
+            if id_ in seen:
+                print(f"Duplicate id {id_!r}: keeping the first record")
+                continue
+            seen.add(id_)
+            if n <= resume_from:
+                counts["unchanged"] += 1  # written (or unchanged) in the interrupted run
+                continue
+            meta = dict(meta)
+            meta[HASH_KEY] = content_hash(text, {k: v for k, v in meta.items() if k != HASH_KEY})
+            if current.get(id_) == meta[HASH_KEY]:
+                counts["unchanged"] += 1
+                continue
+            counts["updated" if id_ in current else "added"] += 1
+            batch.append((id_, text, meta))
+            if len(batch) >= batch_size:
+                submit(n)
+        if batch:
+            submit(n)
+        while in_flight:
+            write_oldest()
+
+    stale = [id_ for id_ in current if id_ not in seen]
+    if stale:
+        db.delete(ids=stale)
+    counts["deleted"] = len(stale)
+    checkpoint.clear()
+
+    counts["seconds"] = round(time.perf_counter() - started, 2)
+    counts["chunks_per_second"] = round(counts["embedded"] / counts["seconds"], 1) if counts["seconds"] else 0.0
+    return counts
+
+
+def sync_collection(db, ids, texts, metadatas, **kwargs) -> dict:
+    """sync_records over parallel lists."""
+    return sync_records(db, zip(ids, texts, metadatas), **kwargs)
+
+
+def has_changes(counts: dict) -> bool:
+    # A resumed run finishes writes the interrupted one never stamped
+    return bool(counts["added"] or counts["updated"] or counts["deleted"] or counts.get("resumed"))
@@ -0,0 +1,33 @@
+"""
+Version stamps for the Chroma collections.
+
+The indexers write chroma/<collection>.version after every (re)index, and anything
+caching results derived from a collection compares against it to know when to drop
+them.
+"""
+import os
+import time
+import uuid
+
+
+def version_path(chroma_path: str, collection_name: str) -> str:
+    return os.path.join(chroma_path, f"{collection_name}.version")
+
+
+def stamp_collection(chroma_path: str, collection_name: str) -> str:
+    version = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(chroma_path, exist_ok=True)
+    tmp = version_path(chroma_path, collection_name) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, version_path(chroma_path, collection_name))
+    return version
+
+
+def collection_version(chroma_path: str, collection_name: str) -> str:
+    """Current stamp, or "unversioned" for a collection indexed before stamps existed."""
+    try:
+        with open(version_path(chroma_path, collection_name), encoding="utf-8") as f:
+            return f.read().strip() or "unversioned"
+    except FileNotFoundError:
+        return "unversioned"
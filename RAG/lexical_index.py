@@ -0,0 +1,137 @@
+"""
+In-process BM25 index over the translated study guide (the "regulations" collection).
+
+Dense similarity blurs exact tokens such as "ECTS", semester numbers, article numbers
+and course codes; BM25 ranks on them directly. query_data fuses both rankings with
+reciprocal rank fusion, and answers from the lexical ranking alone when the query's
+keywords single out one chunk clearly (see BM25Index.confident).
+
+The index is built from the same JSONL the Chroma collection is indexed from, with
+the same ids, so both rankings refer to the same chunks.
+"""
+import heapq
+import json
+import math
+import re
+from collections import Counter, defaultdict
+
+from langchain_core.documents import Document
+
+K1 = 1.2
+B = 0.75
+RRF_K = 60
+# Lexical-only fast path: share of the query's keyword weight the top chunk must
+# cover, and how far it must lead the runner-up
+MIN_COVERAGE = 0.8
+MIN_LEAD = 1.2
+
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "have", "how", "i", "if", "in", "is", "it", "me", "my", "of", "on", "or", "please", "tell",
+    "that", "the", "there", "this", "to", "was", "what", "when", "where", "which", "who", "will",
+    "with", "would", "you",
+}
+ORDINALS = {
+    "first": "1", "second": "2", "third": "3", "fourth": "4", "fifth": "5", "sixth": "6",
+    "seventh": "7", "eighth": "8", "ninth": "9", "tenth": "10",
+}
+ORDINAL_SUFFIX_RE = re.compile(r"^(\d+)(?:st|nd|rd|th)$")
+
+
+def tokenize(text: str):
+    tokens = []
+    for tok in re.findall(r"\w+", text.lower()):
+        if tok in STOPWORDS:
+            continue
+        tok = ORDINALS.get(tok, tok)
+        m = ORDINAL_SUFFIX_RE.match(tok)
+        if m:
+            tok = m.group(1)  # "6th" and "sixth" both index as "6"
+        elif len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+            tok = tok[:-1]
+        tokens.append(tok)
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, docs):
+        self.docs = list(docs)
+        self.postings = defaultdict(list)  # term -> [(doc index, term frequency)]
+        self.lengths = []
+        for i, d in enumerate(self.docs):
+            counts = Counter(tokenize(d.page_content))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((i, tf))
+        n = len(self.docs)
+        self.avg_length = (sum(self.lengths) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for term, p in self.postings.items()
+        }
+        # An unseen query term weighs like the rarest indexed one
+        self.max_idf = max(self.idf.values(), default=0.0)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def scores(self, query: str) -> dict:
+        """doc index -> BM25 score for every chunk that shares a term with the query."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                norm = K1 * (1 - B + B * self.lengths[i] / self.avg_length)
+                scores[i] += idf * tf * (K1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int):
+        """[(score, Document)] best first."""
+        top = heapq.nlargest(k, self.scores(query).items(), key=lambda item: item[1])
+        return [(score, self.docs[i]) for i, score in top]
+
+    def coverage(self, query: str, doc) -> float:
+        """Share of the query's idf weight whose terms occur in doc."""
+        terms = set(tokenize(query))
+        if not terms:
+            return 0.0
+        present = set(tokenize(doc.page_content))
+        total = sum(self.idf.get(t, self.max_idf) for t in terms)
+        return sum(self.idf[t] for t in terms if t in present) / total if total else 0.0
+
+    def confident(self, query: str, results) -> bool:
+        """True when the top lexical hit matches the query's keywords and clearly leads."""
+        if not results:
+            return False
+        top_score, top_doc = results[0]
+        if len(results) > 1 and top_score < MIN_LEAD * results[1][0]:
+            return False
+        return self.coverage(query, top_doc) >= MIN_COVERAGE
+
+
+def reciprocal_rank_fusion(rankings, key, k: int = RRF_K):
+    """Merge ranked lists of documents; a document's score is the sum of 1 / (k + rank)."""
+    scores, first_seen = defaultdict(float), {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            doc_key = key(doc)
+            scores[doc_key] += 1.0 / (k + rank)
+            first_seen.setdefault(doc_key, doc)
+    order = sorted(scores, key=lambda doc_key: -scores[doc_key])
+    return [first_seen[doc_key] for doc_key in order]
+
+
+def load_index(path: str) -> BM25Index:
+    docs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            id_ = f"{rec['page']}_{rec['chunk_id']}"
+            docs.append(Document(
+                page_content=rec["text"],
+                metadata={"page": rec["page"], "chunk_id": rec["chunk_id"], "id": id_},
+            ))
+    return BM25Index(docs)
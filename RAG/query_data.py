@@ -1,77 +1,136 @@
 import argparse
-from typing import List, Tuple
-from langchain_chroma import Chroma
+import time
 from langchain.prompts import PromptTemplate
-from langchain_ollama import OllamaLLM
-from RAG.get_embedding_function import get_embedding_function
+from RAG.resources import get_vectorstore, get_llm, get_embeddings, get_semantic_cache, get_lexical_index
+from RAG.rerank import rerank_documents, doc_id, RERANK_MODES, DEFAULT_MODE
+from RAG.lexical_index import reciprocal_rank_fusion
+from RAG.context_packing import pack_context, TOKEN_BUDGET, SEPARATOR
+from tracing import span, observe
 
-CHROMA_PATH = "chroma"
 PROMPT_TEMPLATE = (
     "Answer the question based only on the following context:\n"
     "{context}\n\n"
     "---\n\n"
     "Answer the question based on the above context: {question}"
 )
-RERANK_PROMPT = (
-    "Query: {question}\n\n"
-    "Document:\n{doc_text}\n\n"
-    "On a scale from 0 (not relevant) to 1 (highly relevant), "
-    "rate how relevant this document is to the query above. "
-    "Respond with only the numeric score."
-)
+_prompt = PromptTemplate(input_variables=["context", "question"], template=PROMPT_TEMPLATE)
 
 
-def rerank_documents(
-    docs: List, question: str, model_name: str, temperature: float
-) -> List:
+def retrieve(query_text: str, k: int, model_name: str, temperature: float, rerank: bool | str,
+             rerank_mode: str = DEFAULT_MODE, use_cache: bool = True, token_budget: int | None = TOKEN_BUDGET,
+             hybrid: bool = True, candidates_only: bool = False) -> dict:
     """
-    Use the LLM to score each document for relevance and return docs sorted by score descending.
+    Everything before generation: embed, check the semantic cache, search, rerank and
+    pack the context (token_budget=None joins the top k verbatim instead).
+    With hybrid, BM25 and vector rankings are fused, and a query whose keywords single
+    out one chunk is answered from the lexical ranking alone. rerank="auto" only
+    reranks when that first-stage ranking is uncertain.
+    candidates_only stops after the embedding and the first-stage search, without the
+    semantic cache or any LLM call: that is what runs ahead of time on a partial
+    transcript, and query_rag / stream_rag finish it (finish_retrieval) for the final one.
     """
-    llm = OllamaLLM(model=model_name, temperature=temperature)
-    prompt = PromptTemplate(input_variables=["question", "doc_text"], template=RERANK_PROMPT)
-    scored: List[Tuple[float, object]] = []
-    for d in docs:
-        text = d.page_content
-        # Format rerank prompt
-        formatted = prompt.format(question=question, doc_text=text)
-        resp = llm.invoke(formatted).strip()
-        try:
-            score = float(resp)
-        except ValueError:
-            score = 0.0
-        scored.append((score, d))
-    # Sort by score descending
-    scored.sort(key=lambda x: x[0], reverse=True)
-    # Extract sorted docs
-    return [d for score, d in scored]
-
-
-def query_rag(query_text: str, k: int, model_name: str, temperature: float, rerank: bool):
-    # Initialize embeddings & vector store
-    embeddings = get_embedding_function()
-    db = Chroma(
-        collection_name="regulations",
-        persist_directory=CHROMA_PATH,
-        embedding_function=embeddings
-    )
-
-    # Retrieve top-k relevant documents
-    retriever = db.as_retriever(search_kwargs={"k": k * (2 if rerank else 1)})
-    initial_docs = retriever.invoke(query_text)
-
+    started = time.perf_counter()
+    # Shared vector store (persistent client + embeddings are reused across calls)
+    db = get_vectorstore("regulations")
+    index = get_lexical_index() if hybrid else None
+    if index is None:
+        hybrid = False  # no BM25 index without the JSONL: vector search only
+    with span("embed"):
+        query_vec = get_embeddings().embed_query(query_text)
+
+    # A semantically equivalent question answered with the same settings can be replayed
+    cache = get_semantic_cache()
+    rerank_label = (f"auto-{rerank_mode}" if rerank == "auto" else rerank_mode) if rerank else "off"
+    config = (f"k={k}|model={model_name}|temp={temperature}|rerank={rerank_label}|budget={token_budget}"
+              f"|hybrid={hybrid}")
+    retrieval = {"query_vec": query_vec, "config": config, "hit": None, "docs": [], "packed": None,
+                 "path": "vector", "reranked": False, "candidates": None, "agree": False}
+    if use_cache and not candidates_only:
+        hit = cache.lookup(query_vec, config)
+        if hit:
+            print(f"[semantic-cache] hit (similarity {hit.similarity:.3f}), saved {hit.saved_seconds:.1f}s | {cache.stats()}")
+            retrieval["hit"] = hit
+            return retrieval
+
+    # Retrieve a larger candidate set (reusing the query embedding computed above);
+    # reranking or MMR selection narrows it down to k
+    n_candidates = k * (2 if rerank or token_budget else 1)
+    lexical, agree = [], False
+    if hybrid:
+        with span("lexical"):
+            scored = index.search(query_text, n_candidates)
+        lexical = [d for _, d in scored]
+        if index.confident(query_text, scored):
+            retrieval["path"] = "lexical"
+            docs = lexical
+
+    if retrieval["path"] != "lexical":
+        with span("search"):
+            docs = db.similarity_search_by_vector(query_vec, k=n_candidates)
+        if lexical:
+            # Both retrievers putting the same chunk first is a confident first stage
+            agree = bool(docs) and doc_id(docs[0]) == doc_id(lexical[0])
+            docs = reciprocal_rank_fusion([docs, lexical], key=doc_id)[:n_candidates]
+            retrieval["path"] = "hybrid"
+
+    retrieval["candidates"], retrieval["agree"] = docs, agree
+    retrieval["seconds"] = time.perf_counter() - started
+    if candidates_only:
+        return retrieval
+    return _second_stage(retrieval, query_text, k, model_name, temperature, rerank, rerank_mode, token_budget)
+
+
+def _second_stage(retrieval: dict, query_text: str, k: int, model_name: str, temperature: float,
+                  rerank: bool | str, rerank_mode: str, token_budget: int | None) -> dict:
+    started = time.perf_counter()
+    docs = retrieval["candidates"]
     # Optionally rerank a larger set down to k
-    docs = initial_docs
-    if rerank:
-        docs = rerank_documents(initial_docs, query_text, model_name, temperature)[:k]
+    if rerank is True or (rerank == "auto" and retrieval["path"] != "lexical" and not retrieval["agree"]):
+        with span("rerank"):
+            docs = rerank_documents(docs, query_text, model_name, temperature, k=k, mode=rerank_mode)
+        retrieval["reranked"] = True
+
+    if token_budget:
+        with span("pack"):
+            packed = pack_context(docs, retrieval["query_vec"], get_vectorstore("regulations"), k=k,
+                                  token_budget=token_budget)
+        print(f"[context] {packed['tokens_before']} → {packed['tokens_after']} tokens "
+              f"(saved {packed['tokens_before'] - packed['tokens_after']})")
+        retrieval["packed"] = packed
+
+    retrieval["docs"] = docs[:k]
+    retrieval["candidates"] = None
+    retrieval["seconds"] += time.perf_counter() - started
+    return retrieval
+
+
+def finish_retrieval(retrieval: dict, query_text: str, k: int, model_name: str, temperature: float,
+                     rerank: bool | str, rerank_mode: str = DEFAULT_MODE, use_cache: bool = True,
+                     token_budget: int | None = TOKEN_BUDGET) -> dict:
+    """
+    Complete a candidates_only retrieval for the final transcript: check the semantic
+    cache, then rerank and pack the speculated candidates. A full retrieval is returned as is.
+    """
+    if retrieval["hit"] or retrieval["candidates"] is None:
+        return retrieval
+    retrieval = dict(retrieval)
+    if use_cache:
+        cache = get_semantic_cache()
+        hit = cache.lookup(retrieval["query_vec"], retrieval["config"])
+        if hit:
+            print(f"[semantic-cache] hit (similarity {hit.similarity:.3f}), saved {hit.saved_seconds:.1f}s | {cache.stats()}")
+            retrieval["hit"] = hit
+            return retrieval
+    return _second_stage(retrieval, query_text, k, model_name, temperature, rerank, rerank_mode, token_budget)
+
+
+def _build_prompt(docs, query_text: str, packed: dict = None):
+    if packed:
+        return _prompt.format(context=packed["context"], question=query_text), packed["sources"]
 
     # Build context
-    context = "\n\n---\n\n".join([d.page_content for d in docs])
-
-    # Prepare final answer prompt and LLM
-    prompt = PromptTemplate(input_variables=["context", "question"], template=PROMPT_TEMPLATE)
-    llm = OllamaLLM(model=model_name, temperature=temperature)
-    formatted_prompt = prompt.format(context=context, question=query_text)
-    answer = llm.invoke(formatted_prompt)
+    context = SEPARATOR.join([d.page_content for d in docs])
+    formatted_prompt = _prompt.format(context=context, question=query_text)
 
     # Extract source IDs
     sources = []
@@ -79,17 +138,72 @@ def query_rag(query_text: str, k: int, model_name: str, temperature: float, rera
         meta = d.metadata or {}
         src_id = meta.get("id") or f"{meta.get('page')}_{meta.get('chunk_id')}" or meta.get("source", "unknown")
         sources.append(src_id)
-
+    return formatted_prompt, sources
+
+
+def query_rag(query_text: str, k: int, model_name: str, temperature: float, rerank: bool | str,
+              rerank_mode: str = DEFAULT_MODE, use_cache: bool = True, retrieval: dict = None,
+              token_budget: int | None = TOKEN_BUDGET, hybrid: bool = True):
+    if retrieval is None:
+        retrieval = retrieve(query_text, k, model_name, temperature, rerank, rerank_mode, use_cache, token_budget,
+                             hybrid)
+    else:
+        retrieval = finish_retrieval(retrieval, query_text, k, model_name, temperature, rerank, rerank_mode,
+                                     use_cache, token_budget)
+    if retrieval["hit"]:
+        return retrieval["hit"].answer, retrieval["hit"].sources
+
+    started = time.perf_counter()
+    prompt, sources = _build_prompt(retrieval["docs"], query_text, retrieval.get("packed"))
+    with span("generate"):
+        answer = get_llm(model_name, temperature).invoke(prompt)
+
+    if use_cache:
+        get_semantic_cache().add(query_text, retrieval["query_vec"], retrieval["config"], answer, sources,
+                                 retrieval["seconds"] + time.perf_counter() - started)
     return answer, sources
 
 
+def stream_rag(query_text: str, k: int, model_name: str, temperature: float, rerank: bool | str,
+               rerank_mode: str = DEFAULT_MODE, use_cache: bool = True, retrieval: dict = None,
+               token_budget: int | None = TOKEN_BUDGET, hybrid: bool = True):
+    """Like query_rag, but yields the answer text as Ollama generates it."""
+    if retrieval is None:
+        retrieval = retrieve(query_text, k, model_name, temperature, rerank, rerank_mode, use_cache, token_budget,
+                             hybrid)
+    else:
+        retrieval = finish_retrieval(retrieval, query_text, k, model_name, temperature, rerank, rerank_mode,
+                                     use_cache, token_budget)
+    if retrieval["hit"]:
+        yield retrieval["hit"].answer
+        return
+
+    started = time.perf_counter()
+    prompt, sources = _build_prompt(retrieval["docs"], query_text, retrieval.get("packed"))
+    pieces = []
+    for chunk in get_llm(model_name, temperature).stream(prompt):
+        pieces.append(chunk)
+        yield chunk
+    observe("generate", time.perf_counter() - started)
+
+    if use_cache:
+        get_semantic_cache().add(query_text, retrieval["query_vec"], retrieval["config"], "".join(pieces), sources,
+                                 retrieval["seconds"] + time.perf_counter() - started)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Query RAG with optional LLM reranker")
     parser.add_argument("query_text", help="The question to ask the RAG system.")
     parser.add_argument("--k", type=int, default=5, help="Number of documents to retrieve.")
     parser.add_argument("--model", default="llama3", help="Ollama model to use (e.g., llama3, mixtral).")
     parser.add_argument("--temp", type=float, default=0.2, help="LLM temperature.")
-    parser.add_argument("--rerank", action="store_true", help="Enable LLM-based reranking.")
+    parser.add_argument("--rerank", nargs="?", const=True, default=False, choices=[True, "auto"],
+                        help="Enable LLM-based reranking ('auto': only when the first stage is uncertain).")
+    parser.add_argument("--no-hybrid", action="store_true", help="Vector search only (no BM25 fusion).")
+    parser.add_argument("--rerank-mode", choices=RERANK_MODES, default=DEFAULT_MODE, help="How candidates are scored.")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the semantic answer cache.")
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET,
+                        help="Context token budget (0 joins the top k verbatim).")
     args = parser.parse_args()
 
     answer, sources = query_rag(
@@ -97,7 +211,11 @@ def main():
         k=args.k,
         model_name=args.model,
         temperature=args.temp,
-        rerank=args.rerank
+        rerank=args.rerank,
+        rerank_mode=args.rerank_mode,
+        use_cache=not args.no_cache,
+        token_budget=args.token_budget or None,
+        hybrid=not args.no_hybrid,
     )
 
     print("Answer:", answer)
@@ -0,0 +1,203 @@
+"""
+LLM reranking of retrieved chunks.
+
+Modes:
+  - "serial":     one generation per candidate, one after another (the original behaviour)
+  - "concurrent": one generation per candidate, at most max_in_flight at a time; stops early
+                  once k candidates hold the maximum score, since nothing can outrank them.
+                  Ollama only overlaps them when started with OLLAMA_NUM_PARALLEL > 1.
+  - "batch":      a single prompt that scores every candidate in one generation; candidates
+                  the model did not score fall back to "concurrent"
+
+Scores are cached per (query, chunk id, chunk text), so a repeated question skips the LLM
+entirely and a chunk whose text changed on a re-index is scored again.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Tuple
+
+from langchain_core.prompts import PromptTemplate
+from RAG.resources import get_llm
+from tracing import span, bind
+
+RERANK_MODES = ("serial", "concurrent", "batch")
+DEFAULT_MODE = "batch"
+MAX_IN_FLIGHT = 4
+MAX_SCORE = 1.0
+# Each candidate is cut to this many characters in the batched prompt to bound its length
+MAX_BATCH_DOC_CHARS = 1200
+
+RERANK_PROMPT = (
+    "Query: {question}\n\n"
+    "Document:\n{doc_text}\n\n"
+    "On a scale from 0 (not relevant) to 1 (highly relevant), "
+    "rate how relevant this document is to the query above. "
+    "Respond with only the numeric score."
+)
+BATCH_RERANK_PROMPT = (
+    "Query: {question}\n\n"
+    "Documents:\n{documents}\n\n"
+    "On a scale from 0 (not relevant) to 1 (highly relevant), "
+    "rate how relevant each document is to the query above. "
+    "Respond with one line per document in the form '<number>: <score>' and nothing else."
+)
+SCORE_RE = re.compile(r"\d*\.?\d+")
+BATCH_LINE_RE = re.compile(r"\[?(\d+)\]?\s*[:=\-]\s*(\d*\.?\d+)")
+
+_prompt = PromptTemplate(input_variables=["question", "doc_text"], template=RERANK_PROMPT)
+_batch_prompt = PromptTemplate(input_variables=["question", "documents"], template=BATCH_RERANK_PROMPT)
+
+
+class ScoreCache:
+    """Thread-safe LRU of relevance scores keyed by (normalized query, chunk key); see score_key."""
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(question: str, chunk_id: str):
+        return " ".join(question.lower().split()), chunk_id
+
+    def get(self, question: str, chunk_id: str):
+        k = self.key(question, chunk_id)
+        with self._lock:
+            if k in self._data:
+                self._data.move_to_end(k)
+                self.hits += 1
+                return self._data[k]
+            self.misses += 1
+            return None
+
+    def put(self, question: str, chunk_id: str, score: float):
+        with self._lock:
+            self._data[self.key(question, chunk_id)] = score
+            self._data.move_to_end(self.key(question, chunk_id))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+SCORE_CACHE = ScoreCache()
+_executor = ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT, thread_name_prefix="rerank")
+
+
+def doc_id(d) -> str:
+    meta = d.metadata or {}
+    return meta.get("id") or getattr(d, "id", None) or f"{meta.get('page')}_{meta.get('chunk_id')}"
+
+
+def score_key(d) -> str:
+    """Chunk id plus a hash of its text: ids are positional, and a re-index can reuse one for new text."""
+    digest = hashlib.sha1(d.page_content.encode("utf-8")).hexdigest()[:16]
+    return f"{doc_id(d)}@{digest}"
+
+
+def parse_score(resp: str) -> float:
+    m = SCORE_RE.search(resp or "")
+    if not m:
+        return 0.0
+    return min(max(float(m.group()), 0.0), MAX_SCORE)
+
+
+def score_one(llm, question: str, d) -> float:
+    with span("rerank_call"):
+        resp = llm.invoke(_prompt.format(question=question, doc_text=d.page_content))
+    score = parse_score(resp.strip())
+    SCORE_CACHE.put(question, score_key(d), score)
+    return score
+
+
+def _score_serial(llm, question, pending, scores):
+    for i, d in pending:
+        scores[i] = score_one(llm, question, d)
+
+
+def _score_concurrent(llm, question, pending, scores, k, max_in_flight):
+    settled = sum(1 for s in scores.values() if s >= MAX_SCORE)
+    queue = list(pending)
+    in_flight = {}
+    while queue or in_flight:
+        while queue and len(in_flight) < max_in_flight:
+            i, d = queue.pop(0)
+            in_flight[_executor.submit(bind(score_one), llm, question, d)] = i
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for fut in done:
+            i = in_flight.pop(fut)
+            try:
+                scores[i] = fut.result()
+            except Exception as e:
+                print("[rerank] Scoring failed:", repr(e))
+                scores[i] = 0.0
+            if scores[i] >= MAX_SCORE:
+                settled += 1
+        if k is not None and settled >= k:
+            # top-k is settled: every remaining candidate could at best tie with these
+            for fut in in_flight:
+                fut.cancel()
+            break
+
+
+def _score_batch(llm, question, pending, scores):
+    documents = "\n\n".join(
+        f"[{n}] {d.page_content[:MAX_BATCH_DOC_CHARS]}" for n, (_, d) in enumerate(pending, start=1)
+    )
+    with span("rerank_call"):
+        resp = llm.invoke(_batch_prompt.format(question=question, documents=documents))
+    for m in BATCH_LINE_RE.finditer(resp or ""):
+        n = int(m.group(1))
+        if 1 <= n <= len(pending):
+            i, d = pending[n - 1]
+            scores[i] = min(max(float(m.group(2)), 0.0), MAX_SCORE)
+            SCORE_CACHE.put(question, score_key(d), scores[i])
+
+
+def rerank_documents(
+    docs: List, question: str, model_name: str, temperature: float,
+    k: int | None = None, mode: str = DEFAULT_MODE, max_in_flight: int = MAX_IN_FLIGHT,
+) -> List:
+    """
+    Score each document for relevance with the LLM and return docs sorted by score descending
+    (ties keep retrieval order). With k, only the top k are returned.
+    """
+    if mode not in RERANK_MODES:
+        raise ValueError(f"Unknown rerank mode {mode!r}; expected one of {RERANK_MODES}")
+    llm = get_llm(model_name, temperature)
+
+    scores = {}
+    pending: List[Tuple[int, object]] = []
+    for i, d in enumerate(docs):
+        cached = SCORE_CACHE.get(question, score_key(d))
+        if cached is None:
+            pending.append((i, d))
+        else:
+            scores[i] = cached
+
+    if pending:
+        if mode == "serial":
+            _score_serial(llm, question, pending, scores)
+        elif mode == "batch":
+            _score_batch(llm, question, pending, scores)
+            missing = [(i, d) for i, d in pending if i not in scores]
+            if missing:
+                _score_concurrent(llm, question, missing, scores, k, max_in_flight)
+        else:
+            _score_concurrent(llm, question, pending, scores, k, max_in_flight)
+
+    # Candidates cut off early were never scored: they rank after every scored one
+    order = sorted(range(len(docs)), key=lambda i: (-(scores.get(i, -1.0)), i))
+    ranked = [docs[i] for i in order]
+    return ranked[:k] if k is not None else ranked
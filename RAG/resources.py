@@ -0,0 +1,152 @@
+"""
+Process-wide registry of warm clients shared by every handler.
+
+One persistent Chroma client serves both collections ("regulations" and "exams"),
+and embedding / LLM clients are created once per configuration and reused, so each
+of them keeps its HTTP connection pool to Ollama alive across caller turns.
+
+The Chroma client and the BM25 index belong to the current data generation (see
+reloader): when an indexer stamps a new collection version they are reopened /
+rebuilt in the background, and turns already running keep the ones they started with.
+"""
+import os
+import threading
+
+import chromadb
+from chromadb.api.client import SharedSystemClient
+from langchain_chroma import Chroma
+from langchain_ollama import OllamaEmbeddings, OllamaLLM
+
+import reloader
+from RAG.semantic_cache import SemanticCache
+from RAG.index_version import version_path
+from RAG.lexical_index import BM25Index, load_index
+
+CHROMA_PATH = "chroma"
+EMBEDDING_MODEL = "nomic-embed-text"
+COLLECTIONS = ("regulations", "exams")
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", os.path.join(CHROMA_PATH, "semantic_cache.json"))
+REGULATIONS_JSONL = "data/translated_stream.jsonl"
+# Seconds Ollama keeps a model loaded after our last request to it (-1: until it is stopped)
+KEEP_ALIVE = int(os.getenv("OLLAMA_KEEP_ALIVE", "1800"))
+
+_lock = threading.RLock()
+_embeddings = {}
+_llms = {}
+_semantic_cache = None
+
+
+def get_embeddings(model_name: str = EMBEDDING_MODEL) -> OllamaEmbeddings:
+    with _lock:
+        emb = _embeddings.get(model_name)
+        if emb is None:
+            emb = OllamaEmbeddings(model=model_name, keep_alive=KEEP_ALIVE)
+            _embeddings[model_name] = emb
+        return emb
+
+
+class ChromaStores:
+    """A Chroma client opened on the index as it is on disk, and its collection wrappers."""
+
+    def __init__(self, path: str = CHROMA_PATH):
+        # PersistentClient shares one system per path, and that system does not see what the
+        # indexer processes wrote after it opened; forget this path's (and only this path's)
+        # so this client opens a fresh one. The generation that held the old one stops it
+        # in close() once its turns have finished.
+        SharedSystemClient._identifier_to_system.pop(str(path), None)
+        self.path = path
+        self.client = chromadb.PersistentClient(path=path)
+        self.system = self.client._system
+        self._lock = threading.Lock()
+        self._vectorstores = {}
+
+    def vectorstore(self, collection_name: str) -> Chroma:
+        with self._lock:
+            db = self._vectorstores.get(collection_name)
+            if db is None:
+                db = Chroma(
+                    client=self.client,
+                    collection_name=collection_name,
+                    embedding_function=get_embeddings(),
+                )
+                self._vectorstores[collection_name] = db
+            return db
+
+    def close(self):
+        with self._lock:
+            self._vectorstores.clear()
+        self.system.stop()
+
+
+def get_chroma_client():
+    return reloader.resolve("chroma").client
+
+
+def get_vectorstore(collection_name: str) -> Chroma:
+    return reloader.resolve("chroma").vectorstore(collection_name)
+
+
+def get_llm(model_name: str = "llama3", temperature: float = 0.0, num_predict: int | None = None) -> OllamaLLM:
+    """
+    Shared OllamaLLM per (model, temperature, num_predict). The underlying ollama
+    client is thread-safe, so concurrent turns can invoke the same instance.
+    """
+    key = (model_name, float(temperature), num_predict)
+    with _lock:
+        llm = _llms.get(key)
+        if llm is None:
+            llm = OllamaLLM(model=model_name, temperature=temperature, num_predict=num_predict,
+                            keep_alive=KEEP_ALIVE)
+            _llms[key] = llm
+        return llm
+
+
+def load_llm(model_name: str = "llama3", prompt: str = ""):
+    """
+    Have Ollama load the model (or keep it loaded). With a prompt, the prompt is also
+    evaluated into the model's prompt cache, so a later prompt starting with the same
+    text only pays for the rest; one token is generated and discarded.
+    """
+    get_llm(model_name, num_predict=1).invoke(prompt)
+
+
+def load_embeddings(model_name: str = EMBEDDING_MODEL):
+    get_embeddings(model_name).embed_query("warm up")
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Answer cache for the "regulations" collection, loaded from disk on first use."""
+    global _semantic_cache
+    with _lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache(SEMANTIC_CACHE_PATH, CHROMA_PATH, "regulations")
+        return _semantic_cache
+
+
+def _build_lexical_index() -> BM25Index | None:
+    if not os.path.exists(REGULATIONS_JSONL):
+        print(f"[lexical] WARNING: {REGULATIONS_JSONL} not found, regulations retrieval is vector-only "
+              f"until it is written")
+        return None
+    return load_index(REGULATIONS_JSONL)
+
+
+def get_lexical_index() -> BM25Index | None:
+    """
+    BM25 index of the regulations chunks, rebuilt when the collection is re-indexed or the
+    JSONL changes; None while the JSONL does not exist.
+    """
+    return reloader.resolve("lexical")
+
+
+def warm_up():
+    """Open the Chroma client and both collections ahead of the first call."""
+    for name in COLLECTIONS:
+        get_vectorstore(name)
+    get_lexical_index()
+
+
+reloader.register("chroma", ChromaStores, lambda: [version_path(CHROMA_PATH, c) for c in COLLECTIONS],
+                  close=ChromaStores.close)
+reloader.register("lexical", _build_lexical_index,
+                  lambda: [REGULATIONS_JSONL, version_path(CHROMA_PATH, "regulations")])
@@ -0,0 +1,186 @@
+"""
+Semantic answer cache for the regulations RAG path.
+
+Past answers are looked up by cosine similarity of the query embedding, so
+"ECTS limit for 6th semester" and "what's the ECTS limit in the sixth semester"
+share one entry. Entries expire after a TTL, the least recently used are evicted,
+and the cache is persisted to a JSON file next to the Chroma index - in the
+background, at most once per SAVE_DELAY_SECONDS, and at exit - so answering never
+waits on the disk. Every entry
+carries the collection version stamp it was answered against, so re-indexing with
+RAG/embed_populatedb.py drops them automatically.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from RAG.index_version import collection_version
+
+SIMILARITY_THRESHOLD = 0.92
+MAX_ENTRIES = 500
+TTL_SECONDS = 7 * 24 * 3600
+SAVE_DELAY_SECONDS = 5.0  # changes within this window are written together
+
+
+class CacheHit:
+    __slots__ = ("answer", "sources", "similarity", "saved_seconds")
+
+    def __init__(self, answer, sources, similarity, saved_seconds):
+        self.answer = answer
+        self.sources = sources
+        self.similarity = similarity
+        self.saved_seconds = saved_seconds
+
+
+class SemanticCache:
+    def __init__(self, path: str, chroma_path: str, collection_name: str,
+                 threshold: float = SIMILARITY_THRESHOLD, max_entries: int = MAX_ENTRIES,
+                 ttl_seconds: float = TTL_SECONDS, save_delay: float = SAVE_DELAY_SECONDS):
+        self.path = path
+        self.chroma_path = chroma_path
+        self.collection_name = collection_name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._writer = None
+        self._entries = OrderedDict()  # normalized query -> entry dict, oldest use first
+        self._matrix = None  # unit-normalized embeddings, rows in _keys order
+        self._keys = []
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._load()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        for entry in stored.get("entries", []):
+            self._entries[entry["query"]] = entry
+        self._purge(collection_version(self.chroma_path, self.collection_name))
+
+    def _save(self, entries):
+        tmp = self.path + ".tmp"
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def _mark_dirty(self):
+        """Schedule a background write; called with self._lock held."""
+        self._dirty.set()
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="semantic-cache-writer", daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(self.save_delay)
+            try:
+                self.flush()
+            except OSError as e:
+                print("[semantic cache] Save failed:", repr(e))
+
+    def flush(self):
+        """Write the cache to disk if it changed since the last write."""
+        with self._save_lock:
+            if not self._dirty.is_set():
+                return
+            self._dirty.clear()  # a change made while writing sets it again
+            with self._lock:
+                entries = list(self._entries.values())  # entries are replaced, never mutated
+            self._save(entries)
+
+    def _purge(self, version: str):
+        """Drop expired entries and entries answered against another index version."""
+        now = time.time()
+        stale = [q for q, e in self._entries.items()
+                 if e["version"] != version or now - e["created"] > self.ttl_seconds]
+        for q in stale:
+            del self._entries[q]
+        if stale:
+            self._matrix = None
+        return bool(stale)
+
+    def _rebuild_matrix(self):
+        self._keys = list(self._entries)
+        if not self._keys:
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+            return
+        m = np.asarray([self._entries[q]["embedding"] for q in self._keys], dtype=np.float32)
+        self._matrix = m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+
+    def lookup(self, query_embedding, config: str) -> CacheHit | None:
+        version = collection_version(self.chroma_path, self.collection_name)
+        with self._lock:
+            if self._purge(version):
+                self._mark_dirty()
+            if self._matrix is None:
+                self._rebuild_matrix()
+            best = None
+            if self._keys:
+                v = np.asarray(query_embedding, dtype=np.float32)
+                sims = self._matrix @ (v / max(float(np.linalg.norm(v)), 1e-12))
+                for i in np.argsort(-sims):
+                    if sims[i] < self.threshold:
+                        break
+                    entry = self._entries[self._keys[i]]
+                    if entry["config"] == config:
+                        best = (entry, float(sims[i]))
+                        break
+            if best is None:
+                self.misses += 1
+                return None
+            entry, sim = best
+            self._entries.move_to_end(entry["query"])
+            self.hits += 1
+            self.saved_seconds += entry["latency"]
+            return CacheHit(entry["answer"], entry["sources"], sim, entry["latency"])
+
+    def add(self, query: str, query_embedding, config: str, answer: str, sources, latency: float):
+        version = collection_version(self.chroma_path, self.collection_name)
+        key = self.normalize(query)
+        with self._lock:
+            self._entries[key] = {
+                "query": key,
+                "embedding": [float(x) for x in query_embedding],
+                "config": config,
+                "answer": answer,
+                "sources": list(sources),
+                "latency": latency,
+                "created": time.time(),
+                "version": version,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+            self._mark_dirty()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 2),
+            }
@@ -2,45 +2,256 @@
 """
 Stream-optimized script to extract, chunk, translate (Greek→English), and save PDF text in JSONL for RAG ingestion.
 Uses googletrans for in-code translation without requiring Hugging Face model downloads.
+
+Pages are extracted in a process pool and chunks are translated concurrently (bounded, with
+retry and exponential backoff). Every translation is kept in a persistent cache keyed by the
+chunk's content hash, and records already in the output JSONL are skipped, so an interrupted
+or repeated run only translates what is missing. Chunks that still fail are left out of the
+output (instead of being written as empty text) and are retried on the next run.
 """
 import argparse
+import hashlib
 import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
 import pdfplumber
-from googletrans import Translator
 
-def stream_chunks(pdf_path: str, max_chars: int, overlap: int):
+DEFAULT_CACHE = "data/translation_cache.jsonl"
+PAGES_PER_TASK = 8
+
+
+# --- translator backends ---------------------------------------------------
+
+class TranslatorBackend(ABC):
+    """Translates one chunk of text; name is part of the cache key."""
+    name = "base"
+
+    @abstractmethod
+    def translate(self, text: str, src: str, dest: str) -> str:
+        ...
+
+
+class GoogleBackend(TranslatorBackend):
+    name = "google"
+
+    def __init__(self):
+        from googletrans import Translator
+        self._factory = Translator
+        # googletrans' Translator is not thread-safe: each translating thread gets its own
+        # (and its own HTTP session), so up to --concurrency requests are in flight at once
+        self._local = threading.local()
+
+    def translate(self, text, src, dest):
+        translator = getattr(self._local, "translator", None)
+        if translator is None:
+            translator = self._local.translator = self._factory()
+        return translator.translate(text, src=src, dest=dest).text
+
+
+class IdentityBackend(TranslatorBackend):
+    """Offline stand-in: returns the text unchanged, for tests and dry runs."""
+    name = "identity"
+
+    def translate(self, text, src, dest):
+        return text
+
+
+BACKENDS = {"google": GoogleBackend, "identity": IdentityBackend}
+
+
+def translate_with_retry(backend, text, src="el", dest="en", retries: int = 4, base_delay: float = 1.0) -> str:
+    """Retries transient failures with exponential backoff plus jitter; re-raises the last one."""
+    for attempt in range(retries + 1):
+        try:
+            out = backend.translate(text, src, dest)
+            if not out and text.strip():
+                raise ValueError("empty translation")
+            return out
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(base_delay * 2 ** attempt * (1 + random.random() / 2))
+
+
+# --- translation cache -----------------------------------------------------
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """Append-only JSONL of {key, text}; the key covers backend, languages and chunk content."""
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self._data = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line of an interrupted run
+                    self._data[rec["key"]] = rec["text"]
+
+    @staticmethod
+    def key(backend, src, dest, text) -> str:
+        return f"{backend.name}:{src}:{dest}:{chunk_hash(text)}"
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def put(self, key, text):
+        with self._lock:
+            self._data[key] = text
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "text": text}, ensure_ascii=False) + "\n")
+
+    def __len__(self):
+        return len(self._data)
+
+
+# --- extraction ------------------------------------------------------------
+
+def extract_pages(pdf_path: str, first: int, last: int):
+    """Text of pages first..last (1-based, inclusive); runs in a worker process."""
+    with pdfplumber.open(pdf_path) as pdf:
+        return [pdf.pages[n - 1].extract_text() or "" for n in range(first, last + 1)]
+
+
+def iter_page_texts(pdf_path: str, workers: int | None = None):
+    """Yields (page_num, text) in page order, extracting ranges of pages in parallel."""
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+    ranges = [(first, min(first + PAGES_PER_TASK - 1, page_count))
+              for first in range(1, page_count + 1, PAGES_PER_TASK)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(extract_pages, pdf_path, first, last) for first, last in ranges]
+        for (first, _), fut in zip(ranges, futures):
+            for offset, text in enumerate(fut.result()):
+                yield first + offset, text
+
+
+def chunk_text(text: str, max_chars: int, overlap: int):
+    start = 0
+    N = len(text)
+    while start < N:
+        end = min(start + max_chars, N)
+        yield text[start:end]
+        start = end - overlap if end < N else N
+
+
+def stream_chunks(pdf_path: str, max_chars: int, overlap: int, workers: int | None = None):
     """
     Generator: yields (page_num, text chunk) from the PDF page-by-page.
     """
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_num, page in enumerate(pdf.pages, start=1):
-            text = page.extract_text() or ""
-            start = 0
-            N = len(text)
-            while start < N:
-                end = min(start + max_chars, N)
-                yield page_num, text[start:end]
-                start = end - overlap if end < N else N
-
-def translate_and_write(pdf_path: str, output_path: str, max_chars: int, overlap: int):
+    for page_num, text in iter_page_texts(pdf_path, workers):
+        for chunk in chunk_text(text, max_chars, overlap):
+            yield page_num, chunk
+
+
+# --- output ----------------------------------------------------------------
+
+def load_done(output_path: str) -> dict:
+    """chunk_id -> record for the non-empty records already in the output."""
+    done = {}
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if rec.get("text"):
+                done[rec["chunk_id"]] = rec
+    return done
+
+
+def is_current(rec: dict, page_num: int, chunk: str) -> bool:
+    # Records written before source hashes were stored are trusted if the page matches
+    return rec["page"] == page_num and rec.get("source_hash", chunk_hash(chunk)) == chunk_hash(chunk)
+
+
+def write_sorted(output_path: str, records):
+    tmp = output_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for rec in sorted(records, key=lambda r: r["chunk_id"]):
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    os.replace(tmp, output_path)
+
+
+def translate_and_write(pdf_path: str, output_path: str, max_chars: int, overlap: int,
+                        backend: TranslatorBackend | None = None, cache_path: str | None = DEFAULT_CACHE,
+                        concurrency: int = 4, workers: int | None = None, retries: int = 4) -> dict:
     """
-    Streams chunks, translates via Google Translate, and writes JSONL output incrementally.
+    Streams chunks, translates them concurrently, and appends each record to the JSONL as it
+    completes; the file is rewritten in chunk order at the end. Returns run statistics.
     """
-    translator = Translator()
-    with open(output_path, "w", encoding="utf-8") as fout:
-        for idx, (page_num, chunk) in enumerate(stream_chunks(pdf_path, max_chars, overlap), start=1):
-            print(f"Page {page_num}, chunk {idx} → translating...")
+    backend = backend or GoogleBackend()
+    cache = TranslationCache(cache_path)
+    previous = load_done(output_path)
+    stats = {"chunks": 0, "resumed": 0, "cached": 0, "translated": 0, "failed": 0}
+    kept, todo = {}, []
+    for idx, (page_num, chunk) in enumerate(stream_chunks(pdf_path, max_chars, overlap, workers), start=1):
+        stats["chunks"] += 1
+        rec = previous.get(idx)
+        if rec and is_current(rec, page_num, chunk):
+            kept[idx] = rec
+            stats["resumed"] += 1
+        else:
+            todo.append((idx, page_num, chunk))
+
+    # Drop stale or failed records before appending, so resuming never duplicates a chunk
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    write_sorted(output_path, kept.values())
+
+    def work(idx, page_num, chunk):
+        key = TranslationCache.key(backend, "el", "en", chunk)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, True
+        en_text = translate_with_retry(backend, chunk, retries=retries)
+        cache.put(key, en_text)
+        return en_text, False
+
+    started = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as fout, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="translate") as pool:
+        futures = {pool.submit(work, *item): item for item in todo}
+        for fut in as_completed(futures):
+            idx, page_num, chunk = futures[fut]
             try:
-                en_text = translator.translate(chunk, src='el', dest='en').text
+                en_text, from_cache = fut.result()
             except Exception as e:
-                print(f"Translation failed for chunk {idx}: {e}")
-                en_text = ""
+                print(f"Translation failed for chunk {idx} (page {page_num}): {e}")
+                stats["failed"] += 1
+                continue
+            stats["cached" if from_cache else "translated"] += 1
             record = {
                 "page": page_num,
                 "chunk_id": idx,
-                "text": en_text
+                "text": en_text,
+                "source_hash": chunk_hash(chunk),
             }
+            kept[idx] = record
             fout.write(json.dumps(record, ensure_ascii=False) + "\n")
+            fout.flush()
+            print(f"Page {page_num}, chunk {idx} → {'cached' if from_cache else 'translated'}")
+
+    write_sorted(output_path, kept.values())
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -62,15 +273,30 @@ def main():
         type=int, default=100,
         help="Overlap chars between chunks (default 100)"
     )
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="google",
+                        help="Translator backend (identity is an offline stand-in)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="Translation cache JSONL ('' to disable)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Chunks translated at once (= translation requests in flight)")
+    parser.add_argument("--workers", type=int, default=None, help="Page extraction processes")
+    parser.add_argument("--retries", type=int, default=4, help="Retries per chunk before giving up")
     args = parser.parse_args()
 
-    translate_and_write(
+    stats = translate_and_write(
         args.pdf_path,
         args.output,
         args.max_chars,
-        args.overlap
+        args.overlap,
+        backend=BACKENDS[args.backend](),
+        cache_path=args.cache or None,
+        concurrency=args.concurrency,
+        workers=args.workers,
+        retries=args.retries,
     )
-    print(f"All done! Output saved to {args.output}")
+    print(f"All done! Output saved to {args.output}: {stats}")
+    if stats["failed"]:
+        print(f"{stats['failed']} chunks failed; rerun to retry them")
+        raise SystemExit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,125 @@
+"""
+Background dispatch of caller turns.
+
+The Twilio webhook only enqueues a turn; a bounded pool of worker threads runs the
+sector handler and fires the completion callback (the /speak_result redirect).
+Both run in the submitter's context, so the turn's trace follows the job.
+"""
+import contextvars
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+
+
+class Job:
+    __slots__ = ("job_id", "label", "fn", "on_done", "ctx", "queued_at", "started_at", "finished_at", "error")
+
+    def __init__(self, job_id, label, fn, on_done):
+        self.job_id = job_id
+        self.label = label
+        self.fn = fn
+        self.on_done = on_done
+        self.ctx = contextvars.copy_context()
+        self.queued_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+    def timing(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "label": self.label,
+            "wait_ms": round((self.started_at - self.queued_at) * 1000, 1),
+            "run_ms": round((self.finished_at - self.started_at) * 1000, 1),
+            "error": self.error,
+        }
+
+
+class Dispatcher:
+    def __init__(self, workers: int = 4, max_queue: int = 32, history: int = 100):
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._next_id = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._busy_seconds = 0.0
+        self._started = time.perf_counter()
+        self._recent = deque(maxlen=history)
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, name=f"dispatch-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, label: str, fn, on_done) -> bool:
+        """
+        Queue fn() to run on a worker; on_done(result, error) is called with its outcome.
+        Returns False (and runs nothing) when the queue is full.
+        """
+        with self._lock:
+            self._next_id += 1
+            job = Job(self._next_id, label, fn, on_done)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            return False
+        with self._lock:
+            self._submitted += 1
+        return True
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._busy += 1
+            job.started_at = time.perf_counter()
+            result = None
+            try:
+                result = job.ctx.run(job.fn)
+            except Exception as e:
+                job.error = repr(e)
+                traceback.print_exc()
+            try:
+                job.ctx.run(job.on_done, result, job.error)
+            except Exception as e:
+                print("[dispatch] Completion callback error:", repr(e))
+            job.finished_at = time.perf_counter()
+            with self._lock:
+                self._busy -= 1
+                self._busy_seconds += job.finished_at - job.started_at
+                if job.error:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                self._recent.append(job.timing())
+            self._queue.task_done()
+
+    def stats(self) -> dict:
+        with self._lock:
+            uptime = time.perf_counter() - self._started
+            recent = list(self._recent)
+            runs = [j["run_ms"] for j in recent]
+            waits = [j["wait_ms"] for j in recent]
+            return {
+                "workers": self.workers,
+                "busy_workers": self._busy,
+                "utilisation": round(self._busy / self.workers, 3),
+                "utilisation_avg": round(self._busy_seconds / (uptime * self.workers), 3) if uptime else 0.0,
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_run_ms": round(sum(runs) / len(runs), 1) if runs else None,
+                "avg_wait_ms": round(sum(waits) / len(waits), 1) if waits else None,
+                "recent_jobs": recent,
+            }
@@ -0,0 +1,50 @@
+"""
+Multi-worker serving: one process per core, each with a thread pool for
+concurrent webhooks and ConversationRelay WebSockets (flask-sock needs a
+threaded WSGI worker, hence gthread).
+
+The master opens the ngrok tunnel (unless PUBLIC_URL is set) and points the
+Twilio number at it once, before any worker starts; workers inherit PUBLIC_URL.
+
+With more than one worker the call sessions live in SQLite (data/sessions.db), but
+everything else is per worker: the speculations started on interim transcripts,
+the response cache and the prefetched sectors. Twilio's interim and final
+transcription callbacks for a call can land on different workers, and then
+SPECULATOR.resolve misses and the final turn prepares from scratch.
+"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_WORKERS", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "8"))
+timeout = 180  # a ConversationRelay answer can stream for a while
+graceful_timeout = 30
+# Each worker builds its own Chroma client and dispatcher threads, so never fork after loading the app
+preload_app = False
+
+if workers > 1:
+    # Transcription callbacks for one call can land on any worker
+    os.environ.setdefault("SESSION_BACKEND", "sqlite:///data/sessions.db")
+
+_tunneled = False
+
+
+def on_starting(server):
+    global _tunneled
+    from tunnel import resolve_public_url, twilio_client_from_env, configure_number
+
+    public_url, _tunneled = resolve_public_url(int(bind.rsplit(":", 1)[1]))
+    os.environ["PUBLIC_URL"] = public_url
+    configure_number(twilio_client_from_env(), public_url)
+
+
+def on_exit(server):
+    if _tunneled:
+        from tunnel import close_tunnel
+        close_tunnel()
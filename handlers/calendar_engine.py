@@ -0,0 +1,226 @@
+"""
+Date-aware engine over data/academic_calendar.json.
+
+Every record is a typed start_date/end_date interval (see
+tools/construct_academic_calendar.py), so "what is happening on <date>",
+"when do winter exams start", "how many days until X" and "current period" are
+answered from an interval index instead of a full LLM generation.
+"""
+import bisect
+import json
+import re
+from datetime import date
+
+import reloader
+from handlers.date_phrases import MONTH_ALIASES, format_long, resolve_date, resolve_month
+
+ACADEMIC_CALENDAR = "data/academic_calendar.json"
+
+STOPWORDS = {
+    "a", "about", "the", "of", "is", "are", "do", "does", "did", "when", "what", "how", "many",
+    "days", "day", "until", "till", "left", "start", "starts", "begin", "begins", "end", "ends",
+    "finish", "finishes", "over", "there", "to", "for", "we", "in", "on", "it", "will", "period",
+    "academic", "calendar", "please", "tell", "me", "happening", "current", "currently", "now",
+}
+
+COUNTDOWN_RE = re.compile(r"\bhow (?:many|much)\b.*\b(?:days?|weeks?|time)\b|\b(?:days?|weeks?)\s+(?:until|till|left|before)\b|\bhow long\b")
+CURRENT_RE = re.compile(r"\b(?:current|currently|right now|at the moment|now|this period|are we in)\b")
+START_RE = re.compile(r"\b(?:start|starts|begin|begins|beginning|commence|commences|open|opens|first day)\b")
+END_RE = re.compile(r"\b(?:end|ends|finish|finishes|over|close|closes|last day)\b")
+
+
+def keywords(text: str) -> set:
+    words = re.findall(r"[a-z]+", text.lower())
+    out = set()
+    for w in words:
+        if w in STOPWORDS:
+            continue
+        if w.endswith("es") and w[:-2] in ("class", "exam"):
+            w = w[:-2]
+        elif w.endswith("s") and len(w) > 3 and not w.endswith("ss"):
+            w = w[:-1]  # exams -> exam
+        out.add({"examination": "exam", "lesson": "class", "lecture": "class", "fall": "winter",
+                 "autumn": "winter"}.get(w, w))
+    return out
+
+
+class CalendarEvent:
+    __slots__ = ("event", "start", "end", "keywords")
+
+    def __init__(self, event: str, start: date, end: date):
+        self.event = event
+        self.start = start
+        self.end = end
+        self.keywords = keywords(event)
+
+
+class IntervalIndex:
+    """Events sorted by start date with a running max of end dates, for stabbing queries."""
+
+    def __init__(self, events):
+        self.events = sorted(events, key=lambda e: (e.start, e.end))
+        self.starts = [e.start for e in self.events]
+        self.max_end = []
+        running = date.min
+        for e in self.events:
+            running = max(running, e.end)
+            self.max_end.append(running)
+
+    def containing(self, day: date):
+        hi = bisect.bisect_right(self.starts, day)
+        out = []
+        for i in range(hi - 1, -1, -1):
+            if self.max_end[i] < day:
+                break  # nothing at or before i reaches day
+            if self.events[i].end >= day:
+                out.append(self.events[i])
+        return out[::-1]
+
+    def next_after(self, day: date):
+        i = bisect.bisect_right(self.starts, day)
+        return self.events[i] if i < len(self.events) else None
+
+
+def _days(n: int) -> str:
+    return f"{n} day" if n == 1 else f"{n} days"
+
+
+def _span(e: CalendarEvent) -> str:
+    return f"{e.event} runs from {format_long(e.start)} to {format_long(e.end)}"
+
+
+class CalendarEngine:
+    def __init__(self, rows):
+        events = []
+        for row in rows:
+            try:
+                start = date.fromisoformat(row["start_date"])
+                end = date.fromisoformat(row["end_date"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            events.append(CalendarEvent(row.get("event", ""), start, end))
+        self.rows = rows
+        self.index = IntervalIndex(events)
+
+    def pick_year(self, month: int, day: int) -> int | None:
+        """Year that puts a year-less date inside the calendar's span, if any."""
+        if not self.index.events:
+            return None
+        first, last = self.index.events[0].start, max(self.index.max_end)
+        for year in range(first.year, last.year + 1):
+            try:
+                d = date(year, month, day)
+            except ValueError:
+                continue
+            if first <= d <= last:
+                return year
+        return None
+
+    def match_event(self, query: str, today: date, within=None):
+        """Event the query names; with within=(first, last), only among those overlapping it."""
+        words = keywords(query)
+        events = self.index.events
+        if within:
+            words -= MONTH_ALIASES.keys()  # the month is the range, not an event name
+            events = [e for e in events if e.start <= within[1] and e.end >= within[0]]
+        scored = [(len(words & e.keywords), e) for e in events]
+        top = max((hits for hits, _ in scored), default=0)
+        if not top:
+            return None
+        tied = [e for hits, e in scored if hits == top]
+        # ties go to the earliest period that has not ended yet ("spring semester" -> classes)
+        return next((e for e in tied if e.end >= today), tied[0])
+
+    def on_date(self, day: date) -> str:
+        label = format_long(day)
+        events = self.index.containing(day)
+        if events:
+            return "Based on the academic calendar, on " + label + ": " + "; ".join(_span(e) for e in events) + "."
+        upcoming = self.index.next_after(day)
+        if upcoming:
+            return (f"Based on the academic calendar, nothing is scheduled on {label}. "
+                    f"The next period is {upcoming.event}, starting on {format_long(upcoming.start)}.")
+        return f"Based on the academic calendar, nothing is scheduled on {label}."
+
+    def countdown(self, event: CalendarEvent, today: date) -> str:
+        if today < event.start:
+            return (f"Based on the academic calendar, there are {_days((event.start - today).days)} until "
+                    f"{event.event}, starting on {format_long(event.start)}.")
+        if today <= event.end:
+            return (f"Based on the academic calendar, {event.event} is under way and ends in "
+                    f"{_days((event.end - today).days)}, on {format_long(event.end)}.")
+        return f"Based on the academic calendar, {event.event} already ended on {format_long(event.end)}."
+
+    def during(self, event: CalendarEvent, today: date) -> str:
+        if event.start <= today <= event.end:
+            return f"Based on the academic calendar, yes, {event.event} is under way until {format_long(event.end)}."
+        if today < event.start:
+            return (f"Based on the academic calendar, no, {event.event} has not started yet; "
+                    f"it starts on {format_long(event.start)}.")
+        return f"Based on the academic calendar, no, {event.event} already ended on {format_long(event.end)}."
+
+    def current(self, today: date) -> str:
+        current = self.index.containing(today)
+        if current:
+            return ("Based on the academic calendar, the current period is "
+                    + "; ".join(f"{e.event}, until {format_long(e.end)}" for e in current) + ".")
+        upcoming = self.index.next_after(today)
+        if upcoming:
+            return (f"Based on the academic calendar, no period is running today. "
+                    f"The next one is {upcoming.event}, starting on {format_long(upcoming.start)}.")
+        return "Based on the academic calendar, no period is running today and no later period is listed."
+
+    def answer(self, query: str, today: date | None = None) -> str | None:
+        today = today or date.today()
+        text = query.lower()
+        target = resolve_date(text, today, self.pick_year)
+        # "Do we have classes in March?" is about the periods overlapping that month
+        month = None if target else resolve_month(text, today)
+        event = self.match_event(text, today, within=month)
+        if month and not event:
+            return None
+
+        if COUNTDOWN_RE.search(text):
+            if event:
+                return self.countdown(event, today)
+            if target and target >= today:
+                return f"Based on the academic calendar, {format_long(target)} is {_days((target - today).days)} away."
+            if target:
+                return f"Based on the academic calendar, {format_long(target)} was {_days((today - target).days)} ago."
+            return None
+
+        if target:
+            return self.on_date(target)
+
+        # "Are we in the exam period right now?" asks about today, not for the period's dates
+        if CURRENT_RE.search(text):
+            if event:
+                return self.during(event, today)
+            return self.current(today)
+
+        if event:
+            wants_start, wants_end = bool(START_RE.search(text)), bool(END_RE.search(text))
+            if wants_start and not wants_end:
+                return f"Based on the academic calendar, the start date of {event.event} is {format_long(event.start)}."
+            if wants_end and not wants_start:
+                return f"Based on the academic calendar, the end date of {event.event} is {format_long(event.end)}."
+            return f"Based on the academic calendar, {_span(event)}."
+        return None  # not a question the interval index understands: let the LLM answer
+
+
+def load_engine(path: str = ACADEMIC_CALENDAR) -> CalendarEngine:
+    with open(path, "r", encoding="utf-8") as f:
+        return CalendarEngine(json.load(f))
+
+
+def _build() -> CalendarEngine:
+    from handlers.snapshot import compiled  # imports this module
+    return compiled("calendar") or load_engine()
+
+
+def get_engine() -> CalendarEngine:
+    """The engine of the running turn's data generation (see reloader)."""
+    return reloader.resolve("calendar")
+
+
+reloader.register("calendar", _build, lambda: [ACADEMIC_CALENDAR])
@@ -0,0 +1,162 @@
+"""
+Small parser for the date phrases callers actually say ("exams on Monday",
+"the 28th of August", "1/9", "tomorrow", "next Friday", "in two weeks", "in March").
+"""
+import re
+from datetime import date, timedelta
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+MONTHS = ("january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december")
+MONTH_ALIASES = {m[:3]: i for i, m in enumerate(MONTHS, start=1)}
+MONTH_ALIASES.update({m: i for i, m in enumerate(MONTHS, start=1)})
+MONTH_ALIASES["sept"] = 9
+
+_MONTH = r"(" + "|".join(sorted(MONTH_ALIASES, key=len, reverse=True)) + r")\.?"
+_DAY = r"(\d{1,2})(?:st|nd|rd|th)?"
+DAY_MONTH_RE = re.compile(rf"\b{_DAY}\s+(?:of\s+)?{_MONTH}(?:\s+(\d{{4}}))?\b")
+MONTH_DAY_RE = re.compile(rf"\b{_MONTH}\s+{_DAY}\b(?:,?\s+(\d{{4}}))?")
+NUMERIC_RE = re.compile(r"\b(\d{1,2})[/.](\d{1,2})(?:[/.](\d{2,4}))?\b")
+ISO_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+# A month on its own, after a preposition so "may I ..." is not read as a month
+MONTH_ONLY_RE = re.compile(rf"\b(?:in|during|throughout)\s+(?:the\s+month\s+of\s+)?{_MONTH}(?:\s+(\d{{4}}))?\b")
+WEEKDAY_RE = re.compile(r"\b(" + "|".join(WEEKDAYS) + r")s?\b")
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19, "twenty": 20,
+    "thirty": 30,
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6, "seventh": 7,
+    "eighth": 8, "ninth": 9, "tenth": 10, "eleventh": 11, "twelfth": 12, "thirteenth": 13,
+    "fourteenth": 14, "fifteenth": 15, "sixteenth": 16, "seventeenth": 17, "eighteenth": 18,
+    "nineteenth": 19, "twentieth": 20, "thirtieth": 30,
+}
+_NUMBER_WORD = "|".join(sorted(NUMBER_WORDS, key=len, reverse=True))
+# "twenty eighth" / "thirty-first" -> "28" / "31" so the digit patterns can read them
+COMPOUND_NUMBER_RE = re.compile(rf"\b(twenty|thirty)[\s-]+({_NUMBER_WORD})\b")
+SINGLE_NUMBER_RE = re.compile(rf"\b({_NUMBER_WORD})\b(?=\s+(?:of\s+)?(?:{_MONTH[1:-4]})\b|\s+(?:day|week|month)s?\b)")
+RELATIVE_DAYS = {"today": 0, "tonight": 0, "tomorrow": 1, "yesterday": -1}
+RELATIVE_RE = re.compile(r"\b(day after tomorrow|day before yesterday|today|tonight|tomorrow|yesterday)\b")
+OFFSET_RE = re.compile(r"\bin\s+(\d{1,3}|an?)\s+(day|week|month)s?\b")
+NEXT_WEEKDAY_RE = re.compile(r"\b(next|this|coming|last)\s+(" + "|".join(WEEKDAYS) + r")\b")
+NEXT_UNIT_RE = re.compile(r"\b(next|last)\s+(week|month)\b")
+
+
+def words_to_digits(text: str) -> str:
+    """Rewrite spelled-out day numbers that precede a month or a unit as digits."""
+    text = COMPOUND_NUMBER_RE.sub(lambda m: str(NUMBER_WORDS[m.group(1)] + NUMBER_WORDS[m.group(2)]), text)
+    return SINGLE_NUMBER_RE.sub(lambda m: str(NUMBER_WORDS[m.group(1)]), text)
+
+
+def find_weekday(text: str) -> str | None:
+    """First weekday named in text, capitalized ("Monday"), or None."""
+    m = WEEKDAY_RE.search(text.lower())
+    return m.group(1).capitalize() if m else None
+
+
+def find_month_days(text: str):
+    """
+    Yield (month, day, year or None) for every explicit calendar date in text.
+    Numeric dates are read day-first, as written in Greece.
+    """
+    text = text.lower()
+    for m in ISO_RE.finditer(text):
+        yield int(m.group(2)), int(m.group(3)), int(m.group(1))
+    for m in DAY_MONTH_RE.finditer(text):
+        yield MONTH_ALIASES[m.group(2)], int(m.group(1)), int(m.group(3)) if m.group(3) else None
+    for m in MONTH_DAY_RE.finditer(text):
+        yield MONTH_ALIASES[m.group(1)], int(m.group(2)), int(m.group(3)) if m.group(3) else None
+    for m in NUMERIC_RE.finditer(ISO_RE.sub(" ", text)):
+        year = m.group(3)
+        if year and len(year) == 2:
+            year = "20" + year
+        yield int(m.group(2)), int(m.group(1)), int(year) if year else None
+
+
+def to_date(month: int, day: int, year: int | None, default_year: int) -> date | None:
+    try:
+        return date(year or default_year, month, day)
+    except ValueError:
+        return None
+
+
+def add_months(d: date, months: int) -> date:
+    month_index = d.month - 1 + months
+    year, month = d.year + month_index // 12, month_index % 12 + 1
+    for day in (d.day, 30, 29, 28):
+        try:
+            return date(year, month, day)
+        except ValueError:
+            continue
+
+
+def resolve_date(text: str, today: date, pick_year=None) -> date | None:
+    """
+    The single date a spoken phrase refers to, relative to today. Explicit dates
+    without a year get their year from pick_year(month, day) when given.
+    """
+    text = words_to_digits(text.lower())
+
+    m = RELATIVE_RE.search(text)
+    if m:
+        phrase = m.group(1)
+        if phrase == "day after tomorrow":
+            return today + timedelta(days=2)
+        if phrase == "day before yesterday":
+            return today - timedelta(days=2)
+        return today + timedelta(days=RELATIVE_DAYS[phrase])
+
+    m = OFFSET_RE.search(text)
+    if m:
+        n, unit = int(m.group(1)) if m.group(1).isdigit() else 1, m.group(2)
+        if unit == "month":
+            return add_months(today, n)
+        return today + timedelta(days=n * (7 if unit == "week" else 1))
+
+    m = NEXT_UNIT_RE.search(text)
+    if m:
+        sign = 1 if m.group(1) == "next" else -1
+        if m.group(2) == "month":
+            return add_months(today, sign)
+        return today + timedelta(days=7 * sign)
+
+    for month, day, year in find_month_days(text):
+        if year is None and pick_year is not None:
+            year = pick_year(month, day)
+        d = to_date(month, day, year, today.year)
+        if d:
+            return d
+
+    m = NEXT_WEEKDAY_RE.search(text)
+    weekday = m.group(2) if m else None
+    if weekday is None:
+        found = find_weekday(text)
+        weekday = found.lower() if found else None
+    if weekday:
+        delta = (WEEKDAYS.index(weekday) - today.weekday()) % 7
+        if m and m.group(1) == "last":
+            return today - timedelta(days=(7 - delta) % 7 or 7)
+        if m and m.group(1) == "next" and delta == 0:
+            delta = 7
+        return today + timedelta(days=delta)
+    return None
+
+
+def resolve_month(text: str, today: date):
+    """
+    (first day, last day) of the month a phrase such as "in March" names, or None.
+    Without a year it is the next such month, or the current one.
+    """
+    m = MONTH_ONLY_RE.search(text.lower())
+    if not m:
+        return None
+    month = MONTH_ALIASES[m.group(1)]
+    year = int(m.group(2)) if m.group(2) else today.year + (month < today.month)
+    first = date(year, month, 1)
+    return first, add_months(first, 1) - timedelta(days=1)
+
+
+def format_long(d: date) -> str:
+    """date(2025, 8, 28) -> 'Thursday, 28 August 2025' (the style used in the data files)."""
+    return f"{d.strftime('%A')}, {d.day} {d.strftime('%B')} {d.year}"
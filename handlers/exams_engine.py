@@ -0,0 +1,271 @@
+"""
+In-memory query engine over data/final_exams_schedule.json.
+
+Course names are indexed by normalized tokens and by character trigrams (for
+transcription typos), with secondary indexes by semester, weekday and ISO date.
+Single-course lookups and "exams on Monday" / "semester 3 exams" style questions
+are answered by rendering the template sentence directly; only ambiguous course
+matches are left to the vector search + LLM path.
+"""
+import json
+import math
+import re
+import unicodedata
+from datetime import date, datetime
+
+import reloader
+from handlers.date_phrases import MONTHS, WEEKDAYS, find_month_days, find_weekday, to_date
+
+EXAMS_SCHEDULE = "data/final_exams_schedule.json"
+
+# Top course score needed to answer without the LLM, and its required lead over the runner-up
+MIN_COURSE_SCORE = 0.6
+MIN_COURSE_MARGIN = 0.15
+# Trigram Jaccard similarity for a misheard query token to count as a vocabulary token
+MIN_TRIGRAM_SIMILARITY = 0.5
+
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "at", "can", "course", "date", "do", "does", "exam", "exams",
+    "examination", "final", "for", "have", "how", "i'm", "im", "in", "interested", "is", "it",
+    "know", "like", "me", "my", "of", "on", "please", "room", "schedule", "scheduled", "subject",
+    "tell", "the", "there", "time", "to", "want", "what", "when", "where", "which", "will",
+    "would", "you", "semester", *WEEKDAYS, *MONTHS,
+}
+
+# Abbreviations used in the schedule, expanded so spoken full words match them
+ABBREVIATIONS = {
+    "adv": "advanced", "anal": "analysis", "elec": "electrical", "electr": "electronics",
+    "sys": "systems", "tech": "technology", "techn": "techniques", "commun": "communications",
+    "multivar": "multivariable", "diff": "differential", "dev": "devices", "elem": "elements",
+    "comp": "computers", "dig": "digital", "overvol": "overvoltage", "lab": "laboratory",
+    "e-l": "electromechanical",
+}
+NUMERALS = {
+    "1": "i", "one": "i", "first": "i", "2": "ii", "two": "ii", "second": "ii",
+    "3": "iii", "three": "iii", "third": "iii",
+}
+ORDINAL_WORDS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
+    "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10,
+}
+SEMESTER_RE = re.compile(
+    r"\bsemester\s+(\d{1,2})\b|\b(\d{1,2})(?:st|nd|rd|th)?\s+semester\b|\b("
+    + "|".join(ORDINAL_WORDS) + r")\s+semester\b"
+)
+TIME_RANGE_RE = re.compile(r"^(\d{1,2}):(\d{2})(am|pm)-(\d{1,2}):(\d{2})(am|pm)$")
+
+
+def normalize_tokens(text: str, drop_leading_pronoun: bool = False):
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.replace("ι", "i").replace("&", " and ")  # Greek iota used as Roman numeral
+    raw = re.findall(r"[a-z0-9]+(?:-[a-z]+)?", text)
+    if drop_leading_pronoun and raw and raw[0] == "i":
+        raw = raw[1:]
+    tokens = []
+    for tok in raw:
+        tok = ABBREVIATIONS.get(tok, tok)
+        tok = NUMERALS.get(tok, tok)
+        for part in tok.split():
+            if part in STOPWORDS:
+                continue
+            if len(part) > 3 and part.endswith("s") and not part.endswith("ss"):
+                part = part[:-1]  # circuits / circuit
+            tokens.append(part)
+    return tokens
+
+
+def trigrams(token: str) -> set:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def parse_minutes(hour: str, minute: str, meridiem: str) -> int:
+    return (int(hour) % 12 + (12 if meridiem == "pm" else 0)) * 60 + int(minute)
+
+
+class ExamRecord:
+    __slots__ = ("course", "semester", "date_text", "iso_date", "weekday", "time_text",
+                 "start", "end", "room", "tokens")
+
+    def __init__(self, row: dict, course_key: str):
+        self.course = (row.get("Course") or course_key).strip()
+        self.semester = str(row.get("Semester", "")).strip()
+        self.date_text = (row.get("Date") or "").strip()
+        self.time_text = (row.get("Time") or "").strip()
+        self.room = (row.get("Room") or "").strip()
+        self.iso_date = None
+        self.weekday = None
+        try:
+            parsed = datetime.strptime(self.date_text, "%A, %d %B %Y").date()
+            self.iso_date = parsed.isoformat()
+            self.weekday = parsed.strftime("%A")  # trust the date over the (sometimes wrong) Day column
+        except ValueError:
+            pass
+        self.start = self.end = None
+        m = TIME_RANGE_RE.match(self.time_text.lower().replace(" ", ""))
+        if m:
+            self.start = parse_minutes(*m.group(1, 2, 3))
+            self.end = parse_minutes(*m.group(4, 5, 6))
+        self.tokens = normalize_tokens(self.course)
+
+    @property
+    def scheduled(self) -> bool:
+        return self.iso_date is not None
+
+    def sort_key(self):
+        return (self.iso_date or "9999", self.start if self.start is not None else 24 * 60, self.course)
+
+
+def _sentence(text: str) -> str:
+    return text if text.endswith(".") else text + "."  # rooms like "Α.Φ.Ε." already end with one
+
+
+def render_exam(rec: ExamRecord) -> str:
+    if not rec.scheduled:
+        note = rec.date_text or "not provided"
+        return _sentence(f"Based on the context, the {rec.course} course has no fixed date: {note[0].lower() + note[1:]}")
+    time_text = rec.time_text or "not provided"
+    room = rec.room or "not provided"
+    return _sentence(f"Based on the context, the {rec.course} course is scheduled to take place on "
+                     f"{rec.date_text} during {time_text} in Room {room}")
+
+
+def render_listing(label: str, records) -> str:
+    if not records:
+        return f"Based on the context, there are no exams {label}."
+    items = []
+    for rec in records:
+        if rec.scheduled:
+            items.append(f"{rec.course} on {rec.date_text} during {rec.time_text or 'not provided'} "
+                         f"in Room {rec.room or 'not provided'}")
+        else:
+            items.append(f"{rec.course}, {rec.date_text[0].lower() + rec.date_text[1:]}")
+    noun = "exam" if len(records) == 1 else "exams"
+    verb = "is" if len(records) == 1 else "are"
+    return _sentence(f"Based on the context, there {verb} {len(records)} {noun} {label}: " + "; ".join(items))
+
+
+class ExamsEngine:
+    def __init__(self, data: dict):
+        self.records = sorted((ExamRecord(row, key) for key, row in data.items()), key=ExamRecord.sort_key)
+        self.token_index = {}  # token -> set of record positions
+        self.trigram_index = {}  # trigram -> set of vocabulary tokens
+        self.by_semester = {}
+        self.by_weekday = {}
+        self.by_date = {}
+        for pos, rec in enumerate(self.records):
+            for tok in set(rec.tokens):
+                self.token_index.setdefault(tok, set()).add(pos)
+            self.by_semester.setdefault(rec.semester, []).append(pos)
+            if rec.scheduled:
+                self.by_weekday.setdefault(rec.weekday, []).append(pos)
+                self.by_date.setdefault(rec.iso_date, []).append(pos)
+        for tok in self.token_index:
+            for gram in trigrams(tok):
+                self.trigram_index.setdefault(gram, set()).add(tok)
+        n = len(self.records)
+        self.idf = {tok: math.log(1 + n / len(positions)) for tok, positions in self.token_index.items()}
+        years = sorted(int(rec.iso_date[:4]) for rec in self.records if rec.scheduled)
+        self.default_year = years[len(years) // 2] if years else date.today().year
+
+    def _resolve_token(self, tok: str):
+        """Vocabulary tokens a query token stands for, with a similarity weight."""
+        if tok in self.token_index:
+            return [(tok, 1.0)]
+        grams = trigrams(tok)
+        counts = {}
+        for gram in grams:
+            for cand in self.trigram_index.get(gram, ()):
+                counts[cand] = counts.get(cand, 0) + 1
+        resolved = []
+        for cand, shared in counts.items():
+            sim = shared / (len(grams) + len(trigrams(cand)) - shared)
+            if sim >= MIN_TRIGRAM_SIMILARITY:
+                resolved.append((cand, sim))
+        return resolved
+
+    def rank_courses(self, query: str, limit: int = 3):
+        """[(score, ExamRecord)] best first; score is an idf-weighted F1 over course tokens."""
+        query_tokens = normalize_tokens(query, drop_leading_pronoun=True)
+        matched = {}  # record position -> {course token: weight}
+        query_weight = 0.0
+        for tok in query_tokens:
+            resolved = self._resolve_token(tok)
+            query_weight += max((self.idf[c] for c, _ in resolved), default=math.log(1 + len(self.records)))
+            for cand, sim in resolved:
+                for pos in self.token_index[cand]:
+                    hits = matched.setdefault(pos, {})
+                    hits[cand] = max(hits.get(cand, 0.0), sim)
+        ranked = []
+        for pos, hits in matched.items():
+            rec = self.records[pos]
+            got = sum(self.idf[t] * w for t, w in hits.items())
+            course_weight = sum(self.idf[t] for t in set(rec.tokens))
+            recall = got / course_weight if course_weight else 0.0
+            precision = got / query_weight if query_weight else 0.0
+            if recall + precision:
+                ranked.append((2 * recall * precision / (recall + precision), rec))
+        ranked.sort(key=lambda x: (-x[0], x[1].sort_key()))
+        return ranked[:limit]
+
+    def filter_records(self, query: str):
+        """(label, records) for semester / weekday / date questions, or None."""
+        text = query.lower()
+        positions = None
+        labels = []
+
+        m = SEMESTER_RE.search(text)
+        if m:
+            semester = m.group(1) or m.group(2) or str(ORDINAL_WORDS[m.group(3)])
+            positions = set(self.by_semester.get(semester, []))
+            labels.append(f"for semester {semester}")
+
+        days = [to_date(mo, d, y, self.default_year) for mo, d, y in find_month_days(text)]
+        days = [d for d in days if d]
+        if days:
+            wanted = set()
+            for d in days:
+                wanted.update(self.by_date.get(d.isoformat(), []))
+            positions = wanted if positions is None else positions & wanted
+            labels.append("on " + " and ".join(f"{d.strftime('%A')}, {d.day} {d.strftime('%B %Y')}" for d in days))
+        else:
+            weekday = find_weekday(text)
+            if weekday:
+                wanted = set(self.by_weekday.get(weekday, []))
+                positions = wanted if positions is None else positions & wanted
+                labels.append(f"on {weekday}")
+
+        if positions is None:
+            return None
+        return " ".join(reversed(labels)), [self.records[p] for p in sorted(positions)]
+
+    def answer(self, query: str) -> str | None:
+        ranked = self.rank_courses(query)
+        if ranked:
+            top_score, top = ranked[0]
+            runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+            if top_score >= MIN_COURSE_SCORE and top_score - runner_up >= MIN_COURSE_MARGIN:
+                return render_exam(top)
+        filtered = self.filter_records(query)
+        if filtered:
+            return render_listing(*filtered)
+        return None  # ambiguous: let vector search + LLM decide
+
+
+def load_engine(path: str = EXAMS_SCHEDULE) -> ExamsEngine:
+    with open(path, "r", encoding="utf-8") as f:
+        return ExamsEngine(json.load(f))
+
+
+def _build() -> ExamsEngine:
+    from handlers.snapshot import compiled  # imports this module
+    return compiled("exams") or load_engine()
+
+
+def get_engine() -> ExamsEngine:
+    """The engine of the running turn's data generation (see reloader)."""
+    return reloader.resolve("exams")
+
+
+reloader.register("exams", _build, lambda: [EXAMS_SCHEDULE])
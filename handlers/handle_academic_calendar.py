@@ -1,8 +1,7 @@
-import json
 from langchain.prompts import PromptTemplate
-from langchain_ollama import OllamaLLM
-
-ACADEMIC_CALENDAR = "data/academic_calendar.json"
+from tracing import span
+from RAG.resources import get_llm, load_llm
+from handlers.calendar_engine import get_engine
 
 PROMPT_TEMPLATE = (
     "Answer the question based only on the following context:\n"
@@ -11,16 +10,27 @@ PROMPT_TEMPLATE = (
     "Answer the question based on the above context: {question}"
 )
 
-def handle_academic_calendar(query: str) -> str:
-    with open(ACADEMIC_CALENDAR, 'r', encoding="utf-8") as file:
-        data = json.load(file)
-        answer = query_model(data, query)
-        print(answer)
+def prefetch_academic_calendar():
+    # The LLM fallback's prompt starts with the whole calendar: have Ollama cache it
+    engine = get_engine()
+    load_llm("llama3", PROMPT_TEMPLATE.split("{question}")[0].format(context=engine.rows))
+
+def prepare_academic_calendar(query: str) -> dict:
+    return {"answer": get_engine().answer(query)}
+
+def handle_academic_calendar(query: str, prepared: dict = None) -> str:
+    engine = get_engine()
+    answer = (prepared or prepare_academic_calendar(query))["answer"]
+    if answer is None:
+        # Not a date / period question the interval index understands
+        answer = query_model(engine.rows, query)
+    print(answer)
     return answer
 
 
 def query_model(file, query: str) -> str:
     prompt = PromptTemplate(input_variables=["context", "question"], template=PROMPT_TEMPLATE)
-    llm = OllamaLLM(model="llama3", temperature=0.2)
+    llm = get_llm("llama3", temperature=0.2)
     formatted_prompt = prompt.format(context=file, question=query)
-    return llm.invoke(formatted_prompt)
\ No newline at end of file
+    with span("generate"):
+        return llm.invoke(formatted_prompt)
\ No newline at end of file
@@ -1,12 +1,7 @@
-from langchain_chroma import Chroma
 from langchain_core.prompts import PromptTemplate
-from langchain_ollama import OllamaLLM, OllamaEmbeddings
-
-def get_embedding_function():
-    embeddings = OllamaEmbeddings(model="nomic-embed-text")
-    return embeddings
-
-CHROMA_PATH = "chroma"
+from tracing import span
+from RAG.resources import get_vectorstore, get_llm, load_embeddings
+from handlers.exams_engine import get_engine
 
 PROMPT_TEMPLATE = (
     "\nUse ONLY this context:\n{context}\n"
@@ -22,32 +17,39 @@ PROMPT_TEMPLATE = (
     "during <Time> in Room <Room>.'\n"
 )
 
-def handle_exams_program(query: str) -> str:
-    embeddings = get_embedding_function()
-    db = Chroma(
-        collection_name="exams",  # <<< match the indexer name
-        persist_directory=CHROMA_PATH,  # <<< match the indexer path
-        embedding_function=embeddings
-    )
-    try:
-        count = db._collection.count()
-        # print(f"Docs in collection: {count}")
-    except Exception:
-        count = None
+def prefetch_exams_program():
+    get_engine()
+    get_vectorstore("exams")
+    load_embeddings()  # ambiguous courses go through vector search
+
+def prepare_exams_program(query: str) -> dict:
+    # Course / semester / day / date lookups are answered straight from the schedule index
+    answer = get_engine().answer(query)
+    if answer is not None:
+        return {"answer": answer, "docs": []}
+
+    db = get_vectorstore("exams")  # <<< match the indexer name
 
     # Retrieve top-k relevant documents
     retriever = db.as_retriever(search_kwargs={"k": 3 })
-    initial_docs = retriever.invoke(query)
-    context = "\n\n---\n\n".join([d.page_content for d in initial_docs])
-    answer = query_model(context, query)
+    return {"answer": None, "docs": retriever.invoke(query)}
+
+def handle_exams_program(query: str, prepared: dict = None) -> str:
+    if prepared is None:
+        prepared = prepare_exams_program(query)
+    answer = prepared["answer"]
+    if answer is None:
+        context = "\n\n---\n\n".join([d.page_content for d in prepared["docs"]])
+        answer = query_model(context, query)
     print(answer)
     return answer
 
 def query_model(context, query: str) -> str:
     prompt = PromptTemplate(input_variables=["context", "question"], template=PROMPT_TEMPLATE)
-    llm = OllamaLLM(model="llama3", temperature=0)
+    llm = get_llm("llama3", temperature=0)
     formatted_prompt = prompt.format(context=context, question=query)
-    return llm.invoke(formatted_prompt)
+    with span("generate"):
+        return llm.invoke(formatted_prompt)
 
 
 # def main():
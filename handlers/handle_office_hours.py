@@ -1,8 +1,7 @@
-import json
 from langchain_core.prompts import PromptTemplate
-from langchain_ollama import OllamaLLM
-
-OFFICE_HOURS = "data/office_hours.json"
+from tracing import span
+from RAG.resources import get_llm, load_llm
+from handlers.office_hours_engine import get_index
 
 PROMPT_TEMPLATE = (
     "Use ONLY this context:\n{context}\n"
@@ -60,16 +59,27 @@ def sanitize_query(q: str) -> str:
     q = re.sub(r"\s+", " ", q).strip()
     return q
 
-def handle_office_hours(query: str) -> str:
+def prefetch_office_hours():
+    # The LLM fallback's prompt starts with the whole office-hours list: have Ollama cache it
+    index = get_index()
+    load_llm("llama3", PROMPT_TEMPLATE.split("{question}")[0].format(context=index.data))
+
+def prepare_office_hours(query: str) -> dict:
+    return {"answer": get_index().answer(sanitize_query(query))}
+
+def handle_office_hours(query: str, prepared: dict = None) -> str:
     sanitized = sanitize_query(query)
-    with open(OFFICE_HOURS, 'r', encoding="utf-8") as file:
-        data = json.load(file)
-        answer = query_model(data, sanitized)
-        print(answer)
+    index = get_index()
+    answer = (prepared or prepare_office_hours(query))["answer"]
+    if answer is None:
+        # No confident professor match: let the LLM pick from the full list
+        answer = query_model(index.data, sanitized)
+    print(answer)
     return answer
 
 def query_model(file, query: str) -> str:
     prompt = PromptTemplate(input_variables=["context", "question"], template=PROMPT_TEMPLATE)
-    llm = OllamaLLM(model="llama3", temperature=0.2)
+    llm = get_llm("llama3", temperature=0.2)
     formatted_prompt = prompt.format(context=file, question=query)
-    return llm.invoke(formatted_prompt)
\ No newline at end of file
+    with span("generate"):
+        return llm.invoke(formatted_prompt)
\ No newline at end of file
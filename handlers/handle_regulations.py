@@ -1,7 +1,26 @@
 from RAG import query_data
+from RAG.resources import get_vectorstore, get_lexical_index, get_semantic_cache, load_embeddings, load_llm
 
-def handle_regulations(query: str) -> str:
-    answer, sources = query_data.query_rag(query_text=query, k=5, model_name="llama3", temperature=0.2, rerank=True)
+# Hybrid BM25 + vector retrieval is the default; the LLM rerank only runs when it is uncertain
+RAG_SETTINGS = {"k": 5, "model_name": "llama3", "temperature": 0.2, "rerank": "auto"}
+
+def prefetch_regulations():
+    get_vectorstore("regulations")
+    get_lexical_index()
+    get_semantic_cache()
+    load_embeddings()
+    load_llm(RAG_SETTINGS["model_name"])
+
+def prepare_regulations(query: str) -> dict:
+    # Embedding and first-stage retrieval only, on text the caller may still change: no LLM
+    # rerank and no semantic-cache lookup; handle_regulations finishes it for the final transcript
+    return query_data.retrieve(query_text=query, candidates_only=True, **RAG_SETTINGS)
+
+def handle_regulations(query: str, prepared: dict = None) -> str:
+    answer, sources = query_data.query_rag(query_text=query, retrieval=prepared, **RAG_SETTINGS)
     print(answer)
     print(sources)
-    return answer
\ No newline at end of file
+    return answer
+
+def stream_regulations(query: str):
+    return query_data.stream_rag(query_text=query, **RAG_SETTINGS)
@@ -0,0 +1,245 @@
+"""
+Deterministic office-hours lookup.
+
+Professors are indexed by phonetic keys of their surname / given name plus the
+transcription variants in name_hints.NAME_HINTS, so "Dascalaki", "Tas ca la ki"
+or "Vehlioulis" resolve to the right entry without asking the LLM. Slot times are
+normalized to minutes since midnight and rendered in the fixed answer sentence.
+"""
+import json
+import re
+import unicodedata
+
+import reloader
+from name_hints import NAME_HINTS
+
+OFFICE_HOURS = "data/office_hours.json"
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+NO_HOURS = {"", "-", "—", "n/a", "na", "none", "no hours", "tbd"}
+
+# A surname hit must be at least this similar (1 - edit distance / length) to count
+MIN_SURNAME_SIMILARITY = 0.75
+# Longest run of transcript tokens joined together when looking for a name ("Tas ca la ki")
+MAX_NGRAM = 4
+
+GREEK_TO_LATIN = str.maketrans({
+    "α": "a", "β": "v", "γ": "g", "δ": "d", "ε": "e", "ζ": "z", "η": "i", "θ": "th",
+    "ι": "i", "κ": "k", "λ": "l", "μ": "m", "ν": "n", "ξ": "x", "ο": "o", "π": "p",
+    "ρ": "r", "σ": "s", "ς": "s", "τ": "t", "υ": "y", "φ": "f", "χ": "ch", "ψ": "ps", "ω": "o",
+})
+
+# Applied in order: collapse the spelling variants Greek names pick up in Latin script
+# and in speech-to-text (th/t, ch/h, b/v, c/k, dj/tz/z, ou/u, w/o, y/i, d/t, g/k ...)
+PHONETIC_RULES = (
+    ("dj", "z"), ("dz", "z"), ("tz", "z"), ("ts", "z"),
+    ("th", "t"), ("dh", "t"), ("ph", "f"), ("ch", "h"), ("kh", "h"),
+    ("ck", "k"), ("c", "k"), ("q", "k"), ("x", "ks"), ("gk", "g"),
+    ("ou", "u"), ("w", "o"), ("y", "i"), ("ei", "i"), ("oi", "i"), ("ai", "e"),
+    ("b", "v"), ("d", "t"), ("g", "k"), ("z", "s"), ("h", ""),
+)
+
+TIME_RE = re.compile(r"^(\d{1,2})(?:[:.](\d{2}))?\s*([ap])?\.?\s*m*\.?$")
+
+
+def fold(text: str) -> str:
+    """Lowercase, transliterate Greek, strip accents and keep letters only."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.translate(GREEK_TO_LATIN)
+    return re.sub(r"[^a-z]", "", text)
+
+
+def phonetic_key(text: str) -> str:
+    key = fold(text)
+    for src, dst in PHONETIC_RULES:
+        key = key.replace(src, dst)
+    key = re.sub(r"(.)\1+", r"\1", key)  # collapse doubled letters
+    if len(key) > 3 and key.endswith("s"):  # Daskalakis / Daskalaki
+        key = key[:-1]
+    return key
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up (returning limit + 1) once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        cur = [i]
+        for j, cb in enumerate(b, start=1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+def similarity(a: str, b: str) -> float:
+    longest = max(len(a), len(b)) or 1
+    limit = int(longest * (1 - MIN_SURNAME_SIMILARITY))
+    return 1 - edit_distance(a, b, limit) / longest
+
+
+def parse_time(raw) -> int | None:
+    """'12:00pmm' / '09:00am' / '14:30' / '9' -> minutes since midnight, None if unusable."""
+    if not isinstance(raw, str) or raw.strip().lower() in NO_HOURS:
+        return None
+    m = TIME_RE.match(raw.strip().lower())
+    if not m:
+        return None
+    hour, minute, meridiem = int(m.group(1)), int(m.group(2) or 0), m.group(3)
+    if minute > 59:
+        return None
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "p" else 0)
+    elif hour > 23:
+        return None
+    return hour * 60 + minute
+
+
+def format_time(minutes: int) -> str:
+    hour, minute = divmod(minutes, 60)
+    suffix = "am" if hour < 12 else "pm"
+    return f"{hour % 12 or 12}:{minute:02d}{suffix}"
+
+
+class OfficeSlot:
+    __slots__ = ("weekday", "start", "end")
+
+    def __init__(self, weekday: str, start: int, end: int):
+        self.weekday = weekday
+        self.start = start
+        self.end = end
+
+
+class Professor:
+    __slots__ = ("display_name", "surname", "given_name", "email", "phone", "slots")
+
+    def __init__(self, display_name, email, phone, slots):
+        self.display_name = display_name
+        parts = display_name.split()
+        self.surname = parts[0] if parts else display_name
+        self.given_name = " ".join(parts[1:])
+        self.email = (email or "").strip()
+        self.phone = (phone or "").strip()
+        self.slots = slots
+
+
+def parse_professor(entry: dict) -> Professor:
+    slots = []
+    for row in entry.get("hours") or []:
+        weekday = (row.get("weekday") or "").strip().capitalize()
+        start, end = parse_time(row.get("start")), parse_time(row.get("end"))
+        if weekday not in WEEKDAYS or start is None or end is None or end <= start:
+            continue
+        slots.append(OfficeSlot(weekday, start, end))
+    return Professor(entry.get("display_name", ""), entry.get("email"), entry.get("phone"), slots)
+
+
+def render_answer(prof: Professor) -> str:
+    email = f"email, {prof.email}" if prof.email else "email not provided"
+    phone = f"phone, {prof.phone}" if prof.phone else "phone not provided"
+    contact = f"Contact details are {email} and {phone}"
+    if not prof.slots:
+        return f"Based on the context, professor {prof.display_name} has no listed office hours. {contact}"
+
+    by_day = {}  # keeps weekday order as it appears in the JSON
+    for slot in prof.slots:
+        by_day.setdefault(slot.weekday, []).append(f"{format_time(slot.start)} to {format_time(slot.end)}")
+    days = ", ".join(f"{day} from {', '.join(ranges)}" for day, ranges in by_day.items())
+    return f"Based on the context, the office hours for professor {prof.display_name} are {days}. {contact}"
+
+
+class OfficeHoursIndex:
+    def __init__(self, data: dict, hints=NAME_HINTS):
+        self.data = data
+        self.professors = [parse_professor(entry) for entry in data.values()]
+        self.surname_keys = {}  # phonetic key -> set of professor positions
+        self.given_keys = {}
+        for pos, prof in enumerate(self.professors):
+            self.surname_keys.setdefault(phonetic_key(prof.surname), set()).add(pos)
+            for name in prof.given_name.split():
+                self.given_keys.setdefault(phonetic_key(name), set()).add(pos)
+        self._add_hints(hints)
+
+    def _add_hints(self, hints):
+        """Attach each transcription variant to the surname it is closest to."""
+        canonical = list(self.surname_keys.items())
+        for hint in hints:
+            key = phonetic_key(hint)
+            if not key or key in self.surname_keys or key in self.given_keys:
+                continue
+            best, best_sim = None, 0.0
+            for surname_key, positions in canonical:
+                # "Daskalopoulos" is a spoken fragment of "Papadaskalopoulos"
+                sim = 1.0 if len(key) >= 6 and key in surname_key else similarity(key, surname_key)
+                if sim > best_sim:
+                    best, best_sim = positions, sim
+            if best is not None and best_sim >= MIN_SURNAME_SIMILARITY:
+                self.surname_keys[key] = set(best)
+
+    def _candidates(self, query: str):
+        tokens = [t for t in re.split(r"[^\w]+", query) if t]
+        for size in range(1, MAX_NGRAM + 1):
+            for i in range(len(tokens) - size + 1):
+                key = phonetic_key("".join(tokens[i:i + size]))
+                if len(key) >= 3:
+                    yield key
+
+    def match(self, query: str):
+        """Return (Professor, score) for a confident match, else None."""
+        keys = set(self._candidates(query))
+        surname_score = {}
+        given_score = {}
+        for key in keys:
+            for pos in self.surname_keys.get(key, ()):
+                surname_score[pos] = 1.0
+            for pos in self.given_keys.get(key, ()):
+                given_score[pos] = 1.0
+
+        if not surname_score:
+            # No exact phonetic hit: fall back to edit distance against every surname variant
+            for key in keys:
+                if len(key) < 5:
+                    continue
+                for surname_key, positions in self.surname_keys.items():
+                    sim = similarity(key, surname_key)
+                    if sim >= MIN_SURNAME_SIMILARITY:
+                        for pos in positions:
+                            surname_score[pos] = max(surname_score.get(pos, 0.0), sim)
+
+        if not surname_score:
+            return None
+        ranked = sorted(
+            ((s + 0.5 * given_score.get(pos, 0.0), pos) for pos, s in surname_score.items()),
+            reverse=True,
+        )
+        if len(ranked) > 1 and ranked[0][0] - ranked[1][0] < 0.1:
+            return None  # e.g. "Birbas" alone: two professors share the surname
+        score, pos = ranked[0]
+        return self.professors[pos], score
+
+    def answer(self, query: str) -> str | None:
+        hit = self.match(query)
+        return render_answer(hit[0]) if hit else None
+
+
+def load_index(path: str = OFFICE_HOURS) -> OfficeHoursIndex:
+    with open(path, "r", encoding="utf-8") as f:
+        return OfficeHoursIndex(json.load(f))
+
+
+def _build() -> OfficeHoursIndex:
+    from handlers.snapshot import compiled  # imports this module
+    return compiled("office_hours") or load_index()
+
+
+def get_index() -> OfficeHoursIndex:
+    """The engine of the running turn's data generation (see reloader)."""
+    return reloader.resolve("office_hours")
+
+
+reloader.register("office_hours", _build, lambda: [OFFICE_HOURS])
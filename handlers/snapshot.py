@@ -0,0 +1,139 @@
+"""
+Compiled snapshot of the deterministic lookup engines.
+
+compile_snapshot() builds the office-hours, exams and academic-calendar engines from
+their JSON files once - typed, slotted records with times in minutes since midnight,
+ISO / datetime.date dates, and the token, trigram, phonetic and interval indexes -
+and pickles them into data/engines.snapshot. At startup each engine's get_engine()
+takes its prebuilt instance from the snapshot in one read, so no JSON is parsed and
+no date or time is reformatted on the request path.
+
+Every engine is stored with a hash of its data file and of the code that builds it;
+an engine whose sources changed since the compile (or a snapshot written by another
+SNAPSHOT_VERSION) is ignored and rebuilt from JSON as before. The snapshot is a local
+build artifact - never load one from an untrusted source.
+
+    python -m handlers.snapshot          # or: python tools/build_data.py engines_snapshot
+"""
+import hashlib
+import os
+import pickle
+import sys
+import threading
+
+from handlers import calendar_engine, exams_engine, office_hours_engine
+
+SNAPSHOT_PATH = "data/engines.snapshot"
+SNAPSHOT_VERSION = 1
+
+_CODE = os.path.dirname(os.path.abspath(__file__))
+_ROOT = os.path.dirname(_CODE)
+# engine name -> the files its compiled form depends on
+SOURCES = {
+    "office_hours": (office_hours_engine.OFFICE_HOURS, office_hours_engine.__file__,
+                     os.path.join(_ROOT, "name_hints.py")),
+    "exams": (exams_engine.EXAMS_SCHEDULE, exams_engine.__file__, os.path.join(_CODE, "date_phrases.py")),
+    "calendar": (calendar_engine.ACADEMIC_CALENDAR, calendar_engine.__file__, os.path.join(_CODE, "date_phrases.py")),
+}
+BUILDERS = {
+    "office_hours": office_hours_engine.load_index,
+    "exams": exams_engine.load_engine,
+    "calendar": calendar_engine.load_engine,
+}
+
+_payload = None  # the last snapshot read, and the (mtime, size) it was read at
+_payload_key = None
+_payload_lock = threading.Lock()
+
+
+def fingerprint(paths) -> str | None:
+    h = hashlib.sha256()
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                h.update(f.read())
+        except FileNotFoundError:
+            return None
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def compile_snapshot(path: str = SNAPSHOT_PATH) -> dict:
+    """Build every engine from JSON and write the snapshot; returns name -> engine."""
+    engines = {name: build() for name, build in BUILDERS.items()}
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "fingerprints": {name: fingerprint(SOURCES[name]) for name in engines},
+        "engines": engines,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return engines
+
+
+def _read_payload(path: str):
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except Exception as e:  # truncated file, or classes that no longer unpickle
+        print(f"[snapshot] ignoring {path}: {e!r}")
+        return None
+    if not isinstance(payload, dict) or payload.get("version") != SNAPSHOT_VERSION:
+        return None
+    return payload
+
+
+def read_snapshot(path: str = SNAPSHOT_PATH) -> dict:
+    """name -> engine for every engine in the snapshot whose sources are unchanged."""
+    payload = _read_payload(path) or {}
+    fingerprints = payload.get("fingerprints", {})
+    return {
+        name: engine for name, engine in payload.get("engines", {}).items()
+        if name in SOURCES and fingerprints.get(name) == fingerprint(SOURCES[name])
+    }
+
+
+def compiled(name: str, path: str = SNAPSHOT_PATH):
+    """
+    The snapshot's engine for name, or None when it has to be built from JSON. The
+    sources are checked on every call, so a reload after a data edit falls back to JSON.
+    """
+    global _payload, _payload_key
+    try:
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+    with _payload_lock:
+        if key != _payload_key:
+            _payload, _payload_key = _read_payload(path), key
+        payload = _payload
+    if not payload or name not in SOURCES:
+        return None
+    if payload["fingerprints"].get(name) != fingerprint(SOURCES[name]):
+        return None
+    return payload["engines"].get(name)
+
+
+def warm_engines():
+    """Load all three engines (from the snapshot where current) ahead of the first call."""
+    office_hours_engine.get_index()
+    exams_engine.get_engine()
+    calendar_engine.get_engine()
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_PATH
+    engines = compile_snapshot(path)
+    print(f"Wrote {path} ({os.path.getsize(path) / 1024:.0f} KB): "
+          f"{len(engines['office_hours'].professors)} professors, {len(engines['exams'].records)} exams, "
+          f"{len(engines['calendar'].index.events)} calendar events")
+
+
+if __name__ == "__main__":
+    main()
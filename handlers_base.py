@@ -1,10 +1,12 @@
 from enum import Enum
 
-from handlers.handle_academic_calendar import handle_academic_calendar
+from handlers.handle_academic_calendar import (handle_academic_calendar, prepare_academic_calendar,
+                                               prefetch_academic_calendar)
 from handlers.handle_daily_schedule import handle_daily_schedule
-from handlers.handle_exams_program import handle_exams_program
-from handlers.handle_office_hours import handle_office_hours
-from handlers.handle_regulations import handle_regulations
+from handlers.handle_exams_program import handle_exams_program, prepare_exams_program, prefetch_exams_program
+from handlers.handle_office_hours import handle_office_hours, prepare_office_hours, prefetch_office_hours
+from handlers.handle_regulations import (handle_regulations, stream_regulations, prepare_regulations,
+                                         prefetch_regulations)
 
 
 class Sector(Enum):
@@ -36,4 +38,38 @@ HANDLERS = {
     Sector.DAILY_CLASS_SCHEDULE: handle_daily_schedule,
     Sector.ACADEMIC_CALENDAR: handle_academic_calendar,
     Sector.DEPARTMENT_REGULATIONS: handle_regulations,
-}
\ No newline at end of file
+}
+
+# Sectors whose answer can be streamed as it is generated; the rest are spoken whole
+STREAM_HANDLERS = {
+    Sector.DEPARTMENT_REGULATIONS: stream_regulations,
+}
+
+# Answer preparation that can start on a partial transcript; the handler takes the
+# result as prepared=. Pairs are (prepare, how similar the final transcript must be
+# to reuse it): retrieval tolerates small wording changes, deterministic lookups
+# (a different name or date is a different answer) need the same normalized text.
+PREPARERS = {
+    Sector.EXAMS_PROGRAM: (prepare_exams_program, 1.0),
+    Sector.OFFICE_HOURS: (prepare_office_hours, 1.0),
+    Sector.ACADEMIC_CALENDAR: (prepare_academic_calendar, 1.0),
+    Sector.DEPARTMENT_REGULATIONS: (prepare_regulations, 0.9),
+}
+
+# Run when the caller picks the sector, while its prompt is being spoken: open the
+# sector's collection / index and get its model (and fixed prompt prefix) into Ollama
+PREFETCHERS = {
+    Sector.EXAMS_PROGRAM: prefetch_exams_program,
+    Sector.OFFICE_HOURS: prefetch_office_hours,
+    Sector.ACADEMIC_CALENDAR: prefetch_academic_calendar,
+    Sector.DEPARTMENT_REGULATIONS: prefetch_regulations,
+}
+
+# Data each sector's answers are derived from; used to invalidate cached responses
+SECTOR_DEPENDENCIES = {
+    Sector.EXAMS_PROGRAM: {"files": ["data/final_exams_schedule.json"], "collections": ["exams"]},
+    Sector.OFFICE_HOURS: {"files": ["data/office_hours.json"]},
+    Sector.DAILY_CLASS_SCHEDULE: {},
+    Sector.ACADEMIC_CALENDAR: {"files": ["data/academic_calendar.json"], "today": True},
+    Sector.DEPARTMENT_REGULATIONS: {"collections": ["regulations"]},
+}
@@ -1,49 +1,114 @@
 import os
 import json
+import threading
+import time
 import traceback
 
-from twilio.twiml.voice_response import VoiceResponse, Gather
+from twilio.twiml.voice_response import VoiceResponse, Gather, Connect
 from name_hints import NAME_HINTS
 
-from flask import Flask, request
+from flask import Flask, Blueprint, Response, current_app, request, jsonify
 from flask_sock import Sock
-import ngrok
-from twilio.rest import Client
 from dotenv import load_dotenv
-from handlers_base import Sector, SECTOR_PROMPTS, HANDLERS
+from handlers_base import Sector, SECTOR_PROMPTS, HANDLERS, SECTOR_DEPENDENCIES, PREPARERS, PREFETCHERS
+import reloader
+from RAG.resources import warm_up, get_semantic_cache, CHROMA_PATH
+from RAG.rerank import SCORE_CACHE
+from RAG.context_packing import PACKING_STATS
+from handlers.snapshot import warm_engines
+from dispatch import Dispatcher
+from response_cache import ResponseCache
+from streaming import stream_turn, parse_setup, encode
+from session_store import make_store
+from speculation import Speculator
+from warmup import ModelKeeper, Prefetcher
+from tracing import start_trace, end_trace, set_sector, span, observe, render_metrics, recent_traces
+from tunnel import (INCOMING_CALL_ROUTE, twilio_client_from_env, resolve_public_url, configure_number,
+                    close_tunnel)
 
 load_dotenv()
 
-PORT = 8080
+PORT = int(os.getenv("PORT", "8080"))
 DEBUG = False
-INCOMING_CALL_ROUTE = '/select_sector'
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", "4"))
+DISPATCH_QUEUE_SIZE = int(os.getenv("DISPATCH_QUEUE_SIZE", "32"))
+# Answer over a ConversationRelay WebSocket, sentence by sentence, instead of <Say> after the fact
+STREAMING_MODE = os.getenv("STREAMING_MODE", "0") == "1"
+# Seconds between retries of a failed engine / collection warm-up
+WARM_UP_RETRY_SECONDS = float(os.getenv("WARM_UP_RETRY_SECONDS", "30"))
+RELAY_ROUTE = '/relay'
+
+bp = Blueprint("secretariat", __name__)
+sock = Sock()
+
+SESSIONS = make_store()  # CallSid -> CallSession; backend from SESSION_BACKEND
+DISPATCHER = Dispatcher(workers=DISPATCH_WORKERS, max_queue=DISPATCH_QUEUE_SIZE)
+RESPONSE_CACHE = ResponseCache(SECTOR_DEPENDENCIES, chroma_path=CHROMA_PATH)
+SPECULATOR = Speculator(PREPARERS)
+MODEL_KEEPER = ModelKeeper()  # llama3 + nomic-embed-text, pinged every KEEPALIVE_PING_SECONDS
+PREFETCHER = Prefetcher(PREFETCHERS)
+WATCHER = reloader.Watcher()  # RELOAD_POLL_SECONDS between checks; 0 disables hot reload
+WARMED_UP = threading.Event()
+
+
+def create_app(public_url: str = None, twilio_client=None, warm: bool = True) -> Flask:
+    """
+    Build the app for one worker process. public_url defaults to PUBLIC_URL (the
+    tunnel or domain Twilio reaches us at); twilio_client defaults to one built from
+    the TWILIO_* environment variables.
+    """
+    app = Flask(__name__)
+    app.config["PUBLIC_URL"] = (public_url or os.environ["PUBLIC_URL"]).rstrip("/")
+    app.extensions["twilio"] = twilio_client or twilio_client_from_env()
+    app.register_blueprint(bp)
+    sock.init_app(app)
+    if warm:
+        # Open the shared Chroma client/collections and load the models before the first caller arrives
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    else:
+        WARMED_UP.set()
+    WATCHER.start()  # picks up data/ and chroma/ updates without a restart
+    return app
+
+
+def _warm_up():
+    # The models and readiness do not wait on the data: a missing collection or data file
+    # is opened by the first turn that needs it, and retried here until it warms up
+    data_ok = _warm_data()
+    MODEL_KEEPER.preload()  # a model that fails to load is retried by the keep-alive pings
+    MODEL_KEEPER.start()
+    WARMED_UP.set()
+    while not data_ok:
+        time.sleep(WARM_UP_RETRY_SECONDS)
+        data_ok = _warm_data()
+
 
-# Twilio authentication
-account_sid = os.environ['TWILIO_ACCOUNT_SID']
-api_key = os.environ['TWILIO_API_KEY_SID']
-api_secret = os.environ['TWILIO_API_SECRET']
-client = Client(api_key, api_secret, account_sid)
+def _warm_data() -> bool:
+    try:
+        warm_engines()
+        warm_up()
+        return True
+    except Exception as e:
+        print("Warm-up error:", repr(e))
+        traceback.print_exc()
+        return False
 
-# Twilio phone number to call
-TWILIO_NUMBER = os.environ['TWILIO_NUMBER']
 
-# ngrok authentication
-ngrok.set_auth_token(os.getenv("NGROK_AUTHTOKEN"))
-app = Flask(__name__)
-sock = Sock(app)
+def _public_url() -> str:
+    return current_app.config["PUBLIC_URL"]
 
-SESSION = {}  # key: CallSid -> {"sector": Sector, "last_result": str}
 
-def _safe_redirect_call(call_sid: str, url: str):
+def _safe_redirect_call(client, call_sid: str, url: str):
     try:
-        client.calls(call_sid).update(url=url, method="POST")
+        with span("twilio_redirect"):
+            client.calls(call_sid).update(url=url, method="POST")
     except Exception as e:
         print("Redirect error:", repr(e))
 
-@app.route("/welcome", methods=["GET", "POST"])
+@bp.route("/welcome", methods=["GET", "POST"])
 def welcome_base():
     response = VoiceResponse()
-    gather = Gather(method='POST', action=f"{NGROK_URL}{INCOMING_CALL_ROUTE}", numDigits="1", timeout=5)
+    gather = Gather(method='POST', action=f"{_public_url()}{INCOMING_CALL_ROUTE}", numDigits="1", timeout=5)
     gather.say("Press 1 for Exams Schedule. \n"
                "2 for Office Hours. \n"
                "3 for Daily Schedule. \n"
@@ -56,12 +121,13 @@ def welcome_base():
     response.redirect("/welcome") #if no input re-prompt
     return str(response)
 
-@app.route("/select_sector", methods=["POST"])
+@bp.route(INCOMING_CALL_ROUTE, methods=["POST"])
 def select_sector():
     digit_pressed = request.values.get('Digits', None)
     call_sid = request.values.get('CallSid')
     response = VoiceResponse()
     if digit_pressed == "6":
+        SESSIONS.finish(call_sid)
         response.say("Goodbye", language='en-GB')
         response.hangup()
         return str(response)
@@ -76,31 +142,47 @@ def select_sector():
         response.redirect("/welcome")
         return str(response)
 
-    SESSION.setdefault(call_sid, {})["sector"] = sector
+    SESSIONS.update(call_sid, sector=sector)
+    PREFETCHER.prefetch(sector)  # runs while the prompt below is being spoken
     prompt = SECTOR_PROMPTS[sector]
 
     response.say(prompt, language='en-GB')
+    if STREAMING_MODE:
+        # Hand the turn to the /relay WebSocket; Twilio follows the action URL when it ends
+        connect = Connect(action=f"{_public_url()}/welcome")
+        relay = connect.conversation_relay(
+            url=_public_url().replace("https://", "wss://").replace("http://", "ws://") + RELAY_ROUTE,
+            language='en-GB',
+            hints=",".join(NAME_HINTS),
+        )
+        relay.parameter(name="sector", value=sector.value)
+        response.append(connect)
+        return str(response)
     response.redirect("/voice")
     return str(response)
 
-@app.route("/voice", methods=["GET", "POST"])
+@bp.route("/voice", methods=["GET", "POST"])
 def voice():
     response = VoiceResponse()
     call_sid = request.values.get("CallSid")
-    sess = SESSION.setdefault(call_sid, {})
-    sess["transcription_active"] = True
-    sess["handled_turn"] = False
+    SESSIONS.update(call_sid, transcription_active=True, handled_turn=False)
     start = response.start()
-    start.transcription(statusCallbackUrl=f"{listener.url()}/transcribe", transcription_engine='google', speech_model='telephony', hints=NAME_HINTS)
+    start.transcription(statusCallbackUrl=f"{_public_url()}/transcribe", transcription_engine='google', speech_model='telephony', hints=NAME_HINTS,
+                        partial_results=True)
     response.pause(length=120)
     return str(response)
 
 
-@app.route("/transcribe", methods=['POST'])
+@bp.route("/transcribe", methods=['POST'])
 def transcribe_callback():
+    call_sid = request.form.get("CallSid")  # used for session + redirect, and as the trace id
+    with start_trace(call_sid), span("webhook"):
+        return _transcribe(call_sid)
+
+
+def _transcribe(call_sid):
     # Use .form because Twilio sends data as form-encoded, not JSON
     event = request.form.get('TranscriptionEvent')
-    call_sid = request.form.get("CallSid")  # used for session + redirect
 
     if event != "transcription-content":
         return "", 204
@@ -115,75 +197,239 @@ def transcribe_callback():
         except json.JSONDecodeError:
             text = payload
 
-    # Session + duplicate-chunk guard
-    sess = SESSION.setdefault(call_sid, {})
-    if not sess.get("transcription_active", False):
-        print("[transcribe] Ignored: transcription no longer active.")
+    # Interim result while the caller is still talking: start preparing the answer
+    if request.form.get("Final", "true").lower() != "true":
+        sess = SESSIONS.get(call_sid)
+        set_sector(sess.sector)
+        if sess.transcription_active and not sess.handled_turn:
+            SPECULATOR.speculate(call_sid, sess.sector, text)
         return "", 204
-    if sess.get("handled_turn", False):
-        print("[transcribe] Ignored: turn already handled.")
+
+    # Dispatch workers run outside the request context, so bind what they need now
+    client = current_app.extensions["twilio"]
+    speak_result_url = f"{_public_url()}/speak_result"
+
+    # Session + duplicate-chunk guard: the turn is taken atomically, so later
+    # transcription chunks are ignored while it runs (in any worker process)
+    refused = SESSIONS.claim_turn(call_sid)
+    if refused:
+        print(f"[transcribe] Ignored: {refused}.")
         return "", 204
 
-    sector = sess.get("sector")
+    sector = SESSIONS.get(call_sid).sector
+    set_sector(sector)
     print(f"[transcribe] Sector: {sector} | Text: {text!r}")
 
     # If we got no usable text, respond kindly and go to menu
     if not text or not text.strip():
-        sess["last_result"] = "Returning back to menu."
-        sess["handled_turn"] = True
-        _safe_redirect_call(call_sid, f"{NGROK_URL}/speak_result")
+        SESSIONS.update(call_sid, last_result="Returning back to menu.")
+        SPECULATOR.discard(call_sid)
+        _safe_redirect_call(client, call_sid, speak_result_url)
         return "", 204
 
-    # Dispatch
-    handler = HANDLERS.get(sector)
-    if not handler:
-        result_text = "Not a valid selection."
-    else:
+    query = text.strip()
+
+    def run_turn():
+        observe("dispatch_wait", time.perf_counter() - queued_at)
+        handler = HANDLERS.get(sector)
+        if not handler:
+            return "Not a valid selection."
         try:
-            result_text = handler(text.strip())
+            # The whole turn runs on one data generation, even if a reload lands meanwhile
+            with reloader.pinned():
+                # Reuse what was prepared from the interim transcripts, if it still applies
+                prepared = SPECULATOR.resolve(call_sid, sector, query)
+                with span("handler"):
+                    result_text = handler(query, prepared=prepared) if prepared is not None else handler(query)
         except Exception as e:
             print("Handler error:", repr(e))
             traceback.print_exc()
-            result_text = "An error occurred during the processing of the request."
+            return "An error occurred during the processing of the request."
+        if result_text:  # an empty answer is spoken as the error sentence; never cache it
+            RESPONSE_CACHE.put(sector, query, data_version, result_text)
+        return result_text
+
+    def finish_turn(result_text, error):
+        # Always set result + redirect (success OR failure)
+        SESSIONS.update(call_sid,
+                        last_result=result_text or "An error occurred during the processing of the request.",
+                        transcription_active=False)
+        _safe_redirect_call(client, call_sid, speak_result_url)
+        print("[transcribe] Processed transcript, redirecting to speak_result.")
+
+    # Same transcript against unchanged data: answer without running the handler
+    cached, data_version = RESPONSE_CACHE.get(sector, query)
+    if cached is not None:
+        print("[transcribe] Response cache hit.")
+        SPECULATOR.discard(call_sid)
+        finish_turn(cached, None)
+        return "", 204
+
+    label = sector.name if sector else "none"
+    queued_at = time.perf_counter()
+    if not DISPATCHER.submit(label, run_turn, finish_turn):
+        print("[transcribe] Dispatch queue full, turn rejected.")
+        SPECULATOR.discard(call_sid)
+        finish_turn("All our lines are busy right now. Please try again in a moment.", None)
+    return "", 204
 
-    # Always set result + redirect (success OR failure)
-    sess["last_result"] = result_text
-    sess["handled_turn"] = True
-    sess["transcription_active"] = False
-    _safe_redirect_call(call_sid, f"{NGROK_URL}/speak_result")
 
-    print("[transcribe] Processed transcript, redirecting to speak_result.")
+@sock.route(RELAY_ROUTE, bp=bp)
+def relay(ws):
+    """ConversationRelay session: one caller turn, answered sentence by sentence."""
+    call_sid, sector = None, None
+    while True:
+        raw = ws.receive()
+        if raw is None:
+            break
+        msg = json.loads(raw)
+        kind = msg.get("type")
+        if kind == "setup":
+            call_sid, sector = parse_setup(msg)
+            print(f"[relay] Setup for {call_sid} | Sector: {sector}")
+        elif kind == "prompt":
+            if not msg.get("last", True):
+                continue  # partial utterance; wait for the final one
+            query = (msg.get("voicePrompt") or "").strip()
+            print(f"[relay] Sector: {sector} | Text: {query!r}")
+            send = lambda m: ws.send(encode(m))
+            with start_trace(call_sid, sector), span("relay_turn"), reloader.pinned():
+                if not query:
+                    result_text = stream_turn(send, sector, query, pieces=["Returning back to menu."])
+                else:
+                    cached, data_version = RESPONSE_CACHE.get(sector, query)
+                    result_text = stream_turn(
+                        send, sector, query,
+                        on_complete=lambda text: RESPONSE_CACHE.put(sector, query, data_version, text),
+                        pieces=[cached] if cached is not None else None,
+                    )
+            end_trace(call_sid)
+            SESSIONS.update(call_sid, last_result=result_text)
+            ws.send(encode({"type": "end", "handoffData": json.dumps({"reason": "answered"})}))
+            break
+        elif kind == "error":
+            print("[relay] Twilio error:", msg.get("description"))
+
+
+@bp.route("/dispatch_stats", methods=["GET"])
+def dispatch_stats():
+    return jsonify(DISPATCHER.stats())
+
+
+@bp.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    return jsonify({
+        "response_cache": RESPONSE_CACHE.stats(),
+        "semantic_cache": get_semantic_cache().stats(),
+        "rerank_scores": SCORE_CACHE.stats(),
+        "context_packing": PACKING_STATS.stats(),
+    })
+
+
+@bp.route("/speculation_stats", methods=["GET"])
+def speculation_stats():
+    return jsonify(SPECULATOR.stats())
+
+
+@bp.route("/warmup_stats", methods=["GET"])
+def warmup_stats():
+    return jsonify({"models": MODEL_KEEPER.stats(), "prefetch": PREFETCHER.stats()})
+
+
+@bp.route("/session_stats", methods=["GET"])
+def session_stats():
+    return jsonify(SESSIONS.stats())
+
+
+@bp.route("/call_status", methods=["POST"])
+def call_status():
+    # Twilio status callback: finished calls are evicted ahead of live ones
+    if request.values.get("CallStatus") in ("completed", "busy", "failed", "no-answer", "canceled"):
+        SESSIONS.finish(request.values.get("CallSid"))
+        SPECULATOR.discard(request.values.get("CallSid"))
+        end_trace(request.values.get("CallSid"))
     return "", 204
 
 
-@app.route("/speak_result", methods=["POST"])
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    dispatch = DISPATCHER.stats()
+    gauges = {
+        "secretariat_dispatch_busy_workers": ("Dispatch workers running a turn.", dispatch["busy_workers"]),
+        "secretariat_dispatch_queue_depth": ("Turns waiting for a dispatch worker.", dispatch["queue_depth"]),
+        "secretariat_response_cache_hit_rate": ("Response cache hit rate.", RESPONSE_CACHE.stats()["hit_rate"]),
+        "secretariat_semantic_cache_hit_rate": ("Semantic answer cache hit rate.", get_semantic_cache().stats()["hit_rate"]),
+        "secretariat_speculation_hit_rate": ("Turns that reused a speculative result.", SPECULATOR.stats()["hit_rate"]),
+        "secretariat_data_generation": ("Data generation in use (increments on every hot reload).",
+                                        reloader.current().number),
+    }
+    return Response(render_metrics(gauges), mimetype="text/plain; version=0.0.4")
+
+
+@bp.route("/traces", methods=["GET"])
+def traces():
+    # Recent per-turn span timelines; ?call_sid= narrows to one call
+    return jsonify(recent_traces(request.args.get("call_sid")))
+
+
+@bp.route("/status", methods=["GET"])
+def status():
+    # Data generation in use: per-source versions, last reload, turns still on older generations
+    return jsonify({**reloader.status(), "pid": os.getpid()})
+
+
+@bp.route("/healthz", methods=["GET"])
+def healthz():
+    # Liveness: the worker process is up and serving requests
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+
+@bp.route("/readyz", methods=["GET"])
+def readyz():
+    # Readiness: warmed up, able to take another turn, and the session backend answers
+    checks = {"warmed_up": WARMED_UP.is_set()}
+    stats = DISPATCHER.stats()
+    checks["dispatch_capacity"] = stats["queue_depth"] < stats["queue_capacity"]
+    try:
+        SESSIONS.stats()
+        checks["session_store"] = True
+    except Exception as e:
+        print("Session store check failed:", repr(e))
+        checks["session_store"] = False
+    ready = all(checks.values())
+    return jsonify({"ready": ready, "checks": checks, "pid": os.getpid()}), (200 if ready else 503)
+
+
+@bp.route("/speak_result", methods=["POST"])
 def speak_result():
     call_sid = request.values.get("CallSid")
-    response = VoiceResponse()
-    stop = response.stop()
-    stop.transcription()
-    text = SESSION.get(call_sid, {}).get("last_result") or "No results for announcement."
-    response.say(text, language='en-GB')
-    response.pause(length=1)
-    SESSION.setdefault(call_sid, {}).pop("handled_turn", None)
-    response.redirect("/welcome")
+    with start_trace(call_sid), span("speak_result"):
+        response = VoiceResponse()
+        stop = response.stop()
+        stop.transcription()
+        sess = SESSIONS.get(call_sid)
+        text = sess.last_result or "No results for announcement."
+        response.say(text, language='en-GB')
+        response.pause(length=1)
+        SESSIONS.update(call_sid, handled_turn=False)
+        response.redirect("/welcome")
+        if sess.turn_started:
+            # Final transcript to answer delivery, across whichever workers handled the turn
+            observe("turn", time.time() - sess.turn_started, sector=sess.sector)
+    end_trace(call_sid)
     return str(response)
 
 
 if __name__ == "__main__":
+    # Development server; production runs wsgi:app under gunicorn (see gunicorn.conf.py)
+    public_url, tunneled = resolve_public_url(PORT)
     try:
-        # Open Ngrok tunnel
-        listener = ngrok.forward(f"http://localhost:{PORT}")
-        print(f"Ngrok tunnel opened at {listener.url()} for port {PORT}")
-        NGROK_URL = listener.url()
-
-        # Set ngrok URL to ne the webhook for the appropriate Twilio number
-        twilio_numbers = client.incoming_phone_numbers.list()
-        twilio_number_sid = [num.sid for num in twilio_numbers if num.phone_number == TWILIO_NUMBER][0]
-        client.incoming_phone_numbers(twilio_number_sid).update(account_sid, voice_url=f"{NGROK_URL}{INCOMING_CALL_ROUTE}")
-
-        # run the app
-        app.run(host='0.0.0.0', port=PORT, debug=DEBUG)
+        client = twilio_client_from_env()
+        # Set the public URL to be the webhook for the appropriate Twilio number
+        configure_number(client, public_url)
+        app = create_app(public_url, client)
+        app.run(host='0.0.0.0', port=PORT, debug=DEBUG, threaded=True)
     finally:
         # Always disconnect the ngrok tunnel
-        ngrok.disconnect()
\ No newline at end of file
+        if tunneled:
+            close_tunnel()
\ No newline at end of file
@@ -0,0 +1,302 @@
+"""
+Hot reload of the data files and Chroma collections, without a restart.
+
+Everything built from data/ or chroma/ (the lookup engines, the Chroma client and
+its collections, the BM25 index) is a registered resource: a build function plus
+the files it was built from. A generation holds one built instance of each. A
+watcher thread polls the mtimes of those files; when one changed (and held still
+for one poll, so a half-written file is never read) it builds the affected
+resources in the background, carries the others over, and swaps the new
+generation in with a single assignment.
+
+A turn pins the generation that is current when it starts (with pinned(): ...), and
+every get_engine() / get_vectorstore() inside it resolves against that generation,
+so a turn that straddles a swap finishes on the data it started with. The old
+generation is dropped once its last turn has left, and the instances it replaced
+are closed then (for resources registered with a close function).
+
+Chroma is watched through the collection version stamps (chroma/<name>.version) the
+indexers write when they finish, not the database files, which change mid-index.
+"""
+import contextvars
+import hashlib
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+POLL_SECONDS = float(os.getenv("RELOAD_POLL_SECONDS", "2"))
+
+
+class Resource:
+    __slots__ = ("name", "build", "sources", "close")
+
+    def __init__(self, name, build, sources, close=None):
+        self.name = name
+        self.build = build  # () -> object
+        self.sources = sources  # () -> [paths]; a change to any of them means a rebuild
+        self.close = close  # (object) -> None, for an instance no turn uses any more
+
+
+_resources = {}  # name -> Resource
+
+
+def register(name: str, build, sources, close=None):
+    _resources[name] = Resource(name, build, sources, close)
+
+
+def stamp(paths) -> tuple:
+    """What a poll compares: (path, mtime_ns, size) per source, None for a missing file."""
+    out = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            out.append((path, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            out.append((path, None, None))
+    return tuple(out)
+
+
+def label(path: str) -> str:
+    """Human-readable version of one source: the stamp of a Chroma collection, else a content hash."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return "missing"
+    if path.endswith(".version"):
+        return data.decode("utf-8").strip() or "unversioned"
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+class Generation:
+    def __init__(self, number: int, objects=None, stamps=None, labels=None, changed=()):
+        self.number = number
+        self.objects = dict(objects or {})  # resource name -> built instance
+        self.stamps = dict(stamps or {})  # resource name -> stamp of its sources when built
+        self.labels = dict(labels or {})  # resource name -> {path: label}
+        self.changed = list(changed)
+        self.created = time.time()
+        self.in_flight = 0
+        self.retired = False  # replaced by a newer generation
+        self.released = False  # retired and drained; its own instances are closed
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    def get(self, name: str):
+        """The resource's instance in this generation (None is a valid one), built on first use."""
+        if name in self.objects:
+            return self.objects[name]
+        with self._lock:
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+        with build_lock:
+            if name in self.objects:
+                obj = self.objects[name]
+            else:
+                stamps, labels, obj = _build(_resources[name])
+                with self._lock:
+                    self.stamps[name], self.labels[name] = stamps, labels
+                    self.objects[name] = obj
+        return obj
+
+    def enter(self) -> bool:
+        """Count a turn in; False if the generation was already replaced and closed."""
+        with self._lock:
+            if self.released:
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+            drained = self.in_flight == 0 and self.retired
+        if drained:
+            _release(self)
+
+    def retire(self):
+        """Mark the generation as replaced; it is released once no turn is left on it."""
+        with self._lock:
+            self.retired = True
+            drained = self.in_flight == 0
+        if drained:
+            _release(self)
+
+    def version(self) -> str:
+        """One short id for everything this generation has loaded."""
+        with self._lock:
+            items = sorted((p, v) for labels in self.labels.values() for p, v in labels.items())
+        return hashlib.sha256(repr(items).encode()).hexdigest()[:12]
+
+
+def _build(res: Resource):
+    # Stamp before building: a change made during the build is picked up by the next poll
+    paths = list(res.sources())
+    stamps = stamp(paths)
+    labels = {p: label(p) for p in paths}
+    return stamps, labels, res.build()
+
+
+_current = Generation(1)
+_pinned = contextvars.ContextVar("data_generation", default=None)
+_swap_lock = threading.Lock()  # one reload at a time
+_draining_lock = threading.Lock()
+_draining = []  # replaced generations with turns still running on them
+_stats = {"reloads": 0, "failures": 0, "last_reload": None, "last_error": None}
+_failed = {}  # resource name -> stamp whose build failed; not retried until the files change again
+
+
+def _release(gen: Generation):
+    with gen._lock:
+        if gen.released:
+            return
+        gen.released = True
+    with _draining_lock:
+        if gen in _draining:
+            _draining.remove(gen)
+        # Instances carried over to a generation still in use stay open
+        live = {id(obj) for g in (_current, *_draining) for obj in list(g.objects.values())}
+    for name, obj in list(gen.objects.items()):
+        close = _resources[name].close
+        if close is None or obj is None or id(obj) in live:
+            continue
+        try:
+            close(obj)
+        except Exception as e:
+            print(f"[reload] Closing {name} of generation {gen.number} failed: {e!r}")
+            traceback.print_exc()
+
+
+def current() -> Generation:
+    return _current
+
+
+def active() -> Generation:
+    """The generation pinned by the running turn, else the current one."""
+    return _pinned.get() or _current
+
+
+def resolve(name: str):
+    return active().get(name)
+
+
+@contextmanager
+def pinned():
+    """Run the block (one caller turn) against the generation current when it starts."""
+    gen = _pinned.get()
+    if gen is not None:
+        yield gen  # nested: the outer turn already holds one
+        return
+    gen = _current
+    while not gen.enter():  # lost a race with a swap that closed it; take the new one
+        gen = _current
+    token = _pinned.set(gen)
+    try:
+        yield gen
+    finally:
+        _pinned.reset(token)
+        gen.leave()
+
+
+def changed_resources(gen: Generation) -> dict:
+    """name -> new stamp for every resource built in gen whose sources changed since."""
+    with gen._lock:
+        built = dict(gen.stamps)
+    out = {}
+    for name, old in built.items():
+        new = stamp(list(_resources[name].sources()))
+        if new != old and _failed.get(name) != new:
+            out[name] = new
+    return out
+
+
+def reload(names=None) -> Generation | None:
+    """
+    Build a new generation with the given (default: changed) resources rebuilt and
+    swap it in. Returns it, or None when there was nothing to do or a build failed
+    (the current generation then stays in place).
+    """
+    global _current
+    with _swap_lock:
+        old = _current
+        names = list(names) if names is not None else list(changed_resources(old))
+        if not names:
+            return None
+        with old._lock:
+            objects, stamps, labels = dict(old.objects), dict(old.stamps), dict(old.labels)
+        started = time.perf_counter()
+        for name in names:
+            try:
+                stamps[name], labels[name], objects[name] = _build(_resources[name])
+            except Exception as e:
+                _failed[name] = stamp(list(_resources[name].sources()))
+                _stats["failures"] += 1
+                _stats["last_error"] = f"{name}: {e!r}"
+                print(f"[reload] Rebuilding {name} failed, keeping generation {old.number}: {e!r}")
+                traceback.print_exc()
+                return None
+            _failed.pop(name, None)
+        new = Generation(old.number + 1, objects, stamps, labels, changed=names)
+        _current = new  # turns starting from here on see the new data
+        with _draining_lock:
+            _draining.append(old)
+        old.retire()
+        _stats["reloads"] += 1
+        _stats["last_reload"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        print(f"[reload] Generation {new.number} ({', '.join(names)}) in "
+              f"{time.perf_counter() - started:.2f}s")
+        return new
+
+
+class Watcher:
+    """Polls the sources of the current generation and reloads what changed."""
+
+    def __init__(self, interval: float = POLL_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._pending = {}  # name -> stamp seen at the previous poll
+        self._thread = None
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="data-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def poll(self):
+        seen = changed_resources(_current)
+        # Rebuild only what has stopped changing since the last poll
+        settled = [name for name, st in seen.items() if self._pending.get(name) == st]
+        self._pending = {name: st for name, st in seen.items() if name not in settled}
+        if settled:
+            reload(settled)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print("[reload] Watcher error:", repr(e))
+                traceback.print_exc()
+
+
+def status() -> dict:
+    gen = _current
+    with gen._lock:
+        labels = {name: dict(v) for name, v in sorted(gen.labels.items())}
+    with _draining_lock:
+        draining = [{"generation": g.number, "in_flight": g.in_flight} for g in _draining]
+    return {
+        "generation": gen.number,
+        "data_version": gen.version(),
+        "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(gen.created)),
+        "changed": gen.changed,
+        "in_flight": gen.in_flight,
+        "sources": labels,
+        "draining": draining,
+        **_stats,
+    }
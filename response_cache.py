@@ -0,0 +1,113 @@
+"""
+Exact response cache in front of HANDLERS dispatch.
+
+Entries are keyed by sector plus a normalized transcript and tagged with the
+version of the data that sector depends on (content hashes of its data files and
+the version stamps of its Chroma collections), so editing office_hours.json only
+invalidates office-hours answers.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from handlers.handle_office_hours import sanitize_query
+from RAG.index_version import collection_version
+
+MAX_ENTRIES = 2000
+TTL_SECONDS = 24 * 3600
+
+
+def normalize_transcript(text: str) -> str:
+    text = sanitize_query(text).casefold()
+    text = re.sub(r"[^\w\s]", " ", text)  # "Daskalaki?" == "daskalaki"
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class DataVersions:
+    """Content hashes of data files, recomputed only when a file's mtime or size changes."""
+
+    def __init__(self, chroma_path: str):
+        self.chroma_path = chroma_path
+        self._lock = threading.Lock()
+        self._hashes = {}  # path -> (mtime_ns, size, sha256)
+
+    def file_hash(self, path: str) -> str:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return "missing"
+        with self._lock:
+            cached = self._hashes.get(path)
+            if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                return cached[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                h.update(block)
+        digest = h.hexdigest()[:16]
+        with self._lock:
+            self._hashes[path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def version(self, deps: dict) -> str:
+        parts = [f"{p}={self.file_hash(p)}" for p in deps.get("files", ())]
+        parts += [f"{c}={collection_version(self.chroma_path, c)}" for c in deps.get("collections", ())]
+        if deps.get("today"):
+            parts.append(f"today={date.today().isoformat()}")  # relative answers ("tomorrow") change daily
+        return "|".join(parts)
+
+
+class ResponseCache:
+    def __init__(self, dependencies: dict, chroma_path: str = "chroma",
+                 max_entries: int = MAX_ENTRIES, ttl_seconds: float = TTL_SECONDS):
+        self.dependencies = dependencies
+        self.versions = DataVersions(chroma_path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (sector, normalized text) -> (version, created, answer)
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def sector_version(self, sector) -> str:
+        return self.versions.version(self.dependencies.get(sector, {}))
+
+    def get(self, sector, text: str):
+        """(answer or None, current data version); pass the version back to put()."""
+        version = self.sector_version(sector)
+        key = (sector, normalize_transcript(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version and time.time() - entry[1] <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2], version
+                del self._entries[key]
+                self.invalidated += 1
+            self.misses += 1
+            return None, version
+
+    def put(self, sector, text: str, version: str, answer: str):
+        key = (sector, normalize_transcript(text))
+        with self._lock:
+            self._entries[key] = (version, time.time(), answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidated": self.invalidated,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
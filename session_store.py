@@ -0,0 +1,290 @@
+"""
+Per-call session state, keyed by CallSid.
+
+A CallSession is a small __slots__ record. The SessionStore in front of it
+expires idle calls after a TTL, drops finished calls sooner (and first, when the
+store is full), and applies read-modify-write updates atomically per call, so the
+duplicate-transcript guard holds even with several worker processes.
+
+Backends are interchangeable and picked from SESSION_BACKEND:
+    memory                      in-process (default, single worker only)
+    sqlite:///path/sessions.db  shared by the processes of one host
+    redis://localhost:6379/0    any Redis-compatible server (needs the redis package)
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from handlers_base import Sector
+
+SESSION_TTL_SECONDS = 2 * 3600  # longest a silent call is kept
+FINISHED_TTL_SECONDS = 10 * 60  # finished calls linger briefly for late Twilio callbacks
+MAX_SESSIONS = 10000
+SWEEP_INTERVAL_SECONDS = 30
+
+
+class CallSession:
+    __slots__ = ("call_sid", "sector", "last_result", "transcription_active", "handled_turn",
+                 "finished", "turn_started", "created", "updated")
+
+    def __init__(self, call_sid, sector=None, last_result=None, transcription_active=False,
+                 handled_turn=False, finished=False, turn_started=None, created=None, updated=None):
+        now = time.time()
+        self.call_sid = call_sid
+        self.sector = sector
+        self.last_result = last_result
+        self.transcription_active = transcription_active
+        self.handled_turn = handled_turn
+        self.finished = finished
+        self.turn_started = turn_started  # wall clock of the final transcript, for turn latency
+        self.created = created or now
+        self.updated = updated or now
+
+    def expires(self) -> float:
+        return self.updated + (FINISHED_TTL_SECONDS if self.finished else SESSION_TTL_SECONDS)
+
+    def to_dict(self) -> dict:
+        d = {name: getattr(self, name) for name in self.__slots__}
+        d["sector"] = self.sector.value if self.sector else None
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        d = dict(d)
+        d["sector"] = next((s for s in Sector if s.value == d.get("sector")), None)
+        return cls(**d)
+
+    def encode(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def decode(cls, raw):
+        return cls.from_dict(json.loads(raw))
+
+
+def _claim_turn(s: CallSession):
+    """Take the current turn if it is open; the first transcript chunk wins."""
+    if not s.transcription_active:
+        return "transcription no longer active"
+    if s.handled_turn:
+        return "turn already handled"
+    s.handled_turn = True
+    s.turn_started = time.time()
+    return None
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # call_sid -> CallSession, least recently updated first
+        self._last_sweep = 0.0
+
+    def load(self, call_sid):
+        with self._lock:
+            s = self._sessions.get(call_sid)
+            if s is None or s.expires() < time.time():
+                return None
+            return CallSession(**{name: getattr(s, name) for name in CallSession.__slots__})
+
+    def modify(self, call_sid, fn):
+        with self._lock:
+            s = self._sessions.get(call_sid)
+            if s is None or s.expires() < time.time():
+                s = CallSession(call_sid)
+            result = fn(s)
+            s.updated = time.time()
+            self._sessions[call_sid] = s
+            self._sessions.move_to_end(call_sid)
+            self._evict()
+            return result
+
+    def _evict(self):
+        now = time.time()
+        if now - self._last_sweep >= SWEEP_INTERVAL_SECONDS:
+            self._last_sweep = now
+            for sid in [sid for sid, s in self._sessions.items() if s.expires() < now]:
+                del self._sessions[sid]
+        if len(self._sessions) <= self.max_sessions:
+            return
+        finished = [sid for sid, s in self._sessions.items() if s.finished]
+        for sid in finished[:len(self._sessions) - self.max_sessions]:
+            del self._sessions[sid]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = sys.getsizeof(self._sessions)
+            for s in self._sessions.values():
+                size += sys.getsizeof(s) + sum(sys.getsizeof(getattr(s, n)) for n in CallSession.__slots__)
+            return {
+                "entries": len(self._sessions),
+                "finished": sum(1 for s in self._sessions.values() if s.finished),
+                "memory_bytes": size,
+            }
+
+
+class SQLiteBackend:
+    """One row per call; BEGIN IMMEDIATE serializes read-modify-write across processes."""
+    name = "sqlite"
+
+    def __init__(self, path: str, max_sessions: int = MAX_SESSIONS):
+        self.path = path
+        self.max_sessions = max_sessions
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "call_sid TEXT PRIMARY KEY, data TEXT NOT NULL, finished INTEGER NOT NULL, "
+                "updated REAL NOT NULL, expires REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, call_sid):
+        row = self._conn().execute(
+            "SELECT data FROM sessions WHERE call_sid = ? AND expires >= ?", (call_sid, time.time())
+        ).fetchone()
+        return CallSession.decode(row[0]) if row else None
+
+    def modify(self, call_sid, fn):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data FROM sessions WHERE call_sid = ? AND expires >= ?", (call_sid, now)
+            ).fetchone()
+            s = CallSession.decode(row[0]) if row else CallSession(call_sid)
+            result = fn(s)
+            s.updated = now
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (call_sid, data, finished, updated, expires) VALUES (?, ?, ?, ?, ?)",
+                (call_sid, s.encode(), int(s.finished), s.updated, s.expires()),
+            )
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def _evict(self, conn, now):
+        if now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        conn.execute("DELETE FROM sessions WHERE expires < ?", (now,))
+        excess = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+        if excess > 0:
+            # Finished calls go first, then the least recently updated
+            conn.execute(
+                "DELETE FROM sessions WHERE call_sid IN "
+                "(SELECT call_sid FROM sessions ORDER BY finished DESC, updated ASC LIMIT ?)", (excess,)
+            )
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        now = time.time()
+        entries, finished = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(finished), 0) FROM sessions WHERE expires >= ?", (now,)
+        ).fetchone()
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return {"entries": entries, "finished": finished, "memory_bytes": page_count * page_size}
+
+
+class RedisBackend:
+    """
+    One key per call with a native expiry; WATCH/MULTI makes updates atomic. Size
+    limits are left to the server's maxmemory policy (volatile-lru evicts idle calls).
+    """
+    name = "redis"
+    PREFIX = "secretariat:session:"
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SESSION_BACKEND is a redis:// URL but the redis package is not installed")
+        self.redis = redis.Redis.from_url(url)
+
+    def load(self, call_sid):
+        raw = self.redis.get(self.PREFIX + call_sid)
+        return CallSession.decode(raw) if raw else None
+
+    def modify(self, call_sid, fn):
+        key = self.PREFIX + call_sid
+        outcome = {}
+
+        def transaction(pipe):
+            raw = pipe.get(key)
+            s = CallSession.decode(raw) if raw else CallSession(call_sid)
+            outcome["result"] = fn(s)
+            s.updated = time.time()
+            pipe.multi()
+            pipe.set(key, s.encode(), ex=max(1, int(s.expires() - s.updated)))
+
+        self.redis.transaction(transaction, key)
+        return outcome["result"]
+
+    def stats(self) -> dict:
+        entries = sum(1 for _ in self.redis.scan_iter(match=self.PREFIX + "*", count=500))
+        return {"entries": entries, "memory_bytes": self.redis.info("memory").get("used_memory")}
+
+
+class SessionStore:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, call_sid) -> CallSession:
+        """Snapshot of the call's session; a fresh record if the call is unknown or expired."""
+        return self.backend.load(call_sid) or CallSession(call_sid)
+
+    def modify(self, call_sid, fn):
+        """Run fn(session) atomically for this call and store the result; returns fn's return value."""
+        return self.backend.modify(call_sid, fn)
+
+    def update(self, call_sid, **fields):
+        def apply(s):
+            for name, value in fields.items():
+                setattr(s, name, value)
+        self.backend.modify(call_sid, apply)
+
+    def claim_turn(self, call_sid):
+        """None if this caller took the turn, else the reason it was refused."""
+        return self.backend.modify(call_sid, _claim_turn)
+
+    def finish(self, call_sid):
+        """Mark the call as over so it is evicted early."""
+        self.update(call_sid, finished=True, transcription_active=False)
+
+    def stats(self) -> dict:
+        return {"backend": self.backend.name, **self.backend.stats()}
+
+
+def make_store(spec: str = None) -> SessionStore:
+    spec = spec or os.getenv("SESSION_BACKEND", "memory")
+    if spec == "memory":
+        return SessionStore(MemoryBackend())
+    if spec.startswith("sqlite:///"):
+        return SessionStore(SQLiteBackend(spec[len("sqlite:///"):]))
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return SessionStore(RedisBackend(spec))
+    raise ValueError(f"Unknown SESSION_BACKEND: {spec!r}")
@@ -0,0 +1,175 @@
+"""
+Speculative answer preparation on partial transcripts.
+
+With partial results on, Twilio posts interim transcripts while the caller is
+still talking. For each call we run the sector's preparer (embedding + retrieval
++ rerank for the study guide, the index lookups elsewhere) on the latest interim
+text, at most one at a time per call. When the final transcript arrives it reuses
+the prepared result if the two texts are similar enough, else the speculation is
+dropped and the turn runs from scratch. A result prepared on an older data
+generation (see reloader) is dropped too, and so is one that has not started yet
+or is not expected to finish within the time a fresh prepare would take.
+"""
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from difflib import SequenceMatcher
+
+import reloader
+from response_cache import normalize_transcript
+from tracing import bind, span
+
+SPECULATION_WORKERS = 2
+MIN_SPECULATION_CHARS = 12  # "what is the" is not worth retrieving for
+# The final turn waits for a running speculation at most as long as the sector's
+# prepares usually take (a moving average), never longer than the cap
+RESOLVE_WAIT_DEFAULT_SECONDS = 1.0
+RESOLVE_WAIT_MAX_SECONDS = 3.0
+PREPARE_EWMA_ALPHA = 0.2
+
+
+def similarity(a: str, b: str) -> float:
+    return 1.0 if a == b else SequenceMatcher(None, a, b).ratio()
+
+
+class Speculation:
+    __slots__ = ("sector", "norm", "future", "started", "running", "finished", "pending", "generation")
+
+    def __init__(self, sector, norm):
+        self.sector = sector
+        self.norm = norm
+        self.future = None
+        self.started = time.perf_counter()
+        self.running = None  # when a worker picked it up
+        self.finished = None
+        self.pending = None  # newer interim text waiting for this run to finish
+        self.generation = None  # data generation it was prepared on
+
+
+class Speculator:
+    def __init__(self, preparers: dict, workers: int = SPECULATION_WORKERS):
+        self.preparers = preparers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="speculate")
+        self._lock = threading.RLock()  # done callbacks can run inline, under the lock
+        self._calls = {}  # call_sid -> Speculation
+        self.started = 0
+        self.hits = 0
+        self.misses = {"none": 0, "diverged": 0, "failed": 0, "stale": 0, "queued": 0, "slow": 0}
+        self._prepare_seconds = {}  # sector -> moving average of a prepare's duration
+        self.saved_seconds = 0.0
+
+    def speculate(self, call_sid, sector, text: str):
+        """Prepare for an interim transcript; cheap to call on every partial result."""
+        if sector not in self.preparers or not text:
+            return
+        norm = normalize_transcript(text)
+        if len(norm) < MIN_SPECULATION_CHARS:
+            return
+        with self._lock:
+            current = self._calls.get(call_sid)
+            if current and current.sector == sector:
+                if current.norm == norm:
+                    return
+                if not current.future.done():
+                    current.pending = text  # picked up when the running one finishes
+                    return
+            self._start(call_sid, sector, text, norm)
+
+    def _start(self, call_sid, sector, text, norm):
+        prepare = self.preparers[sector][0]
+        spec = Speculation(sector, norm)
+        self._calls[call_sid] = spec
+        self.started += 1
+
+        def run():
+            spec.running = time.perf_counter()
+            try:
+                with span("speculate"), reloader.pinned() as gen:
+                    spec.generation = gen.number
+                    result = prepare(text)
+            finally:
+                spec.finished = time.perf_counter()
+            self._record(sector, spec.finished - spec.running)
+            return result
+
+        spec.future = self._pool.submit(bind(run))
+        spec.future.add_done_callback(lambda _: self._chain(call_sid, spec))
+
+    def _chain(self, call_sid, spec):
+        # The caller kept talking while we prepared: speculate on the newest text
+        with self._lock:
+            if self._calls.get(call_sid) is spec and spec.pending:
+                text, spec.pending = spec.pending, None
+                norm = normalize_transcript(text)
+                if norm != spec.norm:
+                    self._start(call_sid, spec.sector, text, norm)
+
+    def resolve(self, call_sid, sector, final_text: str):
+        """Prepared result for the final transcript, or None if the speculation does not apply."""
+        with self._lock:
+            spec = self._calls.pop(call_sid, None)
+        if spec is None or spec.sector != sector:
+            return self._miss("none")
+        needed = self.preparers[sector][1]
+        if similarity(spec.norm, normalize_transcript(final_text)) < needed:
+            spec.future.cancel()
+            return self._miss("diverged")
+        waited_from = time.perf_counter()
+        timeout = 0.0
+        if not spec.future.done():
+            if spec.running is None and spec.future.cancel():
+                return self._miss("queued")  # still waiting for a worker: preparing now is no slower
+            # Wait only for what is left of a usual prepare; past that, start from scratch
+            elapsed = waited_from - (spec.running or waited_from)
+            timeout = max(0.0, self.expected_prepare_seconds(sector) - elapsed)
+        try:
+            prepared = spec.future.result(timeout=timeout)
+        except TimeoutError:
+            return self._miss("slow")
+        except Exception as e:
+            print("[speculate] Prepared result unusable:", repr(e))
+            traceback.print_exc()
+            return self._miss("failed")
+        if spec.generation != reloader.active().number:
+            return self._miss("stale")  # the data was reloaded in between
+        # Time the final turn did not have to spend preparing
+        saved = (spec.finished or time.perf_counter()) - spec.started - (time.perf_counter() - waited_from)
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += max(0.0, saved)
+        return prepared
+
+    def _record(self, sector, seconds):
+        with self._lock:
+            avg = self._prepare_seconds.get(sector)
+            self._prepare_seconds[sector] = seconds if avg is None else avg + PREPARE_EWMA_ALPHA * (seconds - avg)
+
+    def expected_prepare_seconds(self, sector) -> float:
+        with self._lock:
+            avg = self._prepare_seconds.get(sector, RESOLVE_WAIT_DEFAULT_SECONDS)
+        return min(avg, RESOLVE_WAIT_MAX_SECONDS)
+
+    def discard(self, call_sid):
+        with self._lock:
+            spec = self._calls.pop(call_sid, None)
+        if spec:
+            spec.future.cancel()
+
+    def _miss(self, reason):
+        with self._lock:
+            self.misses[reason] += 1
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            resolved = self.hits + sum(self.misses.values())
+            return {
+                "in_flight": len(self._calls),
+                "started": self.started,
+                "hits": self.hits,
+                "misses": dict(self.misses),
+                "hit_rate": round(self.hits / resolved, 3) if resolved else 0.0,
+                "saved_seconds": round(self.saved_seconds, 2),
+                "prepare_seconds": {getattr(s, "name", s): round(v, 3) for s, v in self._prepare_seconds.items()},
+            }
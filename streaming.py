@@ -0,0 +1,94 @@
+"""
+Sentence-by-sentence answer streaming for Twilio ConversationRelay sessions.
+
+Twilio connects to the /relay WebSocket, sends a "setup" message (carrying the
+selected sector as a custom parameter) and then a "prompt" message per caller
+utterance. We answer with "text" messages, one per complete sentence as Ollama
+streams tokens, so the caller starts hearing the answer after the first sentence
+instead of after the whole generation.
+"""
+import json
+import re
+import time
+import traceback
+
+from handlers_base import Sector, HANDLERS, STREAM_HANDLERS
+from tracing import observe
+
+# End of sentence: terminal punctuation followed by whitespace, not after a known abbreviation
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n+")
+ABBREVIATIONS = ("e.g.", "i.e.", "etc.", "Dr.", "Prof.", "Mr.", "Ms.", "No.", "Art.", "par.", "vs.")
+# Very short fragments ("1.", "a.") are held back and joined to the next sentence
+MIN_SENTENCE_CHARS = 12
+
+
+def split_sentences(chunks):
+    """Re-chunk a stream of text pieces into whole sentences."""
+    buf = ""
+    for chunk in chunks:
+        buf += chunk
+        start = 0
+        for m in SENTENCE_END_RE.finditer(buf):
+            candidate = buf[start:m.start()].strip()
+            if len(candidate) < MIN_SENTENCE_CHARS or candidate.endswith(ABBREVIATIONS):
+                continue
+            yield candidate
+            start = m.end()
+        buf = buf[start:]
+    if buf.strip():
+        yield buf.strip()
+
+
+def answer_stream(sector, query: str):
+    """Text pieces of the answer: token-level for streamable sectors, else the whole answer."""
+    streamer = STREAM_HANDLERS.get(sector)
+    if streamer:
+        return streamer(query)
+    handler = HANDLERS.get(sector)
+    return iter([handler(query) if handler else "Not a valid selection."])
+
+
+def stream_turn(send, sector, query: str, on_complete=None, pieces=None) -> str:
+    """
+    Send the answer to query as ConversationRelay text messages, one sentence each.
+    send(dict) writes one message; on_complete(full_text) runs after the last one.
+    pieces replaces the handler output (e.g. a cached answer). Returns the full answer text.
+    """
+    started = time.perf_counter()
+    spoken = []
+    try:
+        source = pieces if pieces is not None else answer_stream(sector, query)
+        for sentence in split_sentences(source):
+            if not spoken:
+                observe("first_sentence", time.perf_counter() - started, start=started)
+                print(f"[relay] First sentence after {(time.perf_counter() - started) * 1000:.0f} ms")
+            spoken.append(sentence)
+            send({"type": "text", "token": sentence + " ", "last": False})
+    except Exception as e:
+        print("Handler error:", repr(e))
+        traceback.print_exc()
+        error_text = "An error occurred during the processing of the request."
+        send({"type": "text", "token": error_text, "last": False})
+        spoken = [error_text]
+        on_complete = None  # never cache a failed turn
+    if not spoken:
+        spoken = ["No results for announcement."]
+        send({"type": "text", "token": spoken[0], "last": False})
+    send({"type": "text", "token": "", "last": True})
+    full_text = " ".join(spoken)
+    print(f"[relay] Answer finished after {(time.perf_counter() - started) * 1000:.0f} ms")
+    if on_complete:
+        on_complete(full_text)
+    return full_text
+
+
+def parse_setup(msg: dict):
+    """(call_sid, Sector or None) from a ConversationRelay setup message."""
+    params = msg.get("customParameters") or {}
+    digit = params.get("sector")
+    sector = next((s for s in Sector if s.value == digit), None)
+    return msg.get("callSid"), sector
+
+
+def encode(message: dict) -> str:
+    return json.dumps(message, ensure_ascii=False)
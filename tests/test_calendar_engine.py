@@ -0,0 +1,72 @@
+"""Regression cases for handlers/calendar_engine.py against data/academic_calendar.json."""
+import os
+from datetime import date
+
+import pytest
+
+from handlers.calendar_engine import load_engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TODAY = date(2025, 9, 10)  # inside the September 2025 exam period
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return load_engine(os.path.join(ROOT, "data", "academic_calendar.json"))
+
+
+@pytest.mark.parametrize("query", [
+    "Are we in the exam period right now?",
+    "Is it exam period currently?",
+])
+def test_current_period_question_answers_for_today(engine, query):
+    assert engine.answer(query, TODAY) == (
+        "Based on the academic calendar, yes, September 2025 exam period is under way "
+        "until Thursday, 25 September 2025."
+    )
+
+
+def test_current_question_about_a_later_period(engine):
+    assert engine.answer("Are we in the winter semester classes now?", TODAY) == (
+        "Based on the academic calendar, no, Winter semester classes period has not started yet; "
+        "it starts on Tuesday, 30 September 2025."
+    )
+
+
+def test_current_period_without_an_event(engine):
+    assert engine.answer("What is happening now?", TODAY) == (
+        "Based on the academic calendar, the current period is September 2025 exam period, "
+        "until Thursday, 25 September 2025."
+    )
+
+
+def test_first_day_is_the_start_date(engine):
+    assert engine.answer("When is the first day of spring classes?", TODAY) == (
+        "Based on the academic calendar, the start date of Spring semester classes period "
+        "is Tuesday, 17 February 2026."
+    )
+
+
+def test_last_day_is_the_end_date(engine):
+    assert engine.answer("When is the last day of spring classes?", TODAY) == (
+        "Based on the academic calendar, the end date of Spring semester classes period "
+        "is Saturday, 30 May 2026."
+    )
+
+
+def test_event_span(engine):
+    assert engine.answer("When are the winter exams?", TODAY) == (
+        "Based on the academic calendar, Winter semester exams runs from Tuesday, 20 January 2026 "
+        "to Saturday, 7 February 2026."
+    )
+
+
+def test_month_picks_the_period_overlapping_it(engine):
+    assert engine.answer("Do we have classes in March?", TODAY) == (
+        "Based on the academic calendar, Spring semester classes period runs from Tuesday, 17 February 2026 "
+        "to Saturday, 30 May 2026."
+    )
+
+
+def test_month_without_an_overlapping_period_is_left_to_the_llm(engine):
+    assert engine.answer("Are there exams in March?", TODAY) is None
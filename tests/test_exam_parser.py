@@ -0,0 +1,43 @@
+"""
+Golden output of tools/build_exams_schedule_csv.py for every docs/exams/*.pdf.
+
+tests/golden/exams/<name>.csv is the parser's output for docs/exams/<name>.pdf, rows
+in order. When a parser change is meant to alter it, regenerate the fixture and
+review the diff:
+
+    python tools/build_exams_schedule_csv.py docs/exams/<name>.pdf tests/golden/exams/<name>.csv --workers 1
+"""
+import glob
+import os
+import sys
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pdfplumber")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_DIR = os.path.join(ROOT, "tests", "golden", "exams")
+PDFS = sorted(glob.glob(os.path.join(ROOT, "docs", "exams", "*.pdf")))
+
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+from build_exams_schedule_csv import COLUMNS, parse_pdf, parse_pdfs  # noqa: E402
+
+
+def records(df) -> list:
+    return [[str(v) for v in row] for row in df[COLUMNS].itertuples(index=False)]
+
+
+@pytest.mark.parametrize("pdf", PDFS, ids=os.path.basename)
+def test_parser_matches_golden_csv(pdf):
+    golden = os.path.join(GOLDEN_DIR, os.path.basename(pdf)[:-4] + ".csv")
+    assert os.path.exists(golden), f"no golden fixture for {pdf}"
+    want = pd.read_csv(golden, dtype=str, keep_default_na=False)
+    assert list(want.columns) == COLUMNS
+    assert records(parse_pdf(pdf, workers=1)) == records(want)
+
+
+def test_pool_output_matches_in_process():
+    pooled = parse_pdfs(PDFS, workers=2)
+    for pdf in PDFS:
+        assert records(pooled[pdf]) == records(parse_pdf(pdf, workers=1)), pdf
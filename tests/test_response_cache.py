@@ -0,0 +1,50 @@
+"""Transcript normalization and per-sector invalidation of response_cache.ResponseCache."""
+import os
+
+import pytest
+
+from response_cache import ResponseCache, normalize_transcript
+
+
+@pytest.mark.parametrize("spoken, normalized", [
+    ("What are the office hours of professor Daskalaki?", "what are the office hours of professor daskalaki"),
+    ("  WHAT are the office-hours,   of Professor DASKALAKI ", "what are the office hours of professor daskalaki"),
+    ("Πότε είναι η εξέταση;", "πότε είναι η εξέταση"),
+])
+def test_normalize_transcript_folds_case_and_punctuation(spoken, normalized):
+    assert normalize_transcript(spoken) == normalized
+
+
+@pytest.fixture
+def cache(tmp_path):
+    office_hours, exams = tmp_path / "office_hours.json", tmp_path / "exams.json"
+    office_hours.write_text("[1]", encoding="utf-8")
+    exams.write_text("[1]", encoding="utf-8")
+    deps = {"office": {"files": [str(office_hours)]}, "exams": {"files": [str(exams)]}}
+    return ResponseCache(deps, chroma_path=str(tmp_path / "chroma")), office_hours
+
+
+def _store(cache, sector, text, answer):
+    cached, version = cache.get(sector, text)
+    assert cached is None
+    cache.put(sector, text, version, answer)
+
+
+def test_hit_on_the_same_normalized_transcript(cache):
+    cache, _ = cache
+    _store(cache, "office", "Office hours of professor Daskalaki?", "Mondays 10-12")
+    assert cache.get("office", "office hours of Professor Daskalaki")[0] == "Mondays 10-12"
+
+
+def test_changing_a_dependency_only_invalidates_its_sector(cache):
+    cache, office_hours = cache
+    _store(cache, "office", "office hours of professor daskalaki", "Mondays 10-12")
+    _store(cache, "exams", "when is the databases exam", "On 3 February")
+
+    office_hours.write_text("[1, 2]", encoding="utf-8")
+    st = os.stat(office_hours)
+    os.utime(office_hours, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    assert cache.get("office", "office hours of professor daskalaki")[0] is None
+    assert cache.get("exams", "when is the databases exam")[0] == "On 3 February"
+    assert cache.stats()["invalidated"] == 1
@@ -0,0 +1,77 @@
+"""
+Speed of tools/build_exams_schedule_csv.py.
+
+Parses every docs/exams/*.pdf in-process and with the process pool and reports pages
+per second:
+
+    python tools/benchmark_exam_parser.py --repeat 3 --json reports/exam_parser.json
+    python tools/benchmark_exam_parser.py --compare reports/exam_parser.json
+
+The parser's output is pinned by tests/test_exam_parser.py, not here.
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def timed(fn, repeat: int) -> float:
+    """Median seconds of repeat runs."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the exam schedule PDF parser")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="Pool size (default: one per core).")
+    parser.add_argument("--json", help="Write the report to this file.")
+    parser.add_argument("--compare", help="Earlier report to print the timings against.")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, str(ROOT / "tools"))
+    from build_exams_schedule_csv import PDF_DIR, page_tasks, parse_pdfs
+
+    paths = sorted(glob.glob(os.path.join(PDF_DIR, "*.pdf")))
+    if not paths:
+        sys.exit(f"No PDFs in {PDF_DIR}")
+    pages = len(page_tasks(paths))
+
+    serial = timed(lambda: parse_pdfs(paths, workers=1), args.repeat)
+    pooled = timed(lambda: parse_pdfs(paths, workers=args.workers), args.repeat)
+    print(f"{len(paths)} PDFs, {pages} pages")
+    print(f"in-process  {serial:7.2f}s  {pages / serial:6.1f} pages/s")
+    print(f"pool        {pooled:7.2f}s  {pages / pooled:6.1f} pages/s  (workers={args.workers or os.cpu_count()})")
+
+    report = {
+        "pdfs": len(paths),
+        "pages": pages,
+        "serial_seconds": round(serial, 3),
+        "pool_seconds": round(pooled, 3),
+        "workers": args.workers or os.cpu_count(),
+    }
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print("Report written to", args.json)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        print(f"serial {previous['serial_seconds']:.2f}s -> {serial:.2f}s, pool {previous['pool_seconds']:.2f}s -> {pooled:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
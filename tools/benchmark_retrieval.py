@@ -0,0 +1,250 @@
+"""
+Retrieval quality and latency benchmark for the "regulations" and "exams" collections.
+
+Runs a versioned set of labelled questions (data/benchmarks/retrieval_questions_v*.json)
+through each retrieval configuration and reports recall@k, MRR and per-stage latency:
+
+  regulations  query_data.retrieve() for every k and rerank mode (embed / search / rerank)
+  exams        the schedule index behind handle_exams_program, and the "exams" vector search
+
+    python tools/benchmark_retrieval.py --k 3,5,8 --rerank off,batch --json reports/retrieval.json
+    python tools/benchmark_retrieval.py --compare reports/retrieval.json
+
+The JSON report records the question set version, the index versions and the commit,
+so runs made before and after a change can be compared with --compare.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+QUESTIONS = "data/benchmarks/retrieval_questions_v1.json"
+METRICS = ("recall_at_k", "mrr", "hit_rate")
+
+
+def rank_of_first(retrieved, expected) -> int | None:
+    for rank, item in enumerate(retrieved, start=1):
+        if item in expected:
+            return rank
+    return None
+
+
+def score_question(retrieved, expected) -> dict:
+    expected = set(expected)
+    rank = rank_of_first(retrieved, expected)
+    return {
+        "retrieved": list(retrieved),
+        "expected": sorted(expected),
+        "first_relevant_rank": rank,
+        "recall": len(expected & set(retrieved)) / len(expected),
+        "reciprocal_rank": 1.0 / rank if rank else 0.0,
+    }
+
+
+def latency_summary(samples: dict) -> dict:
+    """{stage: [seconds]} -> {stage: {mean_ms, p50_ms, p95_ms}}"""
+    out = {}
+    for stage, values in samples.items():
+        ordered = sorted(values)
+        p95 = ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]  # nearest rank
+        out[stage] = {
+            "mean_ms": round(statistics.fmean(values) * 1000, 2),
+            "p50_ms": round(statistics.median(values) * 1000, 2),
+            "p95_ms": round(p95 * 1000, 2),
+        }
+    return out
+
+
+def summarize(name, params, rows, samples) -> dict:
+    return {
+        "name": name,
+        **params,
+        "questions": len(rows),
+        "recall_at_k": round(statistics.fmean(r["recall"] for r in rows), 4),
+        "mrr": round(statistics.fmean(r["reciprocal_rank"] for r in rows), 4),
+        "hit_rate": round(sum(1 for r in rows if r["first_relevant_rank"]) / len(rows), 4),
+        "latency": latency_summary(samples),
+        "per_question": rows,
+    }
+
+
+def stage_durations(trace) -> dict:
+    totals = {}
+    for stage, _, duration in trace.spans:
+        totals[stage] = totals.get(stage, 0.0) + duration
+    return totals
+
+
+def run_regulations(questions, k, rerank_mode, model, temperature, retriever="hybrid"):
+    from RAG.query_data import retrieve
+    from tracing import start_trace, end_trace
+
+    rerank = {"off": False, "auto": "auto"}.get(rerank_mode, True)
+    rows, samples = [], {}
+    reranked = 0
+    for n, q in enumerate(questions):
+        trace_id = f"bench-regulations-{k}-{rerank_mode}-{retriever}-{n}"
+        started = time.perf_counter()
+        with start_trace(trace_id, "DEPARTMENT_REGULATIONS") as trace:
+            retrieval = retrieve(q["question"], k, model, temperature, rerank=rerank,
+                                 rerank_mode=rerank_mode if rerank is True else "batch", use_cache=False,
+                                 hybrid=retriever == "hybrid")
+        end_trace(trace_id)
+        reranked += retrieval["reranked"]
+        for stage, seconds in stage_durations(trace).items():
+            samples.setdefault(stage, []).append(seconds)
+        samples.setdefault("total", []).append(time.perf_counter() - started)
+        ids = []
+        for d in retrieval["docs"][:k]:
+            meta = d.metadata or {}
+            ids.append(meta.get("id") or f"{meta.get('page')}_{meta.get('chunk_id')}")
+        rows.append({"question": q["question"], "path": retrieval["path"],
+                     **score_question(ids, q["expected_ids"])})
+    summary = summarize(f"regulations {retriever} k={k} rerank={rerank_mode}", {"collection": "regulations",
+                        "k": k, "rerank": rerank_mode, "retriever": retriever}, rows, samples)
+    summary["reranked"] = round(reranked / len(questions), 4)
+    return summary
+
+
+def run_exams_vector(questions, k):
+    from RAG.resources import get_vectorstore, get_embeddings
+
+    db = get_vectorstore("exams")
+    rows, samples = [], {}
+    for q in questions:
+        started = time.perf_counter()
+        vec = get_embeddings().embed_query(q["question"])
+        embedded = time.perf_counter()
+        docs = db.similarity_search_by_vector(vec, k=k)
+        done = time.perf_counter()
+        samples.setdefault("embed", []).append(embedded - started)
+        samples.setdefault("search", []).append(done - embedded)
+        samples.setdefault("total", []).append(done - started)
+        courses = [(d.metadata or {}).get("course") for d in docs]
+        rows.append({"question": q["question"], **score_question(courses, q["expected_courses"])})
+    return summarize(f"exams vector k={k}", {"collection": "exams", "k": k, "retriever": "vector"}, rows, samples)
+
+
+def run_exams_engine(questions, k):
+    from handlers.exams_engine import get_engine
+
+    engine = get_engine()
+    rows, samples = [], {}
+    answered = 0
+    for q in questions:
+        started = time.perf_counter()
+        ranked = engine.rank_courses(q["question"], limit=k)
+        ranked_at = time.perf_counter()
+        answer = engine.answer(q["question"])
+        done = time.perf_counter()
+        samples.setdefault("rank", []).append(ranked_at - started)
+        samples.setdefault("answer", []).append(done - ranked_at)
+        samples.setdefault("total", []).append(done - started)
+        # The index answers on its own (no LLM) only when it is confident
+        if answer and any(c in answer for c in q["expected_courses"]):
+            answered += 1
+        rows.append({"question": q["question"], **score_question([r.course for _, r in ranked], q["expected_courses"])})
+    summary = summarize(f"exams engine k={k}", {"collection": "exams", "k": k, "retriever": "engine"}, rows, samples)
+    summary["answered_without_llm"] = round(answered / len(questions), 4)
+    return summary
+
+
+def environment(question_path) -> dict:
+    from RAG.index_version import collection_version
+    from RAG.resources import CHROMA_PATH, EMBEDDING_MODEL
+
+    with open(question_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "question_file": question_path,
+        "question_sha256": digest,
+        "embedding_model": EMBEDDING_MODEL,
+        "index_versions": {c: collection_version(CHROMA_PATH, c) for c in ("regulations", "exams")},
+    }
+
+
+def compare(previous: dict, current: dict):
+    before = {c["name"]: c for c in previous["configs"]}
+    if previous.get("question_set_version") != current.get("question_set_version"):
+        print("warning: the reports use different question set versions")
+    print(f"\n{'config':<44}{'metric':<14}{'before':>9}{'after':>9}{'delta':>9}")
+    for c in current["configs"]:
+        old = before.get(c["name"])
+        if not old:
+            continue
+        for metric in METRICS:
+            print(f"{c['name']:<44}{metric:<14}{old[metric]:>9.3f}{c[metric]:>9.3f}{c[metric] - old[metric]:>+9.3f}")
+        old_total = old["latency"].get("total", {}).get("p50_ms")
+        new_total = c["latency"].get("total", {}).get("p50_ms")
+        if old_total and new_total:
+            print(f"{c['name']:<44}{'p50 ms':<14}{old_total:>9.1f}{new_total:>9.1f}{new_total - old_total:>+9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency")
+    parser.add_argument("--questions", default=QUESTIONS)
+    parser.add_argument("--collections", default="regulations,exams")
+    parser.add_argument("--k", default="3,5,8", help="Comma-separated k values.")
+    parser.add_argument("--rerank", default="off,auto,batch",
+                        help="Comma-separated: off, auto, serial, concurrent, batch.")
+    parser.add_argument("--retriever", default="vector,hybrid", help="Comma-separated: vector, hybrid.")
+    parser.add_argument("--model", default="llama3", help="Ollama model used for reranking.")
+    parser.add_argument("--temp", type=float, default=0.2)
+    parser.add_argument("--warm-rerank", action="store_true", help="Keep cached rerank scores between configs.")
+    parser.add_argument("--json", help="Write the report to this file.")
+    parser.add_argument("--compare", help="Earlier report to compare this run against.")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, str(ROOT))
+    from RAG.rerank import SCORE_CACHE
+
+    with open(args.questions, encoding="utf-8") as f:
+        question_set = json.load(f)
+    ks = [int(k) for k in args.k.split(",")]
+    collections = args.collections.split(",")
+
+    configs = []
+    if "regulations" in collections:
+        for k in ks:
+            for retriever in args.retriever.split(","):
+                for mode in args.rerank.split(","):
+                    if not args.warm_rerank:
+                        SCORE_CACHE.clear()
+                    configs.append(run_regulations(question_set["regulations"], k, mode, args.model, args.temp,
+                                                   retriever))
+                    print(f"{configs[-1]['name']:<44} recall@k {configs[-1]['recall_at_k']:.3f}  MRR {configs[-1]['mrr']:.3f}")
+    if "exams" in collections:
+        for k in ks:
+            for run in (run_exams_engine, run_exams_vector):
+                configs.append(run(question_set["exams"], k))
+                print(f"{configs[-1]['name']:<44} recall@k {configs[-1]['recall_at_k']:.3f}  MRR {configs[-1]['mrr']:.3f}")
+
+    report = {"question_set_version": question_set["version"], **environment(args.questions), "configs": configs}
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print("Report written to", args.json)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
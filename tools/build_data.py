@@ -0,0 +1,305 @@
+"""
+Build the data the secretariat serves, from docs/ to data/ to chroma/, doing only what changed.
+
+Every step declares its input and output files and runs one of the existing scripts.
+A step is up to date when the content hashes of its inputs (its own script included)
+and its arguments match what the last successful run recorded in data/.build_state.json
+and its outputs exist. A changed PDF or JSON therefore rebuilds only what is downstream
+of it, and a step whose output came out byte-identical stops the rebuild there.
+Independent steps run in parallel; steps writing to the Chroma index run one at a time.
+
+    python tools/build_data.py                 # everything that is out of date
+    python tools/build_data.py exams_json -n   # what building one target would run
+    python tools/build_data.py --force embed_exams
+
+Two steps are done by hand, and the build only reports when they are stale: correcting the
+parsed exam CSVs (the parser writes data/exams/parsed/<name>.csv; the corrected
+data/exams/<name>.csv is never overwritten), and translating the merged Greek schedule into
+data/final_exams_schedule.csv. `--mark-done <step>` records such an update.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+STATE_PATH = "data/.build_state.json"
+CHROMA_PATH = "chroma"
+PARSED_EXAMS_DIR = "data/exams/parsed"
+
+
+class Step:
+    def __init__(self, name, inputs, outputs, command=None, params=None, lock=None, manual=False):
+        self.name = name
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.command = command or []
+        self.params = params or {}
+        self.lock = lock  # steps sharing a lock never run at the same time
+        self.manual = manual  # done by hand; the build only reports when it is stale
+        self.deps = set()
+
+
+def define_steps(guide_pdf=None):
+    py = sys.executable
+    steps = []
+    guide_pdf = guide_pdf or next(iter(sorted(glob.glob("docs/*.pdf"))), None)
+    if guide_pdf:
+        steps.append(Step(
+            "translate_guide", [guide_pdf, "RAG/translation_layer.py"], ["data/translated_stream.jsonl"],
+            [py, "RAG/translation_layer.py", guide_pdf, "--output", "data/translated_stream.jsonl"],
+        ))
+
+    exam_csvs = []
+    for pdf in sorted(glob.glob("docs/exams/*.pdf")):
+        stem = Path(pdf).stem
+        # The parser writes a scratch copy; data/exams/<name>.csv carries manual corrections
+        # and is only ever updated by hand from it
+        parsed = os.path.join(PARSED_EXAMS_DIR, stem + ".csv")
+        csv_path = os.path.join("data/exams", stem + ".csv")
+        exam_csvs.append(csv_path)
+        steps.append(Step(
+            f"parse_exams:{stem}", [pdf, "tools/build_exams_schedule_csv.py"], [parsed],
+            [py, "tools/build_exams_schedule_csv.py", pdf, parsed, "--workers", "1"],
+        ))
+        steps.append(Step(f"correct_exams:{stem}", [parsed], [csv_path], manual=True))
+    merged = "data/exams/final_exams_schedule.csv"
+    if exam_csvs:
+        steps.append(Step("merge_exams", exam_csvs + ["tools/merge_exams_csv.py"], [merged],
+                          [py, "tools/merge_exams_csv.py", *exam_csvs]))
+        steps.append(Step("translate_exam_schedule", [merged], ["data/final_exams_schedule.csv"], manual=True))
+
+    steps += [
+        Step("exams_json", ["data/final_exams_schedule.csv", "tools/csv_to_json_exams.py"],
+             ["data/final_exams_schedule.json"],
+             [py, "tools/csv_to_json_exams.py", "data/final_exams_schedule.csv", "data/final_exams_schedule.json"]),
+        # The calendar is generated for the current academic year
+        Step("academic_calendar", ["tools/construct_academic_calendar.py"], ["data/academic_calendar.json"],
+             [py, "tools/construct_academic_calendar.py", "data/academic_calendar.json"],
+             params={"year": date.today().year}),
+        Step("engines_snapshot",
+             ["data/office_hours.json", "data/final_exams_schedule.json", "data/academic_calendar.json",
+              "handlers/snapshot.py", "handlers/office_hours_engine.py", "handlers/exams_engine.py",
+              "handlers/calendar_engine.py", "handlers/date_phrases.py", "name_hints.py"],
+             ["data/engines.snapshot"],
+             [py, "-m", "handlers.snapshot", "data/engines.snapshot"]),
+        Step("embed_regulations", ["data/translated_stream.jsonl", "RAG/embed_populatedb.py", "RAG/index_sync.py"],
+             [f"{CHROMA_PATH}/regulations.version"],
+             [py, "RAG/embed_populatedb.py", "--jsonl", "data/translated_stream.jsonl", "--chroma", CHROMA_PATH],
+             lock="chroma"),
+        Step("embed_exams", ["data/final_exams_schedule.json", "RAG/embed_populate_exams.py", "RAG/index_sync.py"],
+             [f"{CHROMA_PATH}/exams.version"],
+             [py, "RAG/embed_populate_exams.py", "--chroma", CHROMA_PATH],
+             lock="chroma"),
+    ]
+
+    producers = {out: s.name for s in steps for out in s.outputs}
+    for s in steps:
+        s.deps = {producers[i] for i in s.inputs if i in producers and producers[i] != s.name}
+    return {s.name: s for s in steps}
+
+
+class BuildState:
+    """Per-step signatures of the last successful run, plus a file hash cache keyed by (size, mtime)."""
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.steps = data.get("steps", {})
+        self.files = data.get("files", {})
+
+    def file_hash(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self.files.get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        with self._lock:
+            self.files[path] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+    def signature(self, step):
+        payload = {
+            "inputs": {i: self.file_hash(i) for i in step.inputs},
+            "command": step.command[1:],  # not the interpreter path
+            "params": step.params,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def record(self, step, signature):
+        with self._lock:
+            self.steps[step.name] = {"signature": signature, "at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"steps": self.steps, "files": self.files}, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+def status(step, state, forced):
+    """'missing-source', 'adopt', 'up-to-date' or 'stale'."""
+    if any(not os.path.exists(i) for i in step.inputs):
+        return "missing-source"
+    outputs_exist = all(os.path.exists(o) for o in step.outputs)
+    if step.name in forced:
+        return "stale"
+    if step.name not in state.steps:
+        # First build over an existing tree: take the outputs as they are (they may hold manual edits)
+        return "adopt" if outputs_exist else "stale"
+    if outputs_exist and state.steps[step.name]["signature"] == state.signature(step):
+        return "up-to-date"
+    return "stale"
+
+
+def select(steps, targets):
+    """The targets and everything upstream of them."""
+    if not targets:
+        return set(steps)
+    unknown = [t for t in targets if t not in steps]
+    if unknown:
+        raise SystemExit(f"Unknown targets {unknown}; known: {sorted(steps)}")
+    chosen, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in chosen:
+            chosen.add(name)
+            todo.extend(steps[name].deps)
+    return chosen
+
+
+def run_step(step):
+    started = time.perf_counter()
+    proc = subprocess.run(step.command, cwd=ROOT, capture_output=True, text=True)
+    return proc, time.perf_counter() - started
+
+
+def build(steps, chosen, state, jobs=4, dry_run=False, forced=()):
+    done, failed, blocked = set(), set(), set()
+    running, held_locks = {}, set()
+    results = {}
+
+    def ready(name):
+        s = steps[name]
+        return all(d in done or d not in chosen for d in s.deps) and (s.lock is None or s.lock not in held_locks)
+
+    pending = set(chosen)
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="build") as pool:
+        while pending or running:
+            for name in sorted(pending):
+                s = steps[name]
+                if any(d in failed or d in blocked for d in s.deps):
+                    pending.discard(name)
+                    blocked.add(name)
+                    results[name] = "blocked"
+                    continue
+                if len(running) >= jobs or not ready(name):
+                    continue
+                pending.discard(name)
+                st = status(s, state, forced)
+                if st in ("up-to-date", "missing-source"):
+                    results[name] = st
+                    done.add(name)
+                elif st == "adopt":
+                    if not dry_run:
+                        state.record(s, state.signature(s))
+                    results[name] = "adopted"
+                    done.add(name)
+                elif s.manual:
+                    print(f"[build] {name}: inputs changed, needs a manual update of {', '.join(s.outputs)} "
+                          f"(then: --mark-done {name})")
+                    results[name] = "manual"
+                    done.add(name)  # downstream goes on with the current file
+                elif dry_run:
+                    print(f"[build] would run {name}: {' '.join(s.command[1:])}")
+                    results[name] = "would-run"
+                    done.add(name)
+                else:
+                    print(f"[build] running {name}")
+                    if s.lock:
+                        held_locks.add(s.lock)
+                    running[pool.submit(run_step, s)] = name
+            if not running:
+                if pending and not any(ready(n) for n in pending):
+                    break
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name = running.pop(fut)
+                s = steps[name]
+                held_locks.discard(s.lock)
+                proc, seconds = fut.result()
+                if proc.returncode == 0:
+                    state.record(s, state.signature(s))
+                    state.save()
+                    results[name] = f"built in {seconds:.1f}s"
+                    done.add(name)
+                else:
+                    print(f"[build] {name} failed ({proc.returncode}):\n{proc.stdout[-2000:]}{proc.stderr[-2000:]}")
+                    results[name] = "failed"
+                    failed.add(name)
+    if not dry_run:
+        state.save()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild data/ and chroma/ from docs/, only where inputs changed")
+    parser.add_argument("targets", nargs="*", help="Steps to bring up to date (default: all)")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="Show what would run")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Steps run in parallel")
+    parser.add_argument("--force", nargs="*", default=[], help="Rerun these steps even if up to date")
+    parser.add_argument("--guide", help="Study guide PDF to translate (default: the first docs/*.pdf)")
+    parser.add_argument("--mark-done", metavar="STEP", help="Record a manual step as up to date")
+    parser.add_argument("--list", action="store_true", help="List the steps and their status")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    steps = define_steps(args.guide)
+    state = BuildState()
+
+    if args.mark_done:
+        if args.mark_done not in steps:
+            raise SystemExit(f"Unknown step {args.mark_done}")
+        state.record(steps[args.mark_done], state.signature(steps[args.mark_done]))
+        state.save()
+        print(f"Recorded {args.mark_done} as up to date")
+        return
+    if args.list:
+        for name in sorted(steps):
+            s = steps[name]
+            deps = f" <- {', '.join(sorted(s.deps))}" if s.deps else ""
+            print(f"{name:<28} {status(s, state, set(args.force)):<15}{deps}")
+        return
+
+    results = build(steps, select(steps, args.targets), state, args.jobs, args.dry_run, set(args.force))
+    for name in sorted(results):
+        print(f"{name:<28} {results[name]}")
+    if any(r in ("failed", "blocked") for r in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,32 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+Exam schedule PDF -> CSV.
+
+Each page's words are extracted once and reused for the header boxes, the column
+boundaries, the semester and the table rows; words are assigned to lines with a
+sorted sweep (bisect) instead of rescanning every word per line. Page ranges and
+PDFs are parsed in a process pool.
+
+    python tools/build_exams_schedule_csv.py input.pdf output.csv
+    python tools/build_exams_schedule_csv.py --all        # docs/exams/*.pdf -> data/exams/*.csv
+"""
+import argparse
+import glob
+import os
 import re
 import sys
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
 import pdfplumber
 import pandas as pd
 
+COLUMNS = ["Semester","Date","Day","Time","Room","Course"]
+PDF_DIR = "docs/exams"
+CSV_DIR = "data/exams"
+LINE_TOLERANCE = 4.0
+
 HEADER_DATE = {"ΗΜΕΡΟΜΗΝΙΑ", "ΗΜΕΡ/ΝΙΑ"}
 GREEK_HEADERS = list(HEADER_DATE | {"ΗΜΕΡΑ","ΩΡΑ","ΑΙΘΟΥΣΑ","ΜΑΘΗΜΑ","ΕΞΕΤΑΣΤΗΣ"})
 TIME_RE = re.compile(r"\b\d{1,2}\s*-\s*\d{1,2}\b")
@@ -17,9 +39,13 @@ def find_semester(text: str) -> str:
     m = re.search(r"ΕΞΑΜΗΝΟ\s*(\d+)", text or "")
     return m.group(1) if m else ""
 
-def header_boxes(page):
+def page_words(page):
+    """The single word extraction every other step of parse_page works from."""
+    return page.extract_words(use_text_flow=True, keep_blank_chars=False)
+
+def header_boxes(words):
     boxes = {}
-    for w in page.extract_words(use_text_flow=True, keep_blank_chars=False):
+    for w in words:
         t = w["text"].strip()
         if t in {"ΗΜΕΡΟΜΗΝΙΑ","ΗΜΕΡ/ΝΙΑ"}:
             t_norm = "ΗΜΕΡΟΜΗΝΙΑ"
@@ -40,8 +66,8 @@ def outer_rect(page):
             best_area = area
     return best
 
-def infer_boundaries_from_headers(page):
-    boxes = header_boxes(page)
+def infer_boundaries_from_headers(words, boxes=None):
+    boxes = header_boxes(words) if boxes is None else boxes
     if not boxes:
         return None
     cols = sorted([(k, *boxes[k]) for k in boxes], key=lambda t: t[1])  # sort by x0
@@ -58,7 +84,7 @@ def infer_boundaries_from_headers(page):
     if "ΗΜΕΡΟΜΗΝΙΑ" not in boxes:
         hdr_top = min(y0 for _,y0,_,_ in boxes.values())
         min_date_x0 = None
-        for w in page.extract_words(use_text_flow=True):
+        for w in words:
             txt = w["text"].strip()
             if DATE_RE.fullmatch(txt) and w["top"] > hdr_top - 2:
                 min_date_x0 = w["x0"] if min_date_x0 is None else min(min_date_x0, w["x0"])
@@ -108,12 +134,26 @@ def normalize_room_course(room: str, course: str):
         new_course = course
     return new_room, new_course
 
+def assign_lines(words, y_lines, tol: float = LINE_TOLERANCE):
+    """
+    Words within tol of each line's y, in x order. Words are sorted by y once and
+    each line takes its slice by bisection, instead of scanning every word per line.
+    Ties in x keep extraction order.
+    """
+    order = sorted(range(len(words)), key=lambda i: words[i]["ymid"])
+    ys = [words[i]["ymid"] for i in order]
+    lines = []
+    for y in y_lines:
+        idx = order[bisect_left(ys, y - tol):bisect_right(ys, y + tol)]
+        lines.append([words[i] for i in sorted(idx, key=lambda i: (words[i]["xmid"], i))])
+    return lines
+
 def parse_page(page):
-    text = page.extract_text() or ""
-    semester = find_semester(text)
-    bounds = infer_boundaries_from_headers(page)
+    words_all = page_words(page)
+    semester = find_semester(" ".join(w["text"] for w in words_all))
+    hdrs = header_boxes(words_all)
+    bounds = infer_boundaries_from_headers(words_all, hdrs)
     if not bounds or len(bounds) < 7:
-        words_all = page.extract_words(use_text_flow=True)
         if not words_all:
             return []
         left = min(w["x0"] for w in words_all) - 5
@@ -122,11 +162,10 @@ def parse_page(page):
         bounds = [left + i*step for i in range(7)]
 
     tab_rect = outer_rect(page)
-    hdrs = header_boxes(page)
     top_data = max((b[3] for b in hdrs.values()), default=0) + 1
 
     words = []
-    for w in page.extract_words(use_text_flow=True, keep_blank_chars=False):
+    for w in words_all:
         x0,y0,x1,y1 = w["x0"], w["top"], w["x1"], w["bottom"]
         ymid = (y0 + y1)/2.0
         if ymid < top_data:
@@ -137,13 +176,12 @@ def parse_page(page):
         words.append({"text": w["text"], "xmid": (x0+x1)/2.0, "ymid": ymid})
 
     y_vals = [w["ymid"] for w in words]
-    y_lines = y_cluster(y_vals, tol=4.0)
+    y_lines = y_cluster(y_vals, tol=LINE_TOLERANCE)
 
     lines = []
-    for y in y_lines:
-        line_words = [w for w in words if abs(w["ymid"] - y) <= 4.0]
+    for line_words in assign_lines(words, y_lines):
         col_text = [[] for _ in range(len(bounds)-1)]
-        for w in sorted(line_words, key=lambda x: x["xmid"]):
+        for w in line_words:
             col = assign_col(bounds, w["xmid"])
             col_text[col].append(w["text"])
         cols_joined = [" ".join(t).strip() for t in col_text]
@@ -204,22 +242,73 @@ def parse_page(page):
 
     return rows
 
-def parse_pdf(path: str) -> pd.DataFrame:
-    all_rows = []
+def parse_pages(path: str, first: int, last: int):
+    """Rows of pages first..last (0-based, inclusive); runs in a worker process."""
+    rows = []
     with pdfplumber.open(path) as pdf:
-        for p in pdf.pages:
-            all_rows.extend(parse_page(p))
-    df = pd.DataFrame(all_rows, columns=["Semester","Date","Day","Time","Room","Course"])
-    return df
+        for p in pdf.pages[first:last + 1]:
+            rows.extend(parse_page(p))
+    return rows
+
+def page_tasks(paths):
+    """(path, first, last) ranges: one page per task, so small batches of PDFs still spread out."""
+    tasks = []
+    for path in paths:
+        with pdfplumber.open(path) as pdf:
+            tasks.extend((path, n, n) for n in range(len(pdf.pages)))
+    return tasks
+
+def parse_pdfs(paths, workers: int | None = None) -> dict:
+    """path -> DataFrame, with every page of every PDF parsed in a process pool (workers=1: in-process)."""
+    tasks = page_tasks(paths)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        results = [parse_pages(*t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(parse_pages, *zip(*tasks))) if tasks else []
+    rows = {path: [] for path in paths}
+    for (path, _, _), page_rows in zip(tasks, results):
+        rows[path].extend(page_rows)
+    return {path: pd.DataFrame(r, columns=COLUMNS) for path, r in rows.items()}
+
+def parse_pdf(path: str, workers: int | None = None) -> pd.DataFrame:
+    return parse_pdfs([path], workers)[path]
+
+def csv_path_for(pdf_path: str, out_dir: str = CSV_DIR) -> str:
+    return os.path.join(out_dir, os.path.splitext(os.path.basename(pdf_path))[0] + ".csv")
 
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: python exam_pdf_to_csv_v4.py input.pdf output.csv")
+    ap = argparse.ArgumentParser(description="Parse exam schedule PDFs into CSV")
+    ap.add_argument("src", nargs="?", help="input.pdf")
+    ap.add_argument("dst", nargs="?", help="output.csv")
+    ap.add_argument("--all", action="store_true", help=f"Parse {PDF_DIR}/*.pdf into {CSV_DIR}/<name>.csv")
+    ap.add_argument("--workers", type=int, default=None, help="Parser processes (default: one per core)")
+    ap.add_argument("--force", action="store_true", help=f"Overwrite existing CSVs in {CSV_DIR}")
+    args = ap.parse_args()
+
+    if args.all:
+        jobs = {}
+        for pdf in sorted(glob.glob(os.path.join(PDF_DIR, "*.pdf"))):
+            dst = csv_path_for(pdf)
+            # Checked-in CSVs may carry manual corrections
+            if os.path.exists(dst) and not args.force:
+                print(f"Skipping {pdf}: {dst} exists (use --force to overwrite)")
+                continue
+            jobs[pdf] = dst
+    elif args.src and args.dst:
+        in_csv_dir = os.path.dirname(os.path.abspath(args.dst)) == os.path.abspath(CSV_DIR)
+        if in_csv_dir and os.path.exists(args.dst) and not args.force:
+            sys.exit(f"{args.dst} may carry manual corrections; write elsewhere or use --force to overwrite")
+        jobs = {args.src: args.dst}
+    else:
+        ap.print_usage()
         sys.exit(2)
-    src, dst = sys.argv[1], sys.argv[2]
-    df = parse_pdf(src)
-    df.to_csv(dst, index=False, encoding="utf-8-sig")
-    print(f"Wrote {len(df)} rows -> {dst}")
+
+    for src, df in parse_pdfs(list(jobs), args.workers).items():
+        os.makedirs(os.path.dirname(jobs[src]) or ".", exist_ok=True)
+        df.to_csv(jobs[src], index=False, encoding="utf-8-sig")
+        print(f"Wrote {len(df)} rows -> {jobs[src]}")
 
 if __name__ == "__main__":
     main()
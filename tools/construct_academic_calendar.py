@@ -26,5 +26,10 @@ def construct_academic_calendar(output_path: Union[str, Path] = "../data/academi
 
 
 if __name__ == "__main__":
-    construct_academic_calendar()  # writes ./academic_calendar.json
-    print("Wrote academic_calendar.json")
+    import sys
+    if len(sys.argv) > 1:
+        construct_academic_calendar(sys.argv[1])
+        print(f"Wrote {sys.argv[1]}")
+    else:
+        construct_academic_calendar()  # writes ./academic_calendar.json
+        print("Wrote academic_calendar.json")
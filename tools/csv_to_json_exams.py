@@ -49,30 +49,34 @@ def split_time_ampm(raw_time: str):
             return parts[0], parts[1], s.lower()
     return None, None, s  # leave as-is
 
-# Wire up your converter
-import_path = "data/final_exams_schedule.csv"
-export_path = "data/final_exams_schedule.json"
+def convert(import_path: str, export_path: str) -> dict:
+    data = {}
+    with open(import_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            course = row["Course"]
 
-data = {}
-with open(import_path, newline="", encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        course = row["Course"]
+            iso = normalize_date_iso(row.get("Date", ""))
+            if iso:
+                # row["DateISO"] = iso
+                # row["DateLong"] = date_long_from_iso(iso)
+                row["Date"] = date_long_from_iso(iso)  # keep Date as ISO to be unambiguous
 
-        iso = normalize_date_iso(row.get("Date", ""))
-        if iso:
-            # row["DateISO"] = iso
-            # row["DateLong"] = date_long_from_iso(iso)
-            row["Date"] = date_long_from_iso(iso)  # keep Date as ISO to be unambiguous
+            ts, te, pretty = split_time_ampm(row.get("Time", ""))
+            # row["TimeStartAmPm"] = ts or ""
+            # row["TimeEndAmPm"]   = te or ""
+            row["Time"]      = pretty or ""
 
-        ts, te, pretty = split_time_ampm(row.get("Time", ""))
-        # row["TimeStartAmPm"] = ts or ""
-        # row["TimeEndAmPm"]   = te or ""
-        row["Time"]      = pretty or ""
+            data[course] = row
 
-        data[course] = row
+    with open(export_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return data
 
-with open(export_path, "w", encoding="utf-8") as f:
-    json.dump(data, f, ensure_ascii=False, indent=2)
-
-print(f"Wrote {len(data)} courses to {export_path}")
+if __name__ == "__main__":
+    # Wire up your converter
+    import sys
+    import_path = sys.argv[1] if len(sys.argv) > 1 else "data/final_exams_schedule.csv"
+    export_path = sys.argv[2] if len(sys.argv) > 2 else "data/final_exams_schedule.json"
+    data = convert(import_path, export_path)
+    print(f"Wrote {len(data)} courses to {export_path}")
@@ -0,0 +1,305 @@
+"""
+Load test: many simultaneous synthetic calls against the Flask app, no phones needed.
+
+Each call replays the webhooks Twilio would send (/welcome -> /select_sector ->
+/voice -> /transcribe interim + final results -> /speak_result). The Twilio REST
+client is replaced by a stub that records the calls(...).update redirect, which is
+when the turn's answer is ready. Ollama is either a local fake (fixed latency,
+deterministic embeddings) or the real server.
+
+    python tools/loadtest.py --concurrency 1,4,16 --calls 40
+    python tools/loadtest.py --ollama real --sectors 5 --concurrency 1,2,4 --calls 8 --json report.json
+
+Reports throughput, p50/p95/p99 turn latency (final transcript -> answer ready)
+per sector, and error rates for each concurrency level.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+QUESTIONS = {
+    "1": ["When is the exam for Signals and Systems?", "When is the Databases exam?",
+          "Which exams are on Monday?", "What exams are in the third semester?"],
+    "2": ["What are the office hours of professor Daskalaki?", "When can I meet professor Papadaskalopoulos?",
+          "Office hours for professor Koufopavlou"],
+    "3": ["What classes are on Tuesday?", "When is the Electric Circuits lecture?"],
+    "4": ["When does the winter exam period start?", "How many days until the Christmas holidays?",
+          "Is there class tomorrow?"],
+    "5": ["What is the ECTS limit in the 6th semester for full time students?",
+          "How many times can I retake a failed course?", "How do I apply for a thesis?"],
+}
+SECTOR_NAMES = {"1": "EXAMS_PROGRAM", "2": "OFFICE_HOURS", "3": "DAILY_CLASS_SCHEDULE",
+                "4": "ACADEMIC_CALENDAR", "5": "DEPARTMENT_REGULATIONS"}
+ERROR_ANSWERS = ("An error occurred", "All our lines are busy")
+
+
+# ---------------------------------------------------------------- fake Ollama
+
+def fake_embedding(text: str, dim: int):
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    return [rng.uniform(-1.0, 1.0) for _ in range(dim)]
+
+
+def fake_completion(prompt: str) -> str:
+    if "Respond with only the numeric score" in prompt:
+        return "0.7"
+    if "'<number>: <score>'" in prompt:
+        count = prompt.count("\n[") + prompt.startswith("[")
+        return "\n".join(f"{n}: 0.{9 - n % 9}" for n in range(1, count + 1))
+    return ("Based on the context, this is a synthetic answer from the load-test model. "
+            "It is two sentences long so streaming has something to split.")
+
+
+def make_fake_ollama(latency: float, token_delay: float, dim: int):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._json({"models": []})
+
+        def do_POST(self):
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path == "/api/embed":
+                inputs = req.get("input")
+                inputs = [inputs] if isinstance(inputs, str) else inputs
+                return self._json({"model": req.get("model"), "embeddings": [fake_embedding(t, dim) for t in inputs]})
+            if self.path == "/api/embeddings":
+                return self._json({"embedding": fake_embedding(req.get("prompt", ""), dim)})
+            if self.path != "/api/generate":
+                self.send_error(404)
+                return
+            time.sleep(latency)
+            text = fake_completion(req.get("prompt", ""))
+            if not req.get("stream", True):
+                return self._json({"model": req.get("model"), "response": text, "done": True, "done_reason": "stop"})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            tokens = [t + " " for t in text.split(" ")]
+            for tok in tokens + [None]:
+                msg = {"model": req.get("model"), "response": tok or "", "done": tok is None}
+                if tok is None:
+                    msg["done_reason"] = "stop"
+                else:
+                    time.sleep(token_delay)
+                line = (json.dumps(msg) + "\n").encode()
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server
+
+
+# ---------------------------------------------------------------- stub Twilio
+
+class StubTwilio:
+    """Stands in for twilio.rest.Client: calls(sid).update(url=...) marks the turn's answer as ready."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {}
+
+    def expect(self, call_sid) -> threading.Event:
+        with self._lock:
+            ev = self._events[call_sid] = threading.Event()
+            return ev
+
+    def calls(self, call_sid):
+        stub = self
+
+        class _Call:
+            def update(self, url=None, method=None):
+                with stub._lock:
+                    ev = stub._events.get(call_sid)
+                if ev:
+                    ev.set()
+        return _Call()
+
+
+# ---------------------------------------------------------------- call flow
+
+def transcription_form(call_sid, text, final: bool):
+    return {
+        "CallSid": call_sid,
+        "TranscriptionEvent": "transcription-content",
+        "TranscriptionData": json.dumps({"transcript": text, "confidence": 0.93}),
+        "Final": "true" if final else "false",
+        "Stability": "0.9",
+    }
+
+
+def run_call(app, twilio, call_sid, digit, question, partials: bool, timeout: float) -> dict:
+    client = app.test_client()
+    result = {"sector": SECTOR_NAMES[digit], "latency": None, "error": None}
+    try:
+        for path, form in (("/welcome", {"CallSid": call_sid}),
+                           ("/select_sector", {"CallSid": call_sid, "Digits": digit}),
+                           ("/voice", {"CallSid": call_sid}),
+                           ("/transcribe", {"CallSid": call_sid, "TranscriptionEvent": "transcription-started"})):
+            resp = client.post(path, data=form)
+            if resp.status_code >= 400:
+                result["error"] = f"{path} -> {resp.status_code}"
+                return result
+
+        if partials:
+            words = question.split()
+            for n in range(3, len(words), 3):
+                client.post("/transcribe", data=transcription_form(call_sid, " ".join(words[:n]), final=False))
+                time.sleep(0.3)  # roughly the pace of interim results while speaking
+
+        ready = twilio.expect(call_sid)
+        started = time.perf_counter()
+        resp = client.post("/transcribe", data=transcription_form(call_sid, question, final=True))
+        if resp.status_code >= 400:
+            result["error"] = f"/transcribe -> {resp.status_code}"
+            return result
+        if not ready.wait(timeout):
+            result["error"] = "timeout"
+            return result
+        resp = client.post("/speak_result", data={"CallSid": call_sid})
+        result["latency"] = time.perf_counter() - started
+        body = resp.get_data(as_text=True)
+        if resp.status_code >= 400:
+            result["error"] = f"/speak_result -> {resp.status_code}"
+        elif any(e in body for e in ERROR_ANSWERS):
+            result["error"] = "error answer"
+        client.post("/call_status", data={"CallSid": call_sid, "CallStatus": "completed"})
+    except Exception as e:
+        result["error"] = repr(e)
+    return result
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]  # nearest rank
+
+
+def summarize(results, wall):
+    by_sector = {}
+    for r in results:
+        by_sector.setdefault(r["sector"], []).append(r)
+    sectors = {}
+    for name, rs in sorted(by_sector.items()):
+        lat = [r["latency"] for r in rs if r["latency"] is not None and not r["error"]]
+        sectors[name] = {
+            "calls": len(rs),
+            "errors": sum(1 for r in rs if r["error"]),
+            "error_rate": round(sum(1 for r in rs if r["error"]) / len(rs), 3),
+            "p50_ms": round(percentile(lat, 50) * 1000, 1) if lat else None,
+            "p95_ms": round(percentile(lat, 95) * 1000, 1) if lat else None,
+            "p99_ms": round(percentile(lat, 99) * 1000, 1) if lat else None,
+        }
+    errors = sum(1 for r in results if r["error"])
+    return {
+        "calls": len(results),
+        "wall_seconds": round(wall, 2),
+        "throughput_calls_per_s": round(len(results) / wall, 2) if wall else None,
+        "error_rate": round(errors / len(results), 3) if results else 0.0,
+        "error_kinds": sorted({r["error"] for r in results if r["error"]}),
+        "sectors": sectors,
+    }
+
+
+def print_level(level, summary):
+    print(f"\nconcurrency {level}: {summary['calls']} calls in {summary['wall_seconds']}s, "
+          f"{summary['throughput_calls_per_s']} calls/s, error rate {summary['error_rate']:.1%}")
+    print(f"  {'sector':<24}{'calls':>6}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, s in summary["sectors"].items():
+        print(f"  {name:<24}{s['calls']:>6}{s['errors']:>6}{str(s['p50_ms']):>10}{str(s['p95_ms']):>10}{str(s['p99_ms']):>10}")
+    if summary["error_kinds"]:
+        print("  errors:", ", ".join(summary["error_kinds"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent Twilio calls against the app")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated simultaneous call counts.")
+    parser.add_argument("--calls", type=int, default=32, help="Calls per concurrency level.")
+    parser.add_argument("--sectors", default="1,2,4,5", help="Menu digits to spread calls over.")
+    parser.add_argument("--ollama", choices=("fake", "real"), default="fake")
+    parser.add_argument("--fake-latency", type=float, default=0.4, help="Seconds before a fake generation starts.")
+    parser.add_argument("--fake-token-delay", type=float, default=0.02, help="Seconds per fake streamed token.")
+    parser.add_argument("--embed-dim", type=int, default=768, help="Fake embedding size (nomic-embed-text: 768).")
+    parser.add_argument("--no-partials", action="store_true", help="Send only the final transcript.")
+    parser.add_argument("--no-response-cache", action="store_true", help="Answer repeated questions from scratch.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for one answer.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Write the report to this file.")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, str(ROOT))
+    os.environ["STREAMING_MODE"] = "0"
+    os.environ.setdefault("SESSION_BACKEND", "memory")
+    if args.ollama == "fake":
+        server = make_fake_ollama(args.fake_latency, args.fake_token_delay, args.embed_dim)
+        os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{server.server_address[1]}"
+        print("Fake Ollama at", os.environ["OLLAMA_HOST"])
+        # Fake answers must not end up in the semantic cache the real app serves from
+        cache_dir = tempfile.mkdtemp(prefix="loadtest-")
+        os.environ["SEMANTIC_CACHE_PATH"] = os.path.join(cache_dir, "semantic_cache.json")
+
+    import main as secretariat  # after OLLAMA_HOST is set: the Ollama clients read it on creation
+    from RAG.resources import warm_up
+
+    twilio = StubTwilio()
+    app = secretariat.create_app(public_url="http://loadtest.invalid", twilio_client=twilio, warm=False)
+    if args.no_response_cache:
+        secretariat.RESPONSE_CACHE.max_entries = 0
+    warm_up()
+
+    rng = random.Random(args.seed)
+    digits = args.sectors.split(",")
+    report = {"config": vars(args), "levels": {}}
+    call_no = 0
+    for level in [int(c) for c in args.concurrency.split(",")]:
+        plan = []
+        for _ in range(args.calls):
+            call_no += 1
+            digit = rng.choice(digits)
+            plan.append((f"CAloadtest{call_no:06d}", digit, rng.choice(QUESTIONS[digit])))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            results = list(pool.map(
+                lambda c: run_call(app, twilio, c[0], c[1], c[2], not args.no_partials, args.timeout), plan))
+        summary = summarize(results, time.perf_counter() - started)
+        report["levels"][level] = summary
+        print_level(level, summary)
+
+    report["dispatch"] = {k: v for k, v in secretariat.DISPATCHER.stats().items() if k != "recent_jobs"}
+    report["speculation"] = secretariat.SPECULATOR.stats()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print("\nReport written to", args.json)
+
+
+if __name__ == "__main__":
+    main()
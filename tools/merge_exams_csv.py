@@ -1,9 +1,19 @@
+import glob
+import os
+import sys
+
 import pandas as pd
 
-df1 = pd.read_csv("data/exams/mona.csv")
-df2 = pd.read_csv("data/exams/ziga.csv")
+CSV_DIR = "data/exams"
+OUTPUT = os.path.join(CSV_DIR, "final_exams_schedule.csv")
 
-df2 = df2[df1.columns]
+# Every per-PDF CSV written by build_exams_schedule_csv.py, or the files given on the command line
+paths = sys.argv[1:] or sorted(p for p in glob.glob(os.path.join(CSV_DIR, "*.csv")) if p != OUTPUT)
+if not paths:
+    sys.exit(f"No CSVs to merge in {CSV_DIR}")
 
-out = pd.concat([df1, df2], ignore_index=True)
-out.to_csv("data/exams/final_exams_schedule.csv", index=False)
+frames = [pd.read_csv(p) for p in paths]
+columns = frames[0].columns
+out = pd.concat([df[columns] for df in frames], ignore_index=True)
+out.to_csv(OUTPUT, index=False)
+print(f"Merged {len(paths)} files, {len(out)} rows -> {OUTPUT}")
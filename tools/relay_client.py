@@ -0,0 +1,40 @@
+"""
+Local stand-in for Twilio ConversationRelay: connects to the /relay WebSocket,
+sends a setup and a prompt message, and prints each streamed sentence with its
+arrival time.
+
+    python tools/relay_client.py ws://localhost:8080/relay 5 "What is the ECTS limit in the 6th semester?"
+"""
+import json
+import sys
+import time
+
+import simple_websocket
+
+
+def main():
+    if len(sys.argv) != 4:
+        print("usage: relay_client.py <ws url> <sector digit> <question>")
+        sys.exit(1)
+    url, sector, question = sys.argv[1:]
+
+    ws = simple_websocket.Client.connect(url)
+    ws.send(json.dumps({"type": "setup", "callSid": "CA-local", "customParameters": {"sector": sector}}))
+    started = time.perf_counter()
+    ws.send(json.dumps({"type": "prompt", "voicePrompt": question, "lang": "en-GB", "last": True}))
+
+    try:
+        while True:
+            msg = json.loads(ws.receive())
+            elapsed = (time.perf_counter() - started) * 1000
+            if msg["type"] == "text" and msg["token"]:
+                print(f"[{elapsed:7.0f} ms] {msg['token'].strip()}")
+            elif msg["type"] == "end":
+                print(f"[{elapsed:7.0f} ms] end")
+                break
+    finally:
+        ws.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Per-turn latency tracing and Prometheus metrics.
+
+A trace is one caller turn; its id is the Twilio CallSid. start_trace() binds the
+turn's trace to the current context (every webhook of the turn joins the same open
+trace until end_trace()), span(stage) times a block inside it, and every span is
+added both to the trace record and to a latency histogram labelled by stage and
+sector. Thread pools do not inherit contextvars, so work handed to them is wrapped
+with bind().
+
+render_metrics() produces the Prometheus text format served on /metrics.
+"""
+import contextvars
+import threading
+import time
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+
+# Seconds; spans range from index lookups (sub-millisecond) to LLM generations (tens of seconds)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MAX_TRACES = 200
+
+_trace = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    __slots__ = ("trace_id", "sector", "started", "spans", "_lock")
+
+    def __init__(self, trace_id, sector):
+        self.trace_id = trace_id
+        self.sector = sector
+        self.started = time.perf_counter()
+        self.spans = []  # (stage, start offset s, duration s)
+        self._lock = threading.Lock()
+
+    def add(self, stage, start, duration):
+        with self._lock:
+            self.spans.append((stage, start - self.started, duration))
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s[1])
+        return {
+            "trace_id": self.trace_id,
+            "sector": self.sector,
+            "spans": [{"stage": st, "start_ms": round(off * 1000, 1), "duration_ms": round(d * 1000, 1)}
+                      for st, off, d in spans],
+        }
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+_lock = threading.Lock()
+_histograms = {}  # (stage, sector) -> Histogram
+_traces = deque(maxlen=MAX_TRACES)
+_open = OrderedDict()  # trace_id -> Trace of the turn in progress
+
+
+def _sector_label(sector) -> str:
+    return getattr(sector, "name", None) or (str(sector) if sector else "none")
+
+
+@contextmanager
+def start_trace(trace_id, sector=None):
+    """Make the open trace for trace_id (created on first use) current for the block."""
+    with _lock:
+        trace = _open.get(trace_id)
+        if trace is None:
+            trace = _open[trace_id] = Trace(trace_id, _sector_label(sector))
+            _traces.append(trace)
+            while len(_open) > MAX_TRACES:
+                _open.popitem(last=False)  # turns that never finished (caller hung up)
+        elif sector is not None:
+            trace.sector = _sector_label(sector)
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+def end_trace(trace_id):
+    """Close the turn; the next webhook for this call starts a new trace."""
+    with _lock:
+        _open.pop(trace_id, None)
+
+
+def set_sector(sector):
+    trace = _trace.get()
+    if trace:
+        trace.sector = _sector_label(sector)
+
+
+def current_trace_id():
+    trace = _trace.get()
+    return trace.trace_id if trace else None
+
+
+def observe(stage: str, seconds: float, sector=None, start: float = None):
+    """Record a duration measured elsewhere (e.g. time spent queued)."""
+    trace = _trace.get()
+    label = _sector_label(sector) if sector is not None else (trace.sector if trace else "none")
+    with _lock:
+        hist = _histograms.get((stage, label))
+        if hist is None:
+            hist = _histograms[(stage, label)] = Histogram()
+        hist.observe(seconds)
+    if trace:
+        trace.add(stage, start if start is not None else time.perf_counter() - seconds, seconds)
+
+
+@contextmanager
+def span(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started, start=started)
+
+
+def bind(fn):
+    """Wrap fn to run in (a copy of) the caller's context, for thread pools."""
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so each call gets its own copy
+        return ctx.copy().run(fn, *args, **kwargs)
+    return run
+
+
+def recent_traces(trace_id=None) -> list:
+    with _lock:
+        traces = list(_traces)
+    return [t.to_dict() for t in traces if trace_id is None or t.trace_id == trace_id]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics(gauges: dict = None) -> str:
+    """Prometheus text exposition of the stage histograms plus any {name: (help, value)} gauges."""
+    name = "secretariat_stage_duration_seconds"
+    lines = [f"# HELP {name} Time spent per turn stage.", f"# TYPE {name} histogram"]
+    with _lock:
+        items = sorted((key, (list(h.counts), h.total, h.count)) for key, h in _histograms.items())
+    for (stage, sector), (counts, total, count) in items:
+        labels = f'stage="{_escape(stage)}",sector="{_escape(sector)}"'
+        cumulative = 0
+        for bound, c in zip(BUCKETS, counts):
+            cumulative += c
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f"{name}_sum{{{labels}}} {total:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {count}")
+    for gauge, (help_text, value) in (gauges or {}).items():
+        lines.append(f"# HELP {gauge} {help_text}")
+        lines.append(f"# TYPE {gauge} gauge")
+        lines.append(f"{gauge} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,49 @@
+"""
+Public URL setup: an optional ngrok tunnel plus pointing the Twilio number at it.
+
+Runs once per deployment (the __main__ block of main.py, or the gunicorn master
+in gunicorn.conf.py), never per worker, so all workers share one tunnel.
+"""
+import os
+
+import ngrok
+from twilio.rest import Client
+
+INCOMING_CALL_ROUTE = '/select_sector'
+STATUS_CALLBACK_ROUTE = '/call_status'
+
+
+def twilio_client_from_env() -> Client:
+    return Client(os.environ['TWILIO_API_KEY_SID'], os.environ['TWILIO_API_SECRET'], os.environ['TWILIO_ACCOUNT_SID'])
+
+
+def open_tunnel(port: int) -> str:
+    """Open an ngrok tunnel to the local port and return its public URL."""
+    ngrok.set_auth_token(os.getenv("NGROK_AUTHTOKEN"))
+    listener = ngrok.forward(f"http://localhost:{port}")
+    print(f"Ngrok tunnel opened at {listener.url()} for port {port}")
+    return listener.url()
+
+
+def close_tunnel():
+    ngrok.disconnect()
+
+
+def resolve_public_url(port: int) -> tuple[str, bool]:
+    """(PUBLIC_URL, whether a tunnel was opened for it): the env var wins, else ngrok."""
+    public_url = os.getenv("PUBLIC_URL")
+    if public_url:
+        return public_url.rstrip("/"), False
+    return open_tunnel(port), True
+
+
+def configure_number(client: Client, public_url: str, twilio_number: str = None):
+    """Set the public URL as the voice webhook of our Twilio number."""
+    twilio_number = twilio_number or os.environ['TWILIO_NUMBER']
+    twilio_numbers = client.incoming_phone_numbers.list()
+    twilio_number_sid = [num.sid for num in twilio_numbers if num.phone_number == twilio_number][0]
+    client.incoming_phone_numbers(twilio_number_sid).update(
+        os.environ['TWILIO_ACCOUNT_SID'],
+        voice_url=f"{public_url}{INCOMING_CALL_ROUTE}",
+        status_callback=f"{public_url}{STATUS_CALLBACK_ROUTE}",
+    )
@@ -0,0 +1,123 @@
+"""
+Model residency and sector-aware prefetch.
+
+Ollama loads a model on its first request and unloads it once it has been idle for
+keep_alive, so the first caller after startup, or after a quiet spell, pays the
+model load (seconds for llama3, plus nomic-embed-text for retrieval). ModelKeeper
+loads both at boot with resources.KEEP_ALIVE and pings them every
+KEEPALIVE_PING_SECONDS so they stay loaded.
+
+Prefetcher runs a sector's prefetch (handlers_base.PREFETCHERS) when the caller
+presses its digit, in the seconds the sector prompt takes to speak: it opens the
+collection or index the turn will use and, where the LLM prompt starts with fixed
+context, has Ollama evaluate that prefix so the turn's prompt reuses it.
+"""
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from RAG.resources import EMBEDDING_MODEL, load_embeddings, load_llm
+
+LLM_MODELS = ("llama3",)
+KEEPALIVE_PING_SECONDS = float(os.getenv("KEEPALIVE_PING_SECONDS", "240"))  # 0 disables the pings
+PREFETCH_WORKERS = 2
+# A sector prefetched this recently is not prefetched again (its prompt prefix is still cached)
+PREFETCH_MIN_INTERVAL = 30.0
+
+
+class ModelKeeper:
+    def __init__(self, llm_models=LLM_MODELS, embedding_models=(EMBEDDING_MODEL,),
+                 interval: float = KEEPALIVE_PING_SECONDS):
+        self.models = [(m, load_llm) for m in llm_models] + [(m, load_embeddings) for m in embedding_models]
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._state = {}  # model -> {"ms", "at", "error"} of the last load / ping
+        self._stop = threading.Event()
+        self._thread = None
+
+    def preload(self) -> bool:
+        """Load every model now; True if all of them answered. Failures are recorded, not raised."""
+        ok = True
+        for model, load in self.models:
+            started = time.perf_counter()
+            error = None
+            try:
+                load(model)
+            except Exception as e:
+                error = repr(e)
+                ok = False
+                print(f"[warmup] Loading {model} failed: {error}")
+            with self._lock:
+                self._state[model] = {
+                    "ms": round((time.perf_counter() - started) * 1000, 1),
+                    "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "error": error,
+                }
+        return ok
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="model-keepalive", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.preload()  # also reloads a model Ollama evicted for another one
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"ping_seconds": self.interval, "models": {m: dict(s) for m, s in self._state.items()}}
+
+
+class Prefetcher:
+    def __init__(self, prefetchers: dict, workers: int = PREFETCH_WORKERS,
+                 min_interval: float = PREFETCH_MIN_INTERVAL):
+        self.prefetchers = prefetchers
+        self.min_interval = min_interval
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._running = {}  # sector -> future
+        self._last = {}  # sector -> perf_counter() of the last successful prefetch
+        self.started = 0
+        self.skipped = 0
+        self.failed = 0
+        self._ms = {}  # sector name -> duration of the last prefetch
+
+    def prefetch(self, sector):
+        """Start preparing for a turn in sector; returns at once, at most one run per sector."""
+        fn = self.prefetchers.get(sector)
+        if fn is None:
+            return
+        with self._lock:
+            running = self._running.get(sector)
+            recent = time.perf_counter() - self._last.get(sector, float("-inf")) < self.min_interval
+            if (running and not running.done()) or recent:
+                self.skipped += 1
+                return
+            self.started += 1
+            self._running[sector] = self._pool.submit(self._run, sector, fn)
+
+    def _run(self, sector, fn):
+        started = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            print(f"[prefetch] {sector.name} failed: {e!r}")
+            traceback.print_exc()
+            with self._lock:
+                self.failed += 1
+            return
+        with self._lock:
+            self._last[sector] = time.perf_counter()
+            self._ms[sector.name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"started": self.started, "skipped": self.skipped, "failed": self.failed,
+                    "last_ms": dict(self._ms)}
@@ -0,0 +1,8 @@
+"""
+WSGI entry point for process managers:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from main import create_app
+
+app = create_app()